@@ -11,10 +11,11 @@ if BASE_DIR not in sys.path:
 
 from app.config import settings
 from app.database import Base
-from app.models import Transaction, User, Wallet
+from app.models import OutboxEvent, Transaction, User, Wallet
 
 config = context.config
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+# app.serve passes each shard's URL in; plain `alembic upgrade head` migrates DATABASE_URL.
+config.set_main_option("sqlalchemy.url", config.attributes.get("database_url", settings.DATABASE_URL))
 
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
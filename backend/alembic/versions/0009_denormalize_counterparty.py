@@ -0,0 +1,64 @@
+"""store counterparty name and email on transactions
+
+Revision ID: 0009_denormalize_counterparty
+Revises: 0008_add_outbox
+Create Date: 2026-10-19 00:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0009_denormalize_counterparty"
+down_revision: Union[str, Sequence[str], None] = "0008_add_outbox"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    op.add_column("transactions", sa.Column("counterparty_name", sa.String(), nullable=True))
+    op.add_column("transactions", sa.Column("counterparty_email", sa.String(), nullable=True))
+
+    # Backfill and index outside the migration transaction so each batch commits on its own
+    # and the table is never locked for the whole run.
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        min_id, max_id = bind.execute(sa.text("SELECT min(id), max(id) FROM transactions")).one()
+        if min_id is not None:
+            for batch_start in range(min_id, max_id + 1, BACKFILL_BATCH_SIZE):
+                bind.execute(
+                    sa.text(
+                        """
+                        UPDATE transactions AS t
+                        SET counterparty_name = u.name, counterparty_email = u.email
+                        FROM users AS u
+                        WHERE t.id >= :batch_start
+                          AND t.id < :batch_end
+                          AND t.counterparty_name IS NULL
+                          AND u.id = CASE
+                              WHEN t.type = 'transfer_out' THEN t.receiver_id
+                              WHEN t.type = 'transfer_in' THEN t.sender_id
+                          END
+                        """
+                    ),
+                    {"batch_start": batch_start, "batch_end": batch_start + BACKFILL_BATCH_SIZE},
+                )
+
+        op.create_index(
+            "ix_transactions_wallet_id_timestamp",
+            "transactions",
+            ["wallet_id", "timestamp"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_wallet_id_timestamp", table_name="transactions")
+    op.drop_column("transactions", "counterparty_email")
+    op.drop_column("transactions", "counterparty_name")
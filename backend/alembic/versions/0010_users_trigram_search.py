@@ -0,0 +1,38 @@
+"""add trigram indexes for admin user search
+
+Revision ID: 0010_users_trigram_search
+Revises: 0009_denormalize_counterparty
+Create Date: 2026-10-19 00:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0010_users_trigram_search"
+down_revision: Union[str, Sequence[str], None] = "0009_denormalize_counterparty"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        for column in ("name", "email"):
+            op.create_index(
+                f"ix_users_{column}_trgm",
+                "users",
+                [column],
+                unique=False,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_email_trgm", table_name="users")
+    op.drop_index("ix_users_name_trgm", table_name="users")
@@ -0,0 +1,116 @@
+"""range-partition transactions by month on timestamp
+
+Revision ID: 0011_partition_transactions
+Revises: 0010_users_trigram_search
+Create Date: 2026-10-19 00:30:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0011_partition_transactions"
+down_revision: Union[str, Sequence[str], None] = "0010_users_trigram_search"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = (
+    "id, wallet_id, sender_id, receiver_id, type, amount, status, timestamp, counterparty_name, counterparty_email"
+)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    op.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    op.execute("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_transactions_id RENAME TO ix_transactions_unpartitioned_id")
+    op.execute(
+        "ALTER INDEX IF EXISTS ix_transactions_wallet_id_timestamp "
+        "RENAME TO ix_transactions_unpartitioned_wallet_id_timestamp"
+    )
+
+    # The partition key has to be part of the primary key; ids stay unique through the shared sequence.
+    op.execute(
+        """
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            wallet_id INTEGER NOT NULL,
+            sender_id INTEGER,
+            receiver_id INTEGER,
+            type VARCHAR NOT NULL,
+            amount NUMERIC(12, 2) NOT NULL,
+            status VARCHAR NOT NULL DEFAULT 'SUCCESS',
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            counterparty_name VARCHAR,
+            counterparty_email VARCHAR,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT transactions_wallet_id_fkey FOREIGN KEY (wallet_id) REFERENCES wallets (id),
+            CONSTRAINT fk_transactions_sender_id_users FOREIGN KEY (sender_id) REFERENCES users (id),
+            CONSTRAINT fk_transactions_receiver_id_users FOREIGN KEY (receiver_id) REFERENCES users (id)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    first_timestamp = bind.execute(sa.text("SELECT min(timestamp) FROM transactions_unpartitioned")).scalar()
+    current_month = date.today().replace(day=1)
+    month = (first_timestamp.date() if first_timestamp else current_month).replace(day=1)
+    last_month = _add_months(current_month, MONTHS_AHEAD)
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE transactions_y{month.year}m{month.month:02d} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_unpartitioned")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute("DROP TABLE transactions_unpartitioned")
+
+    op.create_index(op.f("ix_transactions_id"), "transactions", ["id"], unique=False)
+    op.create_index("ix_transactions_wallet_id_timestamp", "transactions", ["wallet_id", "timestamp"], unique=False)
+    op.execute("ANALYZE transactions")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.execute("ALTER INDEX ix_transactions_id RENAME TO ix_transactions_partitioned_id")
+    op.execute("ALTER INDEX ix_transactions_wallet_id_timestamp RENAME TO ix_transactions_partitioned_wallet_id_timestamp")
+
+    op.execute(
+        """
+        CREATE TABLE transactions (
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            wallet_id INTEGER NOT NULL REFERENCES wallets (id),
+            sender_id INTEGER,
+            receiver_id INTEGER,
+            type VARCHAR NOT NULL,
+            amount NUMERIC(12, 2) NOT NULL,
+            status VARCHAR NOT NULL DEFAULT 'SUCCESS',
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            counterparty_name VARCHAR,
+            counterparty_email VARCHAR,
+            CONSTRAINT transactions_pkey PRIMARY KEY (id),
+            CONSTRAINT fk_transactions_sender_id_users FOREIGN KEY (sender_id) REFERENCES users (id),
+            CONSTRAINT fk_transactions_receiver_id_users FOREIGN KEY (receiver_id) REFERENCES users (id)
+        )
+        """
+    )
+    op.execute(f"INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_partitioned")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute("DROP TABLE transactions_partitioned CASCADE")
+
+    op.create_index(op.f("ix_transactions_id"), "transactions", ["id"], unique=False)
+    op.create_index("ix_transactions_wallet_id_timestamp", "transactions", ["wallet_id", "timestamp"], unique=False)
@@ -0,0 +1,50 @@
+"""add hourly and daily transaction rollups
+
+Revision ID: 0012_add_transaction_rollups
+Revises: 0011_partition_transactions
+Create Date: 2026-10-19 00:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0012_add_transaction_rollups"
+down_revision: Union[str, Sequence[str], None] = "0011_partition_transactions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_rollup_table(name: str) -> None:
+    op.create_table(
+        name,
+        sa.Column("wallet_id", sa.Integer(), nullable=False),
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("tx_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_amount", sa.Numeric(18, 2), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("wallet_id", "bucket", "type", "status"),
+    )
+
+
+def upgrade() -> None:
+    _create_rollup_table("transaction_rollups_hourly")
+    _create_rollup_table("transaction_rollups_daily")
+
+    op.create_table(
+        "rollup_state",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_transaction_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.execute("INSERT INTO rollup_state (name, last_transaction_id) VALUES ('transactions', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table("rollup_state")
+    op.drop_table("transaction_rollups_daily")
+    op.drop_table("transaction_rollups_hourly")
@@ -0,0 +1,63 @@
+"""store the running wallet balance on every successful transaction
+
+Revision ID: 0014_add_balance_after
+Revises: 0013_restore_idempotency_keys
+Create Date: 2026-10-19 01:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.migrations import add_column_if_missing, backfill, reset_backfill
+
+
+revision: str = "0014_add_balance_after"
+down_revision: Union[str, Sequence[str], None] = "0013_restore_idempotency_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_NAME = "transactions.balance_after"
+WALLETS_PER_BATCH = 500
+
+SIGNED_AMOUNT = "CASE WHEN tx.type IN ('deposit', 'transfer_in') THEN tx.amount ELSE -tx.amount END"
+
+# Anchored on the current wallet balance and walked backwards, so history that has already been
+# archived out of Postgres does not need to be summed. Rows written by the new code already carry
+# balance_after and are only used for the running sum.
+BACKFILL_SQL = f"""
+    UPDATE transactions AS t
+    SET balance_after = r.balance_after
+    FROM (
+        SELECT
+            tx.id,
+            tx.timestamp,
+            w.balance - COALESCE(
+                SUM({SIGNED_AMOUNT}) OVER (
+                    PARTITION BY tx.wallet_id
+                    ORDER BY tx.timestamp DESC, tx.id DESC
+                    ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ),
+                0
+            ) AS balance_after
+        FROM transactions AS tx
+        JOIN wallets AS w ON w.id = tx.wallet_id
+        WHERE tx.wallet_id >= :batch_start AND tx.wallet_id < :batch_end AND tx.status = 'SUCCESS'
+    ) AS r
+    WHERE t.id = r.id
+      AND t.timestamp = r.timestamp
+      AND t.wallet_id >= :batch_start
+      AND t.wallet_id < :batch_end
+      AND t.balance_after IS NULL
+"""
+
+
+def upgrade() -> None:
+    add_column_if_missing("transactions", sa.Column("balance_after", sa.Numeric(12, 2), nullable=True))
+    backfill(BACKFILL_NAME, "wallets", BACKFILL_SQL, batch_size=WALLETS_PER_BATCH)
+
+
+def downgrade() -> None:
+    reset_backfill(BACKFILL_NAME)
+    op.drop_column("transactions", "balance_after")
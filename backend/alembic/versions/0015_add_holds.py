@@ -0,0 +1,58 @@
+"""add holds and wallets.held for two-phase payments
+
+Revision ID: 0015_add_holds
+Revises: 0014_add_balance_after
+Create Date: 2026-10-19 01:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0015_add_holds"
+down_revision: Union[str, Sequence[str], None] = "0014_add_balance_after"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default is stored in the catalog, so this does not rewrite wallets.
+    op.add_column("wallets", sa.Column("held", sa.Numeric(12, 2), nullable=False, server_default="0"))
+
+    op.create_table(
+        "holds",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("wallet_id", sa.Integer(), nullable=False),
+        sa.Column("payer_id", sa.Integer(), nullable=False),
+        sa.Column("payee_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="ACTIVE"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("settled_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["wallet_id"], ["wallets.id"]),
+        sa.ForeignKeyConstraint(["payer_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["payee_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_holds_id"), "holds", ["id"], unique=False)
+    op.create_index(op.f("ix_holds_payee_id"), "holds", ["payee_id"], unique=False)
+    op.create_index("ix_holds_wallet_id_created_at", "holds", ["wallet_id", "created_at"], unique=False)
+    op.create_index(
+        "ix_holds_expiring",
+        "holds",
+        ["expires_at", "id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'ACTIVE'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_holds_expiring", table_name="holds")
+    op.drop_index("ix_holds_wallet_id_created_at", table_name="holds")
+    op.drop_index(op.f("ix_holds_payee_id"), table_name="holds")
+    op.drop_index(op.f("ix_holds_id"), table_name="holds")
+    op.drop_table("holds")
+    op.drop_column("wallets", "held")
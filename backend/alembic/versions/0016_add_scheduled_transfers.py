@@ -0,0 +1,57 @@
+"""add scheduled_transfers for standing orders
+
+Revision ID: 0016_add_scheduled_transfers
+Revises: 0015_add_holds
+Create Date: 2026-10-19 01:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0016_add_scheduled_transfers"
+down_revision: Union[str, Sequence[str], None] = "0015_add_holds"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduled_transfers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("sender_id", sa.Integer(), nullable=False),
+        sa.Column("receiver_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("interval", sa.String(), nullable=False),
+        sa.Column("anchor_day", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="ACTIVE"),
+        sa.Column("scheduled_for", sa.DateTime(), nullable=False),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("claimed_until", sa.DateTime(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("run_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_run_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["sender_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["receiver_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_scheduled_transfers_id"), "scheduled_transfers", ["id"], unique=False)
+    op.create_index(op.f("ix_scheduled_transfers_sender_id"), "scheduled_transfers", ["sender_id"], unique=False)
+    op.create_index(
+        "ix_scheduled_transfers_due",
+        "scheduled_transfers",
+        ["next_run_at", "id"],
+        unique=False,
+        postgresql_where=sa.text("status = 'ACTIVE'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scheduled_transfers_due", table_name="scheduled_transfers")
+    op.drop_index(op.f("ix_scheduled_transfers_sender_id"), table_name="scheduled_transfers")
+    op.drop_index(op.f("ix_scheduled_transfers_id"), table_name="scheduled_transfers")
+    op.drop_table("scheduled_transfers")
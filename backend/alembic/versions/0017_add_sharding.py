@@ -0,0 +1,105 @@
+"""add user directory, shard map and cross-shard saga tables
+
+Revision ID: 0017_add_sharding
+Revises: 0016_add_scheduled_transfers
+Create Date: 2026-10-19 02:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.migrations import backfill, reset_backfill
+
+
+revision: str = "0017_add_sharding"
+down_revision: Union[str, Sequence[str], None] = "0016_add_scheduled_transfers"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_NAME = "user_directory"
+# Must match app.sharding.BUCKET_SIZE.
+BUCKET_SIZE = 1024
+
+DIRECTORY_BACKFILL_SQL = """
+    INSERT INTO user_directory (id, email, created_at)
+    SELECT id, email, now() FROM users
+    WHERE id >= :batch_start AND id < :batch_end
+    ON CONFLICT DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_directory",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_table(
+        "shard_buckets",
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("state", sa.String(), nullable=False, server_default="ACTIVE"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("bucket"),
+    )
+    op.create_table(
+        "transfer_sagas",
+        sa.Column("id", sa.String(32), nullable=False),
+        sa.Column("sender_id", sa.Integer(), nullable=False),
+        sa.Column("receiver_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="PENDING"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_transfer_sagas_sender_id"), "transfer_sagas", ["sender_id"], unique=False)
+    op.create_index(
+        "ix_transfer_sagas_pending",
+        "transfer_sagas",
+        ["created_at"],
+        unique=False,
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+    op.create_table(
+        "saga_credits",
+        sa.Column("saga_id", sa.String(32), nullable=False),
+        sa.Column("transaction_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("saga_id"),
+    )
+
+    # Existing users keep their ids and stay on the first shard.
+    backfill(BACKFILL_NAME, "users", DIRECTORY_BACKFILL_SQL)
+    op.execute(
+        f"""
+        INSERT INTO shard_buckets (bucket, shard, state, updated_at)
+        SELECT generate_series(0, max(id) / {BUCKET_SIZE}), 0, 'ACTIVE', now() FROM users HAVING max(id) IS NOT NULL
+        ON CONFLICT DO NOTHING
+        """
+    )
+    # New ids come from the directory; leave a gap for users created by old app instances during the rollout.
+    op.execute(
+        """
+        SELECT setval(
+            pg_get_serial_sequence('user_directory', 'id'),
+            GREATEST((SELECT last_value FROM users_id_seq), (SELECT COALESCE(max(id), 0) FROM user_directory)) + 100000
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    reset_backfill(BACKFILL_NAME)
+    op.drop_table("saga_credits")
+    op.drop_index("ix_transfer_sagas_pending", table_name="transfer_sagas")
+    op.drop_index(op.f("ix_transfer_sagas_sender_id"), table_name="transfer_sagas")
+    op.drop_table("transfer_sagas")
+    op.drop_table("shard_buckets")
+    op.drop_table("user_directory")
@@ -0,0 +1,35 @@
+"""add admin_audit_log for bulk admin operations
+
+Revision ID: 0018_add_admin_audit_log
+Revises: 0017_add_sharding
+Create Date: 2026-10-19 02:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0018_add_admin_audit_log"
+down_revision: Union[str, Sequence[str], None] = "0017_add_sharding"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "admin_audit_log",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("admin_id", sa.Integer(), nullable=False),
+        sa.Column("action", sa.String(), nullable=False),
+        sa.Column("details", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_admin_audit_log_admin_id"), "admin_audit_log", ["admin_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_admin_audit_log_admin_id"), table_name="admin_audit_log")
+    op.drop_table("admin_audit_log")
@@ -0,0 +1,27 @@
+"""add holds.transaction_id linking a capture to its transfer_out row
+
+Revision ID: 0019_add_hold_transaction_id
+Revises: 0018_add_admin_audit_log
+Create Date: 2026-10-19 03:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0019_add_hold_transaction_id"
+down_revision: Union[str, Sequence[str], None] = "0018_add_admin_audit_log"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable with no default, so this is a catalog-only change. Holds captured before this
+    # revision keep NULL and their transfer_out rows count on the capture day as before.
+    op.add_column("holds", sa.Column("transaction_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("holds", "transaction_id")
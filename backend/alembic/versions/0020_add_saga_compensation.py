@@ -0,0 +1,31 @@
+"""add receiver and transfer_out id to transfer_sagas for compensation
+
+Revision ID: 0020_add_saga_compensation
+Revises: 0019_add_hold_transaction_id
+Create Date: 2026-10-19 03:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0020_add_saga_compensation"
+down_revision: Union[str, Sequence[str], None] = "0019_add_hold_transaction_id"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable with no default, so none of these rewrite the table. Sagas started before this
+    # revision look the receiver up when compensated, as before.
+    op.add_column("transfer_sagas", sa.Column("receiver_name", sa.String(), nullable=True))
+    op.add_column("transfer_sagas", sa.Column("receiver_email", sa.String(), nullable=True))
+    op.add_column("transfer_sagas", sa.Column("transaction_id", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("transfer_sagas", "transaction_id")
+    op.drop_column("transfer_sagas", "receiver_email")
+    op.drop_column("transfer_sagas", "receiver_name")
@@ -0,0 +1,32 @@
+"""drop user foreign keys that cross-shard transfers violate
+
+Revision ID: 0021_drop_cross_shard_user_fks
+Revises: 0020_add_saga_compensation
+Create Date: 2026-10-19 03:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0021_drop_cross_shard_user_fks"
+down_revision: Union[str, Sequence[str], None] = "0020_add_saga_compensation"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The other party of a cross-shard transfer lives in another database, so its id has no row in
+    # this shard's users table. Holds keep theirs: both parties are always on the hold's shard.
+    op.drop_constraint("fk_transactions_sender_id_users", "transactions", type_="foreignkey")
+    op.drop_constraint("fk_transactions_receiver_id_users", "transactions", type_="foreignkey")
+    op.drop_constraint("scheduled_transfers_sender_id_fkey", "scheduled_transfers", type_="foreignkey")
+    op.drop_constraint("scheduled_transfers_receiver_id_fkey", "scheduled_transfers", type_="foreignkey")
+
+
+def downgrade() -> None:
+    op.create_foreign_key("scheduled_transfers_receiver_id_fkey", "scheduled_transfers", "users", ["receiver_id"], ["id"])
+    op.create_foreign_key("scheduled_transfers_sender_id_fkey", "scheduled_transfers", "users", ["sender_id"], ["id"])
+    op.create_foreign_key("fk_transactions_receiver_id_users", "transactions", "users", ["receiver_id"], ["id"])
+    op.create_foreign_key("fk_transactions_sender_id_users", "transactions", "users", ["sender_id"], ["id"])
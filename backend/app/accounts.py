@@ -0,0 +1,63 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from app.models import User, Wallet
+from app.sharding import allocate_user_ids, release_user_ids, shard_engine, shard_for_user
+from app.utils.sql import insert_ignoring_conflicts
+
+
+def _insert_on_shard(shard: int, rows: list[dict]) -> dict[str, int]:
+    engine = shard_engine(shard)
+    with engine.begin() as conn:
+        statement = (
+            insert_ignoring_conflicts(engine.dialect.name, User.__table__, ["email"])
+            .values(rows)
+            .returning(User.__table__.c.id, User.__table__.c.email)
+        )
+        created = {row.email: row.id for row in conn.execute(statement)}
+        if created:
+            conn.execute(
+                insert(Wallet.__table__),
+                [{"user_id": user_id, "balance": Decimal("0.00")} for user_id in created.values()],
+            )
+    return created
+
+
+def create_accounts(rows: list[dict]) -> dict[str, int]:
+    # Emails are claimed in the user directory first, which also hands out the globally unique ids
+    # that decide each user's shard. Taken emails are skipped by the unique indexes instead of a
+    # SELECT beforehand, so concurrent registrations cannot race past the check.
+    # Returns {email: user_id} for the users actually created; each one gets an empty wallet.
+    if not rows:
+        return {}
+
+    allocated = allocate_user_ids([row["email"] for row in rows])
+    by_shard = defaultdict(list)
+    for row in rows:
+        user_id = allocated.get(row["email"])
+        if user_id is not None:
+            by_shard[shard_for_user(user_id)].append({**row, "id": user_id})
+
+    created = {}
+    try:
+        for shard, shard_rows in by_shard.items():
+            created.update(_insert_on_shard(shard, shard_rows))
+    finally:
+        # Ids whose insert failed or hit a user the directory did not know about are handed back.
+        unused = [user_id for email, user_id in allocated.items() if email not in created]
+        if unused:
+            release_user_ids(unused)
+    return created
+
+
+def account_row(name: str, email: str, password_hash: str, is_admin: bool = False) -> dict:
+    return {
+        "name": name,
+        "email": email,
+        "password_hash": password_hash,
+        "is_active": True,
+        "is_admin": is_admin,
+        "is_frozen": False,
+    }
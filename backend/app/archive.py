@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.config import settings
+from app.models import INBOUND_TYPES
+
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("wallet_id", pa.int64()),
+        ("sender_id", pa.int64()),
+        ("receiver_id", pa.int64()),
+        ("type", pa.string()),
+        ("amount", pa.decimal128(12, 2)),
+        ("status", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("counterparty_name", pa.string()),
+        ("counterparty_email", pa.string()),
+        ("balance_after", pa.decimal128(12, 2)),
+    ]
+)
+ARCHIVE_COLUMNS = tuple(ARCHIVE_SCHEMA.names)
+# Segments written before balance_after existed have no "columns" entry in the manifest.
+LEGACY_ARCHIVE_COLUMNS = ARCHIVE_COLUMNS[:-1]
+MANIFEST_NAME = "manifest.jsonl"
+
+_manifest_lock = threading.Lock()
+_manifest_cache: tuple[float, list[dict]] | None = None
+
+
+def manifest_path() -> str:
+    return os.path.join(settings.ARCHIVE_DIR, MANIFEST_NAME)
+
+
+def wallet_range(wallet_id: int) -> tuple[int, int]:
+    size = settings.ARCHIVE_WALLET_RANGE_SIZE
+    lower = (wallet_id // size) * size
+    return lower, lower + size - 1
+
+
+def segment_dir(wallet_id: int, timestamp: datetime) -> str:
+    lower, upper = wallet_range(wallet_id)
+    return os.path.join(settings.ARCHIVE_DIR, f"wallets={lower}-{upper}", f"month={timestamp:%Y-%m}")
+
+
+def write_segment(rows: list[dict]) -> dict:
+    # All rows share one wallet range and month; the caller groups them.
+    first = rows[0]
+    directory = segment_dir(first["wallet_id"], first["timestamp"])
+    os.makedirs(directory, exist_ok=True)
+
+    ids = [row["id"] for row in rows]
+    timestamps = [row["timestamp"] for row in rows]
+    wallet_ids = [row["wallet_id"] for row in rows]
+    path = os.path.join(directory, f"part-{min(ids)}-{max(ids)}.parquet")
+
+    table = pa.Table.from_pylist([{column: row[column] for column in ARCHIVE_COLUMNS} for row in rows], schema=ARCHIVE_SCHEMA)
+    temp_path = f"{path}.tmp"
+    pq.write_table(table, temp_path, compression="zstd")
+    os.replace(temp_path, path)
+
+    return {
+        "path": os.path.relpath(path, settings.ARCHIVE_DIR),
+        "columns": list(ARCHIVE_COLUMNS),
+        "rows": len(rows),
+        "id_min": min(ids),
+        "id_max": max(ids),
+        "wallet_min": min(wallet_ids),
+        "wallet_max": max(wallet_ids),
+        "timestamp_min": min(timestamps).isoformat(),
+        "timestamp_max": max(timestamps).isoformat(),
+    }
+
+
+def append_manifest(entries: list[dict]):
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    with _manifest_lock, open(manifest_path(), "a", encoding="utf-8") as manifest:
+        for entry in entries:
+            manifest.write(json.dumps(entry) + "\n")
+        manifest.flush()
+        os.fsync(manifest.fileno())
+
+
+def load_manifest() -> list[dict]:
+    global _manifest_cache
+    path = manifest_path()
+    try:
+        modified_at = os.path.getmtime(path)
+    except OSError:
+        return []
+
+    with _manifest_lock:
+        if _manifest_cache is not None and _manifest_cache[0] == modified_at:
+            return _manifest_cache[1]
+
+        with open(path, encoding="utf-8") as manifest:
+            entries = [json.loads(line) for line in manifest if line.strip()]
+        for entry in entries:
+            entry["timestamp_min"] = datetime.fromisoformat(entry["timestamp_min"])
+            entry["timestamp_max"] = datetime.fromisoformat(entry["timestamp_max"])
+        _manifest_cache = (modified_at, entries)
+        return entries
+
+
+def archived_until() -> datetime | None:
+    entries = load_manifest()
+    if not entries:
+        return None
+    return max(entry["timestamp_max"] for entry in entries)
+
+
+def select_segments(
+    wallet_ids: tuple[int, int],
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[dict]:
+    lower, upper = wallet_ids
+    selected = []
+    for entry in load_manifest():
+        if entry["wallet_max"] < lower or entry["wallet_min"] > upper:
+            continue
+        if since is not None and entry["timestamp_max"] < since:
+            continue
+        if until is not None and entry["timestamp_min"] >= until:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def read_archived_rows(
+    wallet_id: int,
+    columns: tuple[str, ...],
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[dict]:
+    filters = [("wallet_id", "=", wallet_id)]
+    if since is not None:
+        filters.append(("timestamp", ">=", since))
+    if until is not None:
+        filters.append(("timestamp", "<", until))
+
+    # A run that wrote its manifest entry but failed to commit the DELETE archives the same rows again
+    # next time, so a transaction id can appear in more than one segment; the first copy wins.
+    rows = []
+    seen = set()
+    for entry in select_segments((wallet_id, wallet_id), since, until):
+        available = entry.get("columns", LEGACY_ARCHIVE_COLUMNS)
+        present = [column for column in columns if column in available and column != "id"]
+        missing = dict.fromkeys(column for column in columns if column not in available)
+        table = pq.read_table(os.path.join(settings.ARCHIVE_DIR, entry["path"]), columns=["id", *present], filters=filters)
+        for row in table.to_pylist():
+            if row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            rows.append({**row, **missing})
+    return rows
+
+
+def merge_with_archive(
+    hot_rows: list[dict],
+    wallet_id: int,
+    columns: tuple[str, ...],
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[dict]:
+    watermark = archived_until()
+    if watermark is None or (since is not None and since > watermark):
+        return hot_rows
+
+    archived = read_archived_rows(wallet_id, columns, since, until)
+    if not archived:
+        return hot_rows
+
+    # A crash between writing a segment and committing the delete can leave a row in both places.
+    hot_ids = {row["id"] for row in hot_rows}
+    merged = hot_rows + [row for row in archived if row["id"] not in hot_ids]
+    merged.sort(key=lambda row: (row["timestamp"], row["id"]), reverse=True)
+    return merged
+
+
+def archived_wallet_net(lower: int, upper: int) -> dict[int, Decimal]:
+    # Signed SUCCESS totals per wallet for rows that no longer live in Postgres.
+    # Rows archived twice (see read_archived_rows) are counted once.
+    net = defaultdict(Decimal)
+    seen = set()
+    filters = [("wallet_id", ">=", lower), ("wallet_id", "<=", upper), ("status", "=", "SUCCESS")]
+    for entry in select_segments((lower, upper)):
+        table = pq.read_table(
+            os.path.join(settings.ARCHIVE_DIR, entry["path"]),
+            columns=["id", "wallet_id", "type", "amount"],
+            filters=filters,
+        ).to_pydict()
+        for row_id, wallet_id, row_type, amount in zip(table["id"], table["wallet_id"], table["type"], table["amount"]):
+            if row_id in seen:
+                continue
+            seen.add(row_id)
+            net[wallet_id] += amount if row_type in INBOUND_TYPES else -amount
+    return net
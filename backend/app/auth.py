@@ -7,18 +7,21 @@ from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import get_db
 from app.models import User
+from app.sharding import shard_for_user, shard_session, user_session
+from app.tracing import span
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 
 def hash_password(password: str) -> str:
     password_bytes = password.encode("utf-8")
     if len(password_bytes) > 72:
         raise HTTPException(status_code=422, detail="Password cannot be longer than 72 bytes")
-    return bcrypt.hashpw(password_bytes, bcrypt.gensalt()).decode("utf-8")
+    with span("auth.bcrypt"):
+        return bcrypt.hashpw(password_bytes, bcrypt.gensalt()).decode("utf-8")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -26,7 +29,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     if len(password_bytes) > 72:
         return False
     try:
-        return bcrypt.checkpw(password_bytes, hashed_password.encode("utf-8"))
+        with span("auth.bcrypt"):
+            return bcrypt.checkpw(password_bytes, hashed_password.encode("utf-8"))
     except ValueError:
         return False
 
@@ -37,25 +41,58 @@ def create_access_token(user_id: int) -> str:
     return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def token_user_id(token: str | None) -> int:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except (JWTError, TypeError, ValueError):
-        raise credentials_exception
+        return int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError, AttributeError):
+        raise credentials_exception()
+
 
+def authenticate_token(token: str | None, db: Session) -> User:
+    user_id = token_user_id(token)
     user = db.query(User).filter(User.id == user_id).first()
     if user is None or not user.is_active:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
 
+def get_user_db(token: str = Depends(oauth2_scheme)):
+    # Session on the shard that holds the caller's rows; routes acting on the current user depend
+    # on this instead of get_db so they share the session get_current_user loaded the user with.
+    db = shard_session(shard_for_user(token_user_id(token)))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_user_db)) -> User:
+    with span("auth.get_current_user"):
+        return authenticate_token(token, db)
+
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    # Signature check only, for reads served entirely from Redis.
+    return token_user_id(token)
+
+
+def get_stream_user(token: str | None = Depends(optional_oauth2_scheme), access_token: str | None = None) -> User:
+    # EventSource cannot send headers, so the token may also come from the query string.
+    # The session is closed before the stream starts so long-lived connections do not pin a pooled DB connection.
+    token = token or access_token
+    with user_session(token_user_id(token)) as db:
+        return authenticate_token(token, db)
+
+
 def require_admin(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -0,0 +1,78 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.archive import ARCHIVE_COLUMNS, append_manifest, wallet_range, write_segment
+from app.config import settings
+from app.database import engine
+
+
+ARCHIVE_LOCK_KEY = 330033
+
+
+def archive_chunk(cutoff: datetime, chunk_size: int) -> int:
+    # Delete and archive in one DB transaction: the rows only leave Postgres once their segment
+    # files and manifest entries are on disk. If the commit then fails, the rows stay and are archived
+    # again by the next run; readers in app.archive drop the duplicate ids.
+    with engine.begin() as conn:
+        rows = (
+            conn.execute(
+                text(
+                    f"""
+                    DELETE FROM transactions
+                    WHERE timestamp < :cutoff
+                      AND id IN (
+                          SELECT id FROM transactions
+                          WHERE timestamp < :cutoff
+                          ORDER BY id
+                          LIMIT :chunk_size
+                      )
+                    RETURNING {", ".join(ARCHIVE_COLUMNS)}
+                    """
+                ),
+                {"cutoff": cutoff, "chunk_size": chunk_size},
+            )
+            .mappings()
+            .all()
+        )
+        if not rows:
+            return 0
+
+        segments = defaultdict(list)
+        for row in rows:
+            segments[(wallet_range(row["wallet_id"]), row["timestamp"].strftime("%Y-%m"))].append(dict(row))
+        append_manifest([write_segment(segment_rows) for segment_rows in segments.values()])
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old transactions rows into compressed Parquet segments")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--chunk-size", type=int, default=settings.ARCHIVE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar():
+            print("another archival run is in progress")
+            return
+
+        total = 0
+        try:
+            while True:
+                archived = archive_chunk(cutoff, args.chunk_size)
+                if archived == 0:
+                    break
+                total += archived
+                print(f"archived {total} rows older than {cutoff.isoformat()}")
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ARCHIVE_LOCK_KEY})
+
+    print(f"done, {total} rows archived")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Transaction, User, Wallet
+from app.read_models import list_user_rows, wallet_transaction_rows
+from app.schemas import TransactionResponse, UserListResponse
+from app.utils.responses import dumps_json
+
+
+def seed(db, user_count: int, transaction_count: int) -> int:
+    db.add_all(
+        User(id=i, name=f"user {i}", email=f"user{i}@example.com", password_hash="x" * 60)
+        for i in range(1, user_count + 1)
+    )
+    db.add(Wallet(id=1, user_id=1, balance=Decimal("0.00")))
+    started = datetime(2026, 1, 1)
+    db.add_all(
+        Transaction(
+            wallet_id=1,
+            type="transfer_out" if i % 2 else "transfer_in",
+            amount=Decimal("12.34"),
+            status="SUCCESS",
+            counterparty_name="someone",
+            timestamp=started + timedelta(seconds=i),
+        )
+        for i in range(transaction_count)
+    )
+    db.commit()
+    return 1
+
+
+def orm_path(db, adapter: TypeAdapter, query) -> bytes:
+    # What response_model does today: hydrate entities, validate from attributes, dump, encode.
+    rows = query.all()
+    validated = adapter.validate_python(rows, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode("utf-8")
+
+
+def timed(label: str, fn, repeat: int):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        payload = fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<40} {elapsed * 1000:9.2f} ms/request  {len(payload):>10} bytes")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ORM + response_model serialisation with the read-model path")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    with Session() as db:
+        wallet_id = seed(db, args.users, args.transactions)
+
+    user_adapter = TypeAdapter(list[UserListResponse])
+    tx_adapter = TypeAdapter(list[TransactionResponse])
+
+    with Session() as db:
+        for label, slow, fast in (
+            (
+                f"/admin/users ({args.users} rows)",
+                lambda: orm_path(db, user_adapter, db.query(User).order_by(User.id.asc())),
+                lambda: dumps_json(list_user_rows(db)),
+            ),
+            (
+                f"/admin/user-transactions ({args.transactions} rows)",
+                lambda: orm_path(
+                    db,
+                    tx_adapter,
+                    db.query(Transaction).filter(Transaction.wallet_id == wallet_id).order_by(Transaction.timestamp.desc()),
+                ),
+                lambda: dumps_json(wallet_transaction_rows(db, wallet_id)),
+            ),
+        ):
+            print(label)
+            before = timed("  ORM + response_model", lambda: (db.expunge_all(), slow())[1], args.repeat)
+            after = timed("  Core projection + FastJSONResponse", fast, args.repeat)
+            print(f"  speedup x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import json
+import re
+import sys
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app.auth import authenticate_token, create_access_token, hash_password
+from app.database import SessionLocal, engine
+from app.partitions import add_months, create_month_partition, ensure_future_partitions, month_start
+from app.routes import admin, auth, wallet
+from app.schemas import AdminDepositRequest, AmountRequest, LoginRequest, TransferRequest
+from app.utils.redis_cache import cache_delete
+
+
+# Run against a scratch database: --seed loads synthetic users, and the write scenarios move money.
+SEED_EMAIL = "plancheck-{}@example.com"
+SEED_PASSWORD = "plan-check-password"
+PROBE_EMAIL = SEED_EMAIL.format(1)
+PEER_EMAIL = SEED_EMAIL.format(2)
+ADMIN_EMAIL = SEED_EMAIL.format(3)
+SEED_MONTHS = 3
+
+# A sequential scan on any of these is a regression unless the baseline already had it.
+HOT_TABLES = {"users", "wallets", "transactions", "holds", "idempotency_keys", "user_directory"}
+PARTITION_SUFFIX = re.compile(r"_y\d{4}m\d{2}")
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def seed(user_count: int, transactions_per_user: int):
+    password_hash = hash_password(SEED_PASSWORD)
+    today = date.today()
+    with engine.begin() as conn:
+        ensure_future_partitions(conn, 1)
+        for months_back in range(SEED_MONTHS + 1):
+            create_month_partition(conn, add_months(month_start(today), -months_back))
+
+        conn.execute(
+            text(
+                """
+                INSERT INTO user_directory (email, created_at)
+                SELECT replace(:pattern, '{}', i::text), now() FROM generate_series(1, :user_count) AS i
+                ON CONFLICT (email) DO NOTHING
+                """
+            ),
+            {"pattern": SEED_EMAIL, "user_count": user_count},
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO users (id, name, email, password_hash, is_active, is_admin, is_frozen)
+                SELECT d.id, 'Plan check ' || d.id, d.email, :password_hash, true, d.email = :admin_email, false
+                FROM user_directory d
+                WHERE d.email LIKE 'plancheck-%' AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = d.id)
+                """
+            ),
+            {"password_hash": password_hash, "admin_email": ADMIN_EMAIL},
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO shard_buckets (bucket, shard, state, updated_at)
+                SELECT DISTINCT id / 1024, 0, 'ACTIVE', now() FROM users WHERE email LIKE 'plancheck-%'
+                ON CONFLICT DO NOTHING
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO wallets (user_id, balance, held)
+                SELECT u.id, 1000000, 0 FROM users u
+                WHERE u.email LIKE 'plancheck-%' AND NOT EXISTS (SELECT 1 FROM wallets w WHERE w.user_id = u.id)
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO transactions (wallet_id, type, amount, status, timestamp, counterparty_name, balance_after)
+                SELECT
+                    w.id,
+                    CASE WHEN g % 2 = 0 THEN 'transfer_in' ELSE 'transfer_out' END,
+                    5.00,
+                    CASE WHEN g % 50 = 0 THEN 'FAILED' ELSE 'SUCCESS' END,
+                    now() - random() * make_interval(days => :days),
+                    'Plan check',
+                    1000000
+                FROM wallets w
+                JOIN users u ON u.id = w.user_id AND u.email LIKE 'plancheck-%'
+                CROSS JOIN generate_series(1, :per_user) AS g
+                """
+            ),
+            {"per_user": transactions_per_user, "days": SEED_MONTHS * 30},
+        )
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("ANALYZE")
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Remembers the engine, so each statement is explained on the shard that ran it.
+        if not executemany:
+            statements.append((conn.engine, statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+
+_tokens: dict[str, str] = {}
+
+
+@contextmanager
+def request_session(email: str):
+    # What get_user_db + get_current_user give a route: one session, with the caller already loaded.
+    db = SessionLocal()
+    try:
+        if email not in _tokens:
+            user_id = db.execute(text("SELECT id FROM users WHERE email = :email"), {"email": email}).scalar()
+            if user_id is None:
+                raise SystemExit(f"{email} does not exist, run with --seed first")
+            _tokens[email] = create_access_token(user_id)
+            db.rollback()
+        yield authenticate_token(_tokens[email], db), db
+    finally:
+        db.close()
+
+
+def as_user(email: str, call):
+    def run():
+        with request_session(email) as (user, db):
+            cache_delete(f"wallet_balance:{user.id}")
+            cache_delete(f"wallet_transactions:{user.id}")
+            call(user, db)
+
+    return run
+
+
+SCENARIOS = {
+    "auth.login": lambda: auth.login(LoginRequest(email=PROBE_EMAIL, password=SEED_PASSWORD)),
+    "wallet.transactions": as_user(PROBE_EMAIL, lambda user, db: wallet.transactions(None, None, user, db)),
+    "wallet.balance": as_user(
+        PROBE_EMAIL, lambda user, db: wallet.balance(datetime.utcnow() - timedelta(days=7), user, db)
+    ),
+    "wallet.statement": as_user(
+        PROBE_EMAIL, lambda user, db: wallet.statement(datetime.utcnow().strftime("%Y-%m"), user, db)
+    ),
+    "wallet.withdraw": as_user(
+        PROBE_EMAIL, lambda user, db: wallet.withdraw(AmountRequest(amount=Decimal("0.01")), None, user, db)
+    ),
+    "wallet.transfer": as_user(
+        PROBE_EMAIL,
+        lambda user, db: wallet.transfer(TransferRequest(email=PEER_EMAIL, amount=Decimal("0.01")), None, user, db),
+    ),
+    "admin.users": as_user(
+        ADMIN_EMAIL, lambda user, db: admin.list_users(50, None, None, None, None, None, user)
+    ),
+    "admin.users_search": as_user(
+        ADMIN_EMAIL, lambda user, db: admin.list_users(50, None, None, None, None, "plancheck-12", user)
+    ),
+    "admin.user_transactions": as_user(
+        ADMIN_EMAIL, lambda user, db: admin.user_transactions(PROBE_EMAIL, None, None, user)
+    ),
+    "admin.stats": as_user(ADMIN_EMAIL, lambda user, db: admin.stats(None, None, "day", user)),
+    "admin.deposit": as_user(
+        ADMIN_EMAIL,
+        lambda user, db: admin.admin_deposit(AdminDepositRequest(email=PEER_EMAIL, amount=Decimal("0.01")), None, user),
+    ),
+}
+
+
+def normalize(name: str) -> str:
+    # Monthly partitions come and go; compare them by their parent's naming.
+    return PARTITION_SUFFIX.sub("", name)
+
+
+def walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def summarize(conn, statement: str, parameters) -> dict:
+    summary = {"sql": " ".join(statement.split())[:200]}
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return summary
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+    nodes = list(walk(plan))
+    summary["cost"] = plan["Total Cost"]
+    summary["indexes"] = sorted({normalize(node["Index Name"]) for node in nodes if "Index Name" in node})
+    summary["seq_scans"] = sorted(
+        {normalize(node["Relation Name"]) for node in nodes if node["Node Type"] == "Seq Scan"}
+    )
+    return summary
+
+
+def capture(name: str) -> dict:
+    with captured_statements() as statements:
+        SCENARIOS[name]()
+    connections = {}
+    with ExitStack() as stack:
+        plans = []
+        for statement_engine, statement, parameters in statements:
+            if statement_engine not in connections:
+                connections[statement_engine] = stack.enter_context(statement_engine.connect())
+            plans.append(summarize(connections[statement_engine], statement, parameters))
+    return {"statements": len(plans), "plans": plans}
+
+
+def compare(name: str, expected: dict, actual: dict, cost_tolerance: float) -> list[str]:
+    problems = []
+    if actual["statements"] > expected["statements"]:
+        problems.append(f"{name}: {actual['statements']} statements per request, baseline {expected['statements']}")
+
+    for position, (before, after) in enumerate(zip(expected["plans"], actual["plans"]), start=1):
+        label = f"{name} #{position}"
+        if before["sql"] != after["sql"]:
+            problems.append(f"{label}: statement changed, re-run with --update if intended\n    was: {before['sql']}\n    now: {after['sql']}")
+            continue
+        if "cost" not in before:
+            continue
+        lost = sorted(set(before["indexes"]) - set(after["indexes"]))
+        if lost:
+            problems.append(f"{label}: no longer uses {', '.join(lost)}")
+        scans = sorted((set(after["seq_scans"]) - set(before["seq_scans"])) & HOT_TABLES)
+        if scans:
+            problems.append(f"{label}: new sequential scan on {', '.join(scans)}")
+        if after["cost"] > before["cost"] * (1 + cost_tolerance) and after["cost"] - before["cost"] > 1:
+            problems.append(f"{label}: estimated cost {after['cost']:.1f}, baseline {before['cost']:.1f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the plans of the SQL each hot route emits against a stored baseline (use a scratch database)"
+    )
+    parser.add_argument("--baseline", default="query_plans.json")
+    parser.add_argument("--update", action="store_true", help="Write the current plans as the new baseline")
+    parser.add_argument("--seed", action="store_true", help="Load synthetic users and transactions first")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--transactions-per-user", type=int, default=40)
+    parser.add_argument("--cost-tolerance", type=float, default=0.5, help="Allowed relative increase in estimated cost")
+    parser.add_argument("--only", action="append", choices=sorted(SCENARIOS), help="Limit to these scenarios")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.users, args.transactions_per_user)
+        print(f"seeded {args.users} users with {args.transactions_per_user} transactions each")
+
+    names = args.only or sorted(SCENARIOS)
+    results = {}
+    for name in names:
+        # The first run warms caches and resolves the caller; the second is the one measured.
+        SCENARIOS[name]()
+        results[name] = capture(name)
+        print(f"{name}: {results[name]['statements']} statements")
+
+    if args.update:
+        with open(args.baseline, "w") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    problems = []
+    for name in names:
+        if name not in baseline:
+            problems.append(f"{name}: not in the baseline, re-run with --update")
+            continue
+        problems.extend(compare(name, baseline[name], results[name], args.cost_tolerance))
+
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} query plan regressions")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
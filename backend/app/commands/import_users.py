@@ -0,0 +1,101 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from pydantic import ValidationError
+
+from app.accounts import account_row, create_accounts
+from app.auth import hash_password
+from app.schemas import RegisterRequest
+
+
+def load_checkpoint(path: str, source: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint["source"] == source:
+            return checkpoint
+    return {"source": source, "rows_done": 0, "created": 0, "duplicates": 0, "rejected": 0}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    # Written to a temp file and renamed so an interrupted run never leaves a torn checkpoint.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(tmp_path, path)
+
+
+def import_batch(pool: ProcessPoolExecutor, batch: list[tuple[int, dict]], report) -> tuple[int, int, int]:
+    valid = []
+    rejected = 0
+    for line_number, record in batch:
+        try:
+            valid.append((line_number, RegisterRequest(**record)))
+        except ValidationError as exc:
+            rejected += 1
+            report.writerow([line_number, record.get("email", ""), "invalid", exc.errors()[0]["msg"]])
+
+    hashes = pool.map(hash_password, [payload.password for _, payload in valid], chunksize=16)
+    rows = [account_row(payload.name, payload.email, password_hash) for (_, payload), password_hash in zip(valid, hashes)]
+
+    created = create_accounts(rows)
+
+    duplicates = 0
+    seen = set()
+    for line_number, payload in valid:
+        if payload.email in created and payload.email not in seen:
+            seen.add(payload.email)
+            continue
+        duplicates += 1
+        report.writerow([line_number, payload.email, "duplicate", "email already registered"])
+    return len(created), duplicates, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-create users and wallets from a CSV with name,email,password columns")
+    parser.add_argument("source")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--checkpoint", default="import_users.checkpoint.json")
+    parser.add_argument("--report", default="import_users.report.csv")
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.source)
+    checkpoint = load_checkpoint(args.checkpoint, source)
+    if checkpoint["rows_done"]:
+        print(f"resuming after {checkpoint['rows_done']} rows")
+
+    with (
+        open(source, newline="") as source_file,
+        open(args.report, "a", newline="") as report_file,
+        ProcessPoolExecutor(max_workers=args.workers) as pool,
+    ):
+        report = csv.writer(report_file)
+        rows = enumerate(csv.DictReader(source_file), start=2)
+        for _ in islice(rows, checkpoint["rows_done"]):
+            pass
+
+        while batch := list(islice(rows, args.batch_size)):
+            created, duplicates, rejected = import_batch(pool, batch, report)
+            report_file.flush()
+            # A crash between the commit and this write only replays one batch, which the
+            # ON CONFLICT insert turns into duplicates rather than double-created users.
+            checkpoint["rows_done"] += len(batch)
+            checkpoint["created"] += created
+            checkpoint["duplicates"] += duplicates
+            checkpoint["rejected"] += rejected
+            save_checkpoint(args.checkpoint, checkpoint)
+            print(
+                f"rows={checkpoint['rows_done']} created={checkpoint['created']} "
+                f"duplicates={checkpoint['duplicates']} rejected={checkpoint['rejected']}"
+            )
+
+    print(f"done, see {args.report} for skipped rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+from datetime import date
+
+from app.config import settings
+from app.database import engine
+from app.partitions import add_months, detach_partitions_before, ensure_future_partitions, month_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming monthly transactions partitions and detach old ones")
+    parser.add_argument("--months-ahead", type=int, default=settings.TRANSACTION_PARTITION_MONTHS_AHEAD)
+    parser.add_argument(
+        "--detach-older-than-months",
+        type=int,
+        default=None,
+        help="Detach partitions that end before this many months ago; detached tables are kept, not dropped",
+    )
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        for name in ensure_future_partitions(conn, args.months_ahead):
+            print(f"created {name}")
+
+    if args.detach_older_than_months is not None:
+        cutoff = add_months(month_start(date.today()), -args.detach_older_than_months)
+        with engine.begin() as conn:
+            for name in detach_partitions_before(conn, cutoff):
+                print(f"detached {name}")
+
+
+if __name__ == "__main__":
+    main()
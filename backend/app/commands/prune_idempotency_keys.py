@@ -0,0 +1,41 @@
+import argparse
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete idempotency keys older than the retention window")
+    parser.add_argument("--retention-hours", type=int, default=settings.IDEMPOTENCY_RETENTION_HOURS)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(hours=args.retention_hours)
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(
+                text(
+                    """
+                    DELETE FROM idempotency_keys
+                    WHERE (user_id, endpoint, key) IN (
+                        SELECT user_id, endpoint, key FROM idempotency_keys
+                        WHERE created_at < :cutoff
+                        LIMIT :batch_size
+                    )
+                    """
+                ),
+                {"cutoff": cutoff, "batch_size": args.batch_size},
+            ).rowcount
+        total += deleted
+        if deleted < args.batch_size:
+            break
+
+    print(f"deleted {total} idempotency keys created before {cutoff.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, not_, or_, select, text, update
+
+from app.commands.rollups import hot_ledger_start
+from app.config import settings
+from app.models import (
+    Hold,
+    IdempotencyKey,
+    SagaCredit,
+    ScheduledTransfer,
+    ShardBucket,
+    Transaction,
+    TransferSaga,
+    User,
+    UserDirectory,
+    Wallet,
+)
+from app.rollups import rebuild
+from app.sharding import BUCKET_SIZE, DIRECTORY_SHARD, SHARD_COUNT, shard_engine
+from app.utils.sql import insert_ignoring_conflicts
+
+
+# Sequences whose rows can move between shards; interleaving them keeps ids unique across shards.
+MOVABLE_SEQUENCES = ("wallets_id_seq", "transactions_id_seq", "holds_id_seq", "scheduled_transfers_id_seq")
+COPY_BATCH_SIZE = 5000
+
+
+def init_sequences():
+    # Shard k hands out ids congruent to k modulo the shard count, starting above every id in use.
+    # Re-run after adding a shard.
+    for sequence in MOVABLE_SEQUENCES:
+        highest = 0
+        for shard in range(SHARD_COUNT):
+            with shard_engine(shard).connect() as conn:
+                highest = max(highest, conn.execute(text(f"SELECT last_value FROM {sequence}")).scalar())
+        base = (highest // SHARD_COUNT + 1) * SHARD_COUNT
+        for shard in range(SHARD_COUNT):
+            with shard_engine(shard).begin() as conn:
+                conn.execute(text(f"ALTER SEQUENCE {sequence} INCREMENT BY {SHARD_COUNT} RESTART WITH {base + shard}"))
+        print(f"{sequence}: shard k now allocates {base} + k + {SHARD_COUNT}n")
+
+
+def sync_directory():
+    # Picks up users created by app instances that predate the directory.
+    for shard in range(SHARD_COUNT):
+        with shard_engine(shard).connect() as conn:
+            rows = [dict(row) for row in conn.execute(select(User.id, User.email)).mappings()]
+        added = 0
+        engine = shard_engine(DIRECTORY_SHARD)
+        with engine.begin() as conn:
+            for start in range(0, len(rows), COPY_BATCH_SIZE):
+                batch = rows[start : start + COPY_BATCH_SIZE]
+                added += conn.execute(
+                    insert_ignoring_conflicts(engine.dialect.name, UserDirectory.__table__, ["email"]).values(batch)
+                ).rowcount
+        print(f"shard {shard}: {added} of {len(rows)} users added to the directory")
+
+
+def show():
+    with shard_engine(DIRECTORY_SHARD).connect() as conn:
+        rows = conn.execute(
+            select(ShardBucket.shard, ShardBucket.state, func.count(), func.min(ShardBucket.bucket), func.max(ShardBucket.bucket))
+            .group_by(ShardBucket.shard, ShardBucket.state)
+            .order_by(ShardBucket.shard, ShardBucket.state)
+        ).all()
+    for shard, state, count, first, last in rows:
+        print(f"shard {shard} {state}: {count} buckets between {first} and {last}")
+    for shard in range(SHARD_COUNT):
+        with shard_engine(shard).connect() as conn:
+            users = conn.execute(select(func.count()).select_from(User)).scalar()
+        print(f"shard {shard}: {users} users")
+
+
+def _in_range(column, first_id: int, end_id: int):
+    return and_(column >= first_id, column < end_id)
+
+
+def _copy(source, target, table, condition) -> int:
+    copied = 0
+    result = source.execution_options(stream_results=True).execute(select(table).where(condition))
+    for chunk in result.mappings().partitions(COPY_BATCH_SIZE):
+        target.execute(insert(table), [dict(row) for row in chunk])
+        copied += len(chunk)
+    return copied
+
+
+def _move_users(source_shard: int, target_shard: int, first_id: int, end_id: int) -> datetime | None:
+    in_range = lambda column: _in_range(column, first_id, end_id)
+    with shard_engine(source_shard).connect() as source:
+        wallet_ids = source.execute(select(Wallet.id).where(in_range(Wallet.user_id))).scalars().all()
+        oldest = source.execute(select(func.min(Transaction.timestamp)).where(Transaction.wallet_id.in_(wallet_ids))).scalar()
+        moved_transactions = select(Transaction.id).where(Transaction.wallet_id.in_(wallet_ids))
+        plan = [
+            (User.__table__, in_range(User.id)),
+            (Wallet.__table__, in_range(Wallet.user_id)),
+            (Transaction.__table__, Transaction.wallet_id.in_(wallet_ids)),
+            (Hold.__table__, in_range(Hold.payer_id)),
+            (ScheduledTransfer.__table__, in_range(ScheduledTransfer.sender_id)),
+            (TransferSaga.__table__, in_range(TransferSaga.sender_id)),
+            (SagaCredit.__table__, SagaCredit.transaction_id.in_(moved_transactions)),
+            (IdempotencyKey.__table__, in_range(IdempotencyKey.user_id)),
+        ]
+
+        # Target first, in one transaction; rows left by an interrupted earlier attempt are replaced.
+        with shard_engine(target_shard).begin() as target:
+            for table, condition in reversed(plan):
+                target.execute(delete(table).where(condition))
+            for table, condition in plan:
+                print(f"  {table.name}: {_copy(source, target, table, condition)} rows copied")
+    return oldest
+
+
+def _delete_users(shard: int, first_id: int, end_id: int):
+    in_range = lambda column: _in_range(column, first_id, end_id)
+    with shard_engine(shard).begin() as conn:
+        wallet_ids = select(Wallet.id).where(in_range(Wallet.user_id)).scalar_subquery()
+        moved_transactions = select(Transaction.id).where(Transaction.wallet_id.in_(wallet_ids))
+        conn.execute(delete(SagaCredit).where(SagaCredit.transaction_id.in_(moved_transactions)))
+        conn.execute(delete(IdempotencyKey).where(in_range(IdempotencyKey.user_id)))
+        conn.execute(delete(TransferSaga).where(in_range(TransferSaga.sender_id)))
+        conn.execute(delete(ScheduledTransfer).where(in_range(ScheduledTransfer.sender_id)))
+        conn.execute(delete(Hold).where(in_range(Hold.payer_id)))
+        conn.execute(delete(Transaction).where(Transaction.wallet_id.in_(wallet_ids)))
+        conn.execute(delete(Wallet).where(in_range(Wallet.user_id)))
+        conn.execute(delete(User).where(in_range(User.id)))
+
+
+def _rebuild_rollups(shard: int, oldest: datetime):
+    # Rollups are keyed off each shard's id watermark, so moved rows are re-aggregated on both sides.
+    rebuild_from = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+    hot_start = hot_ledger_start()
+    if hot_start is not None:
+        rebuild_from = max(rebuild_from, hot_start)
+    with shard_engine(shard).begin() as conn:
+        rebuild(conn, rebuild_from)
+
+
+def _cross_range_holds(shard: int, first_id: int, end_id: int) -> int:
+    payer_inside = _in_range(Hold.payer_id, first_id, end_id)
+    payee_inside = _in_range(Hold.payee_id, first_id, end_id)
+    with shard_engine(shard).connect() as conn:
+        return conn.execute(
+            select(func.count())
+            .select_from(Hold)
+            .where(
+                Hold.status == "ACTIVE",
+                or_(and_(payer_inside, not_(payee_inside)), and_(not_(payer_inside), payee_inside)),
+            )
+        ).scalar()
+
+
+def move(first_bucket: int, last_bucket: int, target_shard: int, grace_seconds: float):
+    directory = shard_engine(DIRECTORY_SHARD)
+    with directory.connect() as conn:
+        sources = conn.execute(
+            select(ShardBucket.bucket, ShardBucket.shard, ShardBucket.state)
+            .where(ShardBucket.bucket.between(first_bucket, last_bucket), ShardBucket.shard != target_shard)
+            .order_by(ShardBucket.bucket)
+        ).all()
+    if not sources:
+        print("nothing to move")
+        return
+
+    by_source = defaultdict(list)
+    for row in sources:
+        by_source[row.shard].append(row.bucket)
+
+    # A captured hold posts both legs on one shard, so a move must not split a live hold.
+    for source_shard, buckets in by_source.items():
+        for bucket in buckets:
+            if _cross_range_holds(source_shard, bucket * BUCKET_SIZE, (bucket + 1) * BUCKET_SIZE):
+                print(f"bucket {bucket} has active holds with users outside it; settle them first")
+                sys.exit(1)
+
+    bucket_ids = [row.bucket for row in sources]
+    with directory.begin() as conn:
+        conn.execute(
+            update(ShardBucket)
+            .where(ShardBucket.bucket.in_(bucket_ids))
+            .values(state="MOVING", updated_at=datetime.utcnow())
+        )
+    # Every app instance sees MOVING within one map refresh; the grace covers requests already past routing.
+    wait = settings.SHARD_MAP_REFRESH_SECONDS + grace_seconds
+    print(f"marked {len(bucket_ids)} buckets MOVING, waiting {wait:.0f}s for instances to stop routing to them")
+    time.sleep(wait)
+
+    oldest_by_shard = defaultdict(list)
+    for source_shard, buckets in by_source.items():
+        for bucket in buckets:
+            print(f"bucket {bucket}: shard {source_shard} -> {target_shard}")
+            oldest = _move_users(source_shard, target_shard, bucket * BUCKET_SIZE, (bucket + 1) * BUCKET_SIZE)
+            if oldest is not None:
+                oldest_by_shard[source_shard].append(oldest)
+                oldest_by_shard[target_shard].append(oldest)
+
+    with directory.begin() as conn:
+        conn.execute(
+            update(ShardBucket)
+            .where(ShardBucket.bucket.in_(bucket_ids))
+            .values(shard=target_shard, state="ACTIVE", updated_at=datetime.utcnow())
+        )
+    print("bucket map switched")
+
+    for source_shard, buckets in by_source.items():
+        for bucket in buckets:
+            _delete_users(source_shard, bucket * BUCKET_SIZE, (bucket + 1) * BUCKET_SIZE)
+    for shard, oldest in oldest_by_shard.items():
+        _rebuild_rollups(shard, min(oldest))
+    print("source rows deleted and rollups rebuilt")
+
+
+def parse_range(value: str) -> tuple[int, int]:
+    first, _, last = value.partition("-")
+    return int(first), int(last or first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and rebalance the user shard map")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init-sequences", help="Interleave id sequences across shards so rows can move without clashes")
+    commands.add_parser("sync-directory", help="Add users missing from the directory")
+    commands.add_parser("show", help="Print the bucket map and users per shard")
+    move_parser = commands.add_parser("move", help="Move a range of buckets to another shard")
+    move_parser.add_argument("--buckets", type=parse_range, required=True, help="Bucket or inclusive range, e.g. 12-15")
+    move_parser.add_argument("--to", type=int, required=True, dest="target")
+    move_parser.add_argument("--grace-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.command == "init-sequences":
+        init_sequences()
+    elif args.command == "sync-directory":
+        sync_directory()
+    elif args.command == "show":
+        show()
+    else:
+        if not 0 <= args.target < SHARD_COUNT:
+            parser.error(f"--to must be between 0 and {SHARD_COUNT - 1}")
+        move(*args.buckets, args.target, args.grace_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+from app.recipients import DECAY_EPOCH, replace_recipients
+
+
+# Same forward-decay weights as app.recipients.decay_weight, summed per (sender, recipient).
+# Ranges are over wallet ids so each batch is an index range scan on (wallet_id, timestamp).
+SCORES_SQL = """
+    SELECT
+        w.user_id AS sender_id,
+        t.receiver_id,
+        sum(power(2, extract(epoch FROM t.timestamp - :epoch) / :half_life_seconds)) AS score,
+        (array_agg(t.counterparty_name ORDER BY t.timestamp DESC))[1] AS name,
+        (array_agg(t.counterparty_email ORDER BY t.timestamp DESC))[1] AS email
+    FROM transactions t
+    JOIN wallets w ON w.id = t.wallet_id
+    WHERE t.wallet_id >= :first_id AND t.wallet_id < :end_id
+      AND t.type = 'transfer_out'
+      AND t.status = 'SUCCESS'
+      AND t.receiver_id IS NOT NULL
+    GROUP BY w.user_id, t.receiver_id
+"""
+
+
+def rebuild_range(first_id: int, end_id: int) -> int:
+    # first_id/end_id bound wallet ids.
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(SCORES_SQL),
+            {
+                "epoch": DECAY_EPOCH,
+                "half_life_seconds": settings.RECIPIENTS_HALF_LIFE_DAYS * 86400,
+                "first_id": first_id,
+                "end_id": end_id,
+            },
+        ).mappings()
+        by_sender = defaultdict(list)
+        for row in rows:
+            by_sender[row["sender_id"]].append(
+                {"receiver_id": row["receiver_id"], "name": row["name"], "email": row["email"], "score": float(row["score"])}
+            )
+    for sender_id, recipients in by_sender.items():
+        if not replace_recipients(sender_id, recipients):
+            raise SystemExit("Redis is unavailable")
+    return len(by_sender)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the frequent-recipient rankings from the ledger")
+    parser.add_argument("--user-id", type=int, help="Rebuild a single user")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Wallet ids per ledger scan")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        if args.user_id is not None:
+            wallet_id = conn.execute(text("SELECT id FROM wallets WHERE user_id = :user_id"), {"user_id": args.user_id}).scalar()
+            if wallet_id is None:
+                raise SystemExit(f"user {args.user_id} has no wallet")
+        else:
+            max_id = conn.execute(text("SELECT COALESCE(max(id), 0) FROM wallets")).scalar()
+
+    if args.user_id is not None:
+        if not rebuild_range(wallet_id, wallet_id + 1):
+            replace_recipients(args.user_id, [])
+        print(f"rebuilt recipients for user {args.user_id}")
+        return
+
+    total = 0
+    for first_id in range(1, max_id + 1, args.batch_size):
+        total += rebuild_range(first_id, first_id + args.batch_size)
+        print(f"wallets below {first_id + args.batch_size}: {total} rankings rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.archive import archived_wallet_net
+from app.config import settings
+from app.database import engine
+from app.models import INBOUND_TYPES
+
+
+STATE_NAME = "reconciliation"
+STREAM_BATCH_SIZE = 5000
+
+_worker_engine = None
+
+WALLET_NET_SQL = f"""
+    SELECT w.id AS wallet_id, w.balance, COALESCE(t.net, 0) AS ledger_net
+    FROM wallets AS w
+    LEFT JOIN (
+        SELECT
+            wallet_id,
+            SUM(CASE WHEN type IN ({", ".join(f"'{tx_type}'" for tx_type in INBOUND_TYPES)}) THEN amount ELSE -amount END) AS net
+        FROM transactions
+        WHERE status = 'SUCCESS' AND wallet_id BETWEEN :lower AND :upper {{wallet_filter}}
+        GROUP BY wallet_id
+    ) AS t ON t.wallet_id = w.id
+    WHERE w.id BETWEEN :lower AND :upper {{outer_wallet_filter}}
+    ORDER BY w.id
+"""
+
+
+def _init_worker():
+    # Connections must not be shared across forked processes; each worker opens its own.
+    global _worker_engine
+    _worker_engine = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+
+
+def reconcile_range(lower: int, upper: int, wallet_ids: list[int] | None = None) -> dict:
+    params = {"lower": lower, "upper": upper}
+    wallet_filter = outer_wallet_filter = ""
+    if wallet_ids is not None:
+        params["wallet_ids"] = wallet_ids
+        wallet_filter = "AND wallet_id = ANY(:wallet_ids)"
+        outer_wallet_filter = "AND w.id = ANY(:wallet_ids)"
+
+    statement = text(WALLET_NET_SQL.format(wallet_filter=wallet_filter, outer_wallet_filter=outer_wallet_filter))
+    archived = archived_wallet_net(lower, upper)
+
+    checked = 0
+    mismatches = []
+    with _worker_engine.connect() as conn:
+        # Server-side cursor: rows are fetched in batches instead of materialising the whole range.
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE).execute(statement, params)
+        for row in result:
+            checked += 1
+            expected = Decimal(row.ledger_net) + archived.get(row.wallet_id, Decimal("0"))
+            if Decimal(row.balance) != expected:
+                mismatches.append(
+                    {
+                        "wallet_id": row.wallet_id,
+                        "balance": str(row.balance),
+                        "ledger_balance": str(expected),
+                        "difference": str(Decimal(row.balance) - expected),
+                    }
+                )
+    return {"lower": lower, "upper": upper, "checked": checked, "mismatches": mismatches}
+
+
+def full_tasks(range_size: int) -> list[tuple]:
+    with engine.connect() as conn:
+        lower, upper = conn.execute(text("SELECT min(id), max(id) FROM wallets")).one()
+    if lower is None:
+        return []
+    return [(start, min(start + range_size - 1, upper), None) for start in range(lower, upper + 1, range_size)]
+
+
+def incremental_tasks(since_id: int, range_size: int) -> list[tuple]:
+    with engine.connect() as conn:
+        wallet_ids = conn.execute(
+            text("SELECT DISTINCT wallet_id FROM transactions WHERE id > :since_id ORDER BY wallet_id"),
+            {"since_id": since_id},
+        ).scalars().all()
+    return [
+        (chunk[0], chunk[-1], chunk)
+        for chunk in (wallet_ids[index : index + range_size] for index in range(0, len(wallet_ids), range_size))
+    ]
+
+
+def load_last_run_id() -> int:
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO rollup_state (name, last_transaction_id) VALUES (:name, 0) ON CONFLICT (name) DO NOTHING"),
+            {"name": STATE_NAME},
+        )
+        return conn.execute(
+            text("SELECT last_transaction_id FROM rollup_state WHERE name = :name"), {"name": STATE_NAME}
+        ).scalar_one()
+
+
+def save_last_run_id(last_id: int):
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE rollup_state SET last_transaction_id = :last_id, updated_at = now() WHERE name = :name"),
+            {"last_id": last_id, "name": STATE_NAME},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check wallets.balance against the net of SUCCESS transactions")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--range-size", type=int, default=settings.RECONCILE_RANGE_SIZE)
+    parser.add_argument("--incremental", action="store_true", help="Only check wallets with transactions since the last run")
+    parser.add_argument("--report", default="reconciliation_report.json")
+    args = parser.parse_args()
+
+    started_at = datetime.utcnow()
+    with engine.connect() as conn:
+        high_water_id = conn.execute(text("SELECT COALESCE(max(id), 0) FROM transactions")).scalar()
+
+    if args.incremental:
+        tasks = incremental_tasks(load_last_run_id(), args.range_size)
+    else:
+        tasks = full_tasks(args.range_size)
+
+    checked = 0
+    mismatches = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(reconcile_range, *task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            checked += result["checked"]
+            mismatches.extend(result["mismatches"])
+            print(f"[{done}/{len(futures)}] wallets {result['lower']}-{result['upper']}: {len(result['mismatches'])} mismatches")
+
+    mismatches.sort(key=lambda item: item["wallet_id"])
+    report = {
+        "mode": "incremental" if args.incremental else "full",
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.utcnow().isoformat(),
+        "last_transaction_id": high_water_id,
+        "wallets_checked": checked,
+        "mismatch_count": len(mismatches),
+        "mismatches": mismatches,
+    }
+    with open(args.report, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    save_last_run_id(high_water_id)
+    print(f"checked {checked} wallets, {len(mismatches)} mismatches, report written to {args.report}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
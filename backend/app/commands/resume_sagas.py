@@ -0,0 +1,45 @@
+import argparse
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models import TransferSaga
+from app.sagas import run_saga
+from app.sharding import SHARD_COUNT, shard_session
+
+
+def resume_shard(shard: int, cutoff: datetime, batch_size: int) -> dict[str, int]:
+    outcomes = {"COMPLETED": 0, "COMPENSATED": 0, "FAILED": 0}
+    with shard_session(shard) as db:
+        saga_ids = [
+            row.id
+            for row in db.query(TransferSaga.id)
+            .filter(TransferSaga.status == "PENDING", TransferSaga.created_at < cutoff)
+            .order_by(TransferSaga.created_at.asc())
+            .limit(batch_size)
+        ]
+        db.rollback()
+        for saga_id in saga_ids:
+            try:
+                outcome = run_saga(db, saga_id)
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            except Exception as exc:
+                db.rollback()
+                outcomes["FAILED"] += 1
+                print(f"shard {shard}: saga {saga_id} still pending: {exc!r}")
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finish cross-shard transfers whose credit step did not complete")
+    parser.add_argument("--older-than-seconds", type=int, default=settings.SAGA_RESUME_AFTER_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    cutoff = datetime.utcnow() - timedelta(seconds=args.older_than_seconds)
+    for shard in range(SHARD_COUNT):
+        outcomes = resume_shard(shard, cutoff, args.batch_size)
+        print(f"shard {shard}: " + ", ".join(f"{status.lower()}={count}" for status, count in outcomes.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app.archive import archived_until
+from app.config import settings
+from app.database import engine
+from app.rollups import apply_increment, rebuild, refold_recent, verify
+
+
+def hot_ledger_start() -> datetime | None:
+    # Rows before the archive watermark are gone from Postgres; only whole days after it can be recomputed.
+    watermark = archived_until()
+    if watermark is None:
+        return None
+    return watermark.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+def catch_up(batch_size: int) -> int:
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            applied = apply_increment(conn, batch_size)
+        if applied == 0:
+            return total
+        total += applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain hourly and daily transaction rollups")
+    parser.add_argument("--batch-size", type=int, default=settings.ROLLUP_BATCH_SIZE)
+    parser.add_argument("--follow", action="store_true", help="Keep applying new transactions every --interval seconds")
+    parser.add_argument("--interval", type=float, default=settings.ROLLUP_INTERVAL_SECONDS)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute rollups for the hot ledger from scratch")
+    parser.add_argument("--verify", action="store_true", help="Compare rollups against the raw ledger and exit 1 on drift")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        with engine.begin() as conn:
+            rebuild(conn, hot_ledger_start())
+        print("rollups rebuilt")
+
+    if args.verify:
+        with engine.connect() as conn:
+            mismatches = verify(conn, hot_ledger_start())
+        for row in mismatches:
+            print(
+                f"{row['granularity']} wallet_id={row['wallet_id']} bucket={row['bucket']} {row['type']}/{row['status']}: "
+                f"expected count={row['expected_count']} total={row['expected_total']}, "
+                f"rollup count={row['rollup_count']} total={row['rollup_total']}"
+            )
+        print(f"{len(mismatches)} mismatched rollup rows")
+        sys.exit(1 if mismatches else 0)
+
+    last_refold = float("-inf")
+    while True:
+        applied = catch_up(args.batch_size)
+        if applied:
+            print(f"applied {applied} transaction ids")
+        if time.monotonic() - last_refold >= settings.ROLLUP_REFOLD_INTERVAL_SECONDS:
+            with engine.begin() as conn:
+                refold_recent(conn, timedelta(hours=settings.ROLLUP_REFOLD_WINDOW_HOURS))
+            last_refold = time.monotonic()
+        if not args.follow:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+from collections import defaultdict
+
+from app.config import settings
+
+
+SELF_TIME = "(untraced)"
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def critical_path(trace: dict) -> dict[str, float]:
+    # Walks back from the end of the trace, always following the child that finished last; work that
+    # overlapped it (another thread, a background task) is off the critical path and not counted.
+    children = defaultdict(list)
+    for span in trace["spans"]:
+        children[span["parent"]].append(span)
+
+    totals = defaultdict(float)
+
+    def walk(span_id: int, name: str, start: float, end: float):
+        cursor = end
+        for child in sorted(children[span_id], key=lambda span: span["start_ms"] + span["duration_ms"], reverse=True):
+            if child["start_ms"] >= cursor:
+                continue
+            child_end = min(child["start_ms"] + child["duration_ms"], cursor)
+            totals[name] += cursor - child_end
+            walk(child["id"], child["name"], child["start_ms"], child_end)
+            cursor = child["start_ms"]
+        totals[name] += max(0.0, cursor - start)
+
+    walk(0, SELF_TIME, 0.0, trace["duration_ms"])
+    return totals
+
+
+def load(path: str, route: str | None):
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            trace = json.loads(line)
+            if route is None or route in trace["name"]:
+                yield trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise sampled traces into critical-path breakdowns per route")
+    parser.add_argument("path", nargs="?", default=settings.TRACE_EXPORT_PATH)
+    parser.add_argument("--route", help="Only routes whose name contains this, e.g. /wallet/transfer")
+    parser.add_argument("--top", type=int, default=8, help="Span names shown per route")
+    parser.add_argument("--slowest", type=int, default=0, help="Also list the ids of the N slowest traces per route")
+    args = parser.parse_args()
+
+    durations = defaultdict(list)
+    breakdowns = defaultdict(lambda: defaultdict(float))
+    slowest = defaultdict(list)
+    errors = defaultdict(int)
+    for trace in load(args.path, args.route):
+        name = trace["name"]
+        durations[name].append(trace["duration_ms"])
+        for span_name, milliseconds in critical_path(trace).items():
+            breakdowns[name][span_name] += milliseconds
+        slowest[name].append((trace["duration_ms"], trace["trace_id"]))
+        if trace["status"] == "error" or (isinstance(trace["status"], int) and trace["status"] >= 500):
+            errors[name] += 1
+
+    if not durations:
+        print("no traces")
+        return
+
+    for name in sorted(durations, key=lambda name: -sum(durations[name])):
+        values = sorted(durations[name])
+        count = len(values)
+        print(
+            f"{name}  n={count} errors={errors[name]}  p50={percentile(values, 0.5):.1f}ms "
+            f"p95={percentile(values, 0.95):.1f}ms max={values[-1]:.1f}ms"
+        )
+        total = sum(values)
+        ranked = sorted(breakdowns[name].items(), key=lambda item: -item[1])
+        for span_name, milliseconds in ranked[: args.top]:
+            print(f"    {span_name:<48} {milliseconds / count:9.2f}ms  {100 * milliseconds / total:5.1f}%")
+        if len(ranked) > args.top:
+            rest = sum(milliseconds for _, milliseconds in ranked[args.top :])
+            print(f"    {'(other spans)':<48} {rest / count:9.2f}ms  {100 * rest / total:5.1f}%")
+        for duration, trace_id in sorted(slowest[name], reverse=True)[: args.slowest]:
+            print(f"    slow: {trace_id} {duration:.1f}ms")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,122 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 60
 
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.25
+    REDIS_BREAKER_FAILURE_RATE: float = 0.5
+    REDIS_BREAKER_MINIMUM_CALLS: int = 10
+    REDIS_BREAKER_WINDOW_SIZE: int = 50
+    REDIS_BREAKER_OPEN_SECONDS: float = 30.0
+    REDIS_BREAKER_HALF_OPEN_CALLS: int = 3
+    REDIS_BREAKER_PROBE_INTERVAL_SECONDS: float = 5.0
+
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 2.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 900.0
+    OUTBOX_RETENTION_HOURS: int = 72
+    # How long a claimed event stays invisible to other dispatchers while its handler runs.
+    OUTBOX_LEASE_SECONDS: int = 300
+
+    WALLET_STREAM_QUEUE_SIZE: int = 100
+    WALLET_STREAM_RETENTION: int = 1000
+    WALLET_STREAM_REPLAY_LIMIT: int = 500
+    WALLET_STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    TRANSACTION_PARTITION_MONTHS_AHEAD: int = 3
+
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_CHUNK_SIZE: int = 50000
+    ARCHIVE_WALLET_RANGE_SIZE: int = 10000
+
+    ROLLUP_BATCH_SIZE: int = 50000
+    ROLLUP_INTERVAL_SECONDS: float = 30.0
+    ROLLUP_SAFETY_LAG_SECONDS: int = 60
+    # Recent buckets are recomputed this often, covering transactions that committed long after their id was assigned.
+    ROLLUP_REFOLD_INTERVAL_SECONDS: float = 600.0
+    ROLLUP_REFOLD_WINDOW_HOURS: int = 6
+
+    RECONCILE_RANGE_SIZE: int = 10000
+
+    AUTH_RATE_LIMIT_PER_IP: int = 20
+    AUTH_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    AUTH_MAX_IN_FLIGHT: int = 8
+    # Login attempts per email address per AUTH_RATE_LIMIT_WINDOW_SECONDS, whichever IPs they come from.
+    AUTH_LOGIN_RATE_LIMIT_PER_EMAIL: int = 10
+    WALLET_RATE_LIMIT_PER_USER: int = 60
+    WALLET_RATE_LIMIT_PER_IP: int = 300
+    WALLET_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    WALLET_MAX_IN_FLIGHT: int = 32
+    ADMIN_RATE_LIMIT_PER_USER: int = 300
+    ADMIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    ADMIN_MAX_IN_FLIGHT: int = 16
+
+    IDEMPOTENCY_CACHE_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_RETENTION_HOURS: int = 72
+
+    HOLD_DEFAULT_TTL_SECONDS: int = 900
+    HOLD_MAX_TTL_SECONDS: int = 604800
+    HOLD_SWEEP_BATCH_SIZE: int = 500
+    HOLD_SWEEP_INTERVAL_SECONDS: float = 5.0
+
+    SCHEDULED_TRANSFER_BATCH_SIZE: int = 100
+    SCHEDULED_TRANSFER_POLL_INTERVAL_SECONDS: float = 5.0
+    SCHEDULED_TRANSFER_LEASE_SECONDS: int = 300
+    SCHEDULED_TRANSFER_SPREAD_SECONDS: int = 3600
+    SCHEDULED_TRANSFER_RETRY_SECONDS: int = 3600
+    SCHEDULED_TRANSFER_MAX_ATTEMPTS: int = 3
+
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_REDIS_CONNECTIONS: int = 5
+    # Recently active users whose balances are cached at startup; 0 turns it off.
+    WARMUP_PRELOAD_BALANCES: int = 0
+    WARMUP_RETRY_SECONDS: float = 5.0
+    SHUTDOWN_DRAIN_SECONDS: float = 20.0
+
+    # Per process; app.serve sets them for each worker from the SERVE_ totals below.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Threads for sync routes; 0 keeps anyio's default of 40.
+    THREADPOOL_SIZE: int = 0
+
+    SERVE_HOST: str = "0.0.0.0"
+    SERVE_PORT: int = 8000
+    # 0 starts one worker per available CPU, capped by SERVE_DB_CONNECTIONS (see app.serve.worker_count).
+    SERVE_WORKERS: int = 0
+    # Connections one container may hold on each database, split across its workers.
+    # Keep replicas x this below Postgres max_connections, leaving room for the background workers.
+    SERVE_DB_CONNECTIONS: int = 40
+    # 0 means as many as the connections allow (see app.serve.worker_limits); a value only lowers that.
+    SERVE_THREADPOOL_TOTAL: int = 0
+    # How long /ready reports draining before workers stop accepting connections.
+    SERVE_READINESS_GRACE_SECONDS: float = 5.0
+    SERVE_RESTART_BACKOFF_MAX_SECONDS: float = 30.0
+
+    BULK_STATUS_MAX_ITEMS: int = 1000
+    BULK_NOTIFICATION_BATCH_SIZE: int = 100
+
+    RECIPIENTS_HALF_LIFE_DAYS: float = 14.0
+    RECIPIENTS_MAX_TRACKED: int = 50
+
+    # Comma-separated; the first URL also holds the user directory. Empty means a single shard on DATABASE_URL.
+    SHARD_DATABASE_URLS: str = ""
+    SHARD_MAP_REFRESH_SECONDS: float = 30.0
+    SAGA_RESUME_AFTER_SECONDS: int = 60
+
+    # Share of requests and outbox events traced; 0 turns tracing off.
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_EXPORT_PATH: str = "traces.jsonl"
+    TRACE_MAX_SPANS: int = 500
+
+    PROFILER_MAX_SECONDS: float = 60.0
+    # Concurrent /admin/profile sessions per worker process.
+    PROFILER_MAX_SESSIONS: int = 1
+
+    MIGRATION_BATCH_SIZE: int = 10000
+    MIGRATION_BATCH_PAUSE_SECONDS: float = 0.05
+
     class Config:
         env_file = ".env"
 
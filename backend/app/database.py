@@ -4,7 +4,15 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 from app.config import settings
 
 
-engine = create_engine(settings.DATABASE_URL)
+def engine_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -0,0 +1,99 @@
+import hashlib
+import json
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import IdempotencyKey
+from app.utils.metrics import increment
+from app.utils.redis_cache import cache_get_json, cache_set_json
+from app.utils.sql import insert_ignoring_conflicts
+
+
+class IdempotencyKeyMismatch(HTTPException):
+    # A client error, not a failed money movement: routes re-raise it before their FAILED bookkeeping.
+    def __init__(self):
+        super().__init__(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+
+class IdempotencyScope:
+    def __init__(self, user_id: int, endpoint: str, key: str | None, payload: BaseModel):
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.key = key
+        self.request_hash = hashlib.sha256(
+            json.dumps(payload.model_dump(mode="json"), sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    @property
+    def cache_key(self) -> str:
+        return f"idempotency:{self.user_id}:{self.endpoint}:{self.key}"
+
+    def _replay(self, request_hash: str, body: dict, source: str) -> dict:
+        if request_hash != self.request_hash:
+            raise IdempotencyKeyMismatch()
+        increment("idempotent_replays_total", endpoint=self.endpoint, source=source)
+        return body
+
+    def cached_response(self) -> dict | None:
+        if self.key is None:
+            return None
+        cached = cache_get_json(self.cache_key)
+        if cached is None:
+            return None
+        return self._replay(cached["request_hash"], cached["body"], "redis")
+
+    def claim(self, db: Session) -> dict | None:
+        # Must run first inside the money-movement transaction. A concurrent duplicate blocks on
+        # the primary key until this transaction ends, then either replays the stored response
+        # (commit) or takes the claim itself (rollback).
+        if self.key is None:
+            return None
+
+        statement = (
+            insert_ignoring_conflicts(db.get_bind().dialect.name, IdempotencyKey, ["user_id", "endpoint", "key"])
+            .values(user_id=self.user_id, endpoint=self.endpoint, key=self.key, request_hash=self.request_hash)
+            .returning(IdempotencyKey.user_id)
+        )
+        if db.execute(statement).first() is not None:
+            return None
+
+        existing = (
+            db.query(IdempotencyKey.request_hash, IdempotencyKey.response_body)
+            .filter(
+                IdempotencyKey.user_id == self.user_id,
+                IdempotencyKey.endpoint == self.endpoint,
+                IdempotencyKey.key == self.key,
+            )
+            .one()
+        )
+        return self._replay(existing.request_hash, json.loads(existing.response_body), "database")
+
+    def record(self, db: Session, body: dict):
+        if self.key is None:
+            return
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == self.user_id,
+            IdempotencyKey.endpoint == self.endpoint,
+            IdempotencyKey.key == self.key,
+        ).update({IdempotencyKey.response_body: json.dumps(body)}, synchronize_session=False)
+
+    def forget(self, db: Session):
+        if self.key is None:
+            return
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == self.user_id,
+            IdempotencyKey.endpoint == self.endpoint,
+            IdempotencyKey.key == self.key,
+        ).delete(synchronize_session=False)
+
+    def remember(self, body: dict):
+        if self.key is None:
+            return
+        cache_set_json(
+            self.cache_key,
+            {"request_hash": self.request_hash, "body": body},
+            settings.IDEMPOTENCY_CACHE_TTL_SECONDS,
+        )
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Hold, Transaction, TransferSaga, User, Wallet
+from app.outbox import enqueue_cache_invalidation, enqueue_event
+
+
+DAILY_WITHDRAW_LIMIT = Decimal("100")
+DAILY_TRANSFER_LIMIT = Decimal("100")
+
+
+def get_day_window():
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=1)
+    return start, end
+
+
+def get_daily_total(db: Session, wallet_id: int, tx_type: str) -> Decimal:
+    start, end = get_day_window()
+    query = db.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+        Transaction.wallet_id == wallet_id,
+        Transaction.type == tx_type,
+        Transaction.timestamp >= start,
+        Transaction.timestamp < end,
+        Transaction.status == "SUCCESS",
+    )
+    if tx_type != "transfer_out":
+        return Decimal(query.scalar())
+
+    # A hold counts against the day it was authorized, whether it is still active or was captured
+    # later; the transfer_out a capture posts is skipped here so each amount is counted exactly once.
+    captured_today = db.query(Hold.transaction_id).filter(
+        Hold.wallet_id == wallet_id,
+        Hold.status == "CAPTURED",
+        Hold.transaction_id.isnot(None),
+        Hold.settled_at >= start,
+    )
+    # A compensated cross-shard transfer never left the wallet.
+    compensated_today = db.query(TransferSaga.transaction_id).filter(
+        TransferSaga.sender_id == select(Wallet.user_id).where(Wallet.id == wallet_id).scalar_subquery(),
+        TransferSaga.status == "COMPENSATED",
+        TransferSaga.transaction_id.isnot(None),
+        TransferSaga.created_at >= start,
+    )
+    total = query.filter(Transaction.id.notin_(captured_today), Transaction.id.notin_(compensated_today)).scalar()
+    held = (
+        db.query(func.coalesce(func.sum(Hold.amount), 0))
+        .filter(
+            Hold.wallet_id == wallet_id,
+            Hold.status == "ACTIVE",
+            Hold.created_at >= start,
+            Hold.created_at < end,
+        )
+        .scalar()
+    )
+    captured = (
+        db.query(func.coalesce(func.sum(Transaction.amount), 0))
+        .join(Hold, Hold.transaction_id == Transaction.id)
+        .filter(
+            Hold.wallet_id == wallet_id,
+            Hold.status == "CAPTURED",
+            Hold.created_at >= start,
+            Hold.created_at < end,
+            Transaction.wallet_id == wallet_id,
+        )
+        .scalar()
+    )
+    return Decimal(total) + Decimal(held) + Decimal(captured)
+
+
+def available_balance(wallet: Wallet) -> Decimal:
+    return Decimal(wallet.balance) - Decimal(wallet.held)
+
+
+def lock_wallets(db: Session, user_ids: list[int]) -> dict[int, Wallet]:
+    # Always lock in user_id order so two transfers between the same pair cannot deadlock.
+    wallets = (
+        db.query(Wallet)
+        .filter(Wallet.user_id.in_(user_ids))
+        .order_by(Wallet.user_id.asc())
+        .with_for_update()
+        .all()
+    )
+    return {wallet.user_id: wallet for wallet in wallets}
+
+
+def debit_for_transfer(sender: User, sender_wallet: Wallet, receiver: User, amount: Decimal) -> Transaction:
+    sender_wallet.balance = Decimal(sender_wallet.balance) - amount
+    return Transaction(
+        wallet_id=sender_wallet.id,
+        sender_id=sender.id,
+        receiver_id=receiver.id,
+        counterparty_name=receiver.name,
+        counterparty_email=receiver.email,
+        type="transfer_out",
+        amount=amount,
+        status="SUCCESS",
+        balance_after=sender_wallet.balance,
+    )
+
+
+def credit_for_transfer(sender: User, receiver: User, receiver_wallet: Wallet, amount: Decimal) -> Transaction:
+    receiver_wallet.balance = Decimal(receiver_wallet.balance) + amount
+    return Transaction(
+        wallet_id=receiver_wallet.id,
+        sender_id=sender.id,
+        receiver_id=receiver.id,
+        counterparty_name=sender.name,
+        counterparty_email=sender.email,
+        type="transfer_in",
+        amount=amount,
+        status="SUCCESS",
+        balance_after=receiver_wallet.balance,
+    )
+
+
+def post_transfer(
+    db: Session,
+    sender: User,
+    sender_wallet: Wallet,
+    receiver: User,
+    receiver_wallet: Wallet,
+    amount: Decimal,
+) -> tuple[Transaction, Transaction]:
+    # Both wallets must already be locked by the caller's transaction, on the same shard.
+    out_tx = debit_for_transfer(sender, sender_wallet, receiver, amount)
+    in_tx = credit_for_transfer(sender, receiver, receiver_wallet, amount)
+    db.add_all([out_tx, in_tx])
+    enqueue_cache_invalidation(db, f"wallet_transactions:{sender.id}", f"wallet_transactions:{receiver.id}")
+    enqueue_event(db, "email.transfer", to_email=receiver.email, amount=str(amount))
+    return out_tx, in_tx
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import anyio.to_thread
+from fastapi import FastAPI
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.ledger import get_daily_total
+from app.models import Transaction, User, Wallet
+from app.read_models import balance_at, wallet_transaction_rows
+from app.sharding import SHARD_COUNT, shard_engine, shard_session
+from app.utils.metrics import increment, set_gauge
+from app.utils.redis_cache import cache_set_many_json, get_redis_client, redis_call
+
+
+# Statements every worker issues on its first requests: compiling them here puts them in
+# SQLAlchemy's compiled cache before traffic arrives. A missing id keeps them read-only and cheap.
+WARM_QUERIES = (
+    lambda db: db.query(User).filter(User.id == 0).first(),
+    lambda db: db.query(User).filter(User.email == "").first(),
+    lambda db: db.query(Wallet).filter(Wallet.user_id == 0).first(),
+    lambda db: get_daily_total(db, 0, "withdraw"),
+    lambda db: get_daily_total(db, 0, "transfer_out"),
+    lambda db: wallet_transaction_rows(db, 0),
+    lambda db: balance_at(db, 0, datetime.utcnow()),
+)
+
+_state = "starting"
+
+
+def state() -> str:
+    return _state
+
+
+def _set_state(value: str):
+    global _state
+    _state = value
+    set_gauge("app_ready", 1 if value == "ready" else 0)
+
+
+def _open_db_connections():
+    for shard in range(SHARD_COUNT):
+        engine = shard_engine(shard)
+        count = min(settings.WARMUP_DB_CONNECTIONS, engine.pool.size())
+        # Held at the same time so the pool really opens `count` sockets, then handed back.
+        connections = [engine.connect() for _ in range(count)]
+        for connection in connections:
+            connection.close()
+
+
+def _open_redis_connections():
+    def open_connections(client):
+        pool = client.connection_pool
+        connections = [pool.get_connection("PING") for _ in range(settings.WARMUP_REDIS_CONNECTIONS)]
+        try:
+            for connection in connections:
+                connection.send_command("PING")
+                connection.read_response()
+        finally:
+            for connection in connections:
+                pool.release(connection)
+        return True
+
+    if get_redis_client() is not None:
+        redis_call(open_connections)
+
+
+def _warm_statements():
+    for shard in range(SHARD_COUNT):
+        with shard_session(shard) as db:
+            for query in WARM_QUERIES:
+                query(db)
+            db.rollback()
+
+
+def _preload_balances(limit: int):
+    since = datetime.utcnow() - timedelta(days=1)
+    for shard in range(SHARD_COUNT):
+        with shard_session(shard) as db:
+            recent = (
+                select(Transaction.wallet_id)
+                .where(Transaction.timestamp >= since)
+                .group_by(Transaction.wallet_id)
+                .order_by(func.max(Transaction.timestamp).desc())
+                .limit(limit)
+            )
+            rows = db.execute(select(Wallet.user_id, Wallet.balance).where(Wallet.id.in_(recent))).all()
+        cache_set_many_json({f"wallet_balance:{row.user_id}": str(row.balance) for row in rows}, 60)
+
+
+def warm_up():
+    started = time.perf_counter()
+    _open_db_connections()
+    _open_redis_connections()
+    _warm_statements()
+    if settings.WARMUP_PRELOAD_BALANCES > 0:
+        _preload_balances(settings.WARMUP_PRELOAD_BALANCES)
+    set_gauge("app_warmup_seconds", time.perf_counter() - started)
+
+
+async def _warm_up_until_ready():
+    # The process is live (and answers /ready with 503) while this runs; it retries until the
+    # database is reachable rather than taking traffic it cannot serve.
+    while _state == "starting":
+        try:
+            await asyncio.to_thread(warm_up)
+        except Exception:
+            increment("app_warmup_total", result="failed")
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+            continue
+        increment("app_warmup_total", result="ok")
+        _set_state("ready")
+
+
+def begin_drain():
+    # Readiness goes false while requests are still served, so load balancers stop routing here
+    # before the listener closes. app.serve calls it from a signal handler.
+    if _state != "stopping":
+        _set_state("draining")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.THREADPOOL_SIZE > 0:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    _set_state("starting")
+    warm_task = asyncio.create_task(_warm_up_until_ready())
+    try:
+        yield
+    finally:
+        # uvicorn runs this only after it stopped accepting and finished in-flight requests
+        # (timeout_graceful_shutdown), so there is nothing left to drain here.
+        _set_state("stopping")
+        warm_task.cancel()
+        for shard in range(SHARD_COUNT):
+            shard_engine(shard).dispose()
+
@@ -1,13 +1,23 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.config import settings
+from app.lifecycle import lifespan, state
+from app.routes.admin import auth_router as admin_auth_router
 from app.routes.admin import router as admin_router
 from app.routes.auth import router as auth_router
+from app.routes.holds import router as holds_router
+from app.routes.scheduled_transfers import router as scheduled_transfers_router
 from app.routes.users import router as users_router
 from app.routes.wallet import router as wallet_router
+from app.tracing import trace_requests
+from app.utils.metrics import render_metrics
+from app.utils.rate_limit import AdmissionControl, RateLimit
 
 
-app = FastAPI(title="Simple Digital Wallet API")
+app = FastAPI(title="Simple Digital Wallet API", lifespan=lifespan)
+app.middleware("http")(trace_requests)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,12 +27,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(auth_router)
-app.include_router(wallet_router)
+auth_admission = AdmissionControl(
+    "auth",
+    per_ip=RateLimit(settings.AUTH_RATE_LIMIT_PER_IP, settings.AUTH_RATE_LIMIT_WINDOW_SECONDS),
+    max_in_flight=settings.AUTH_MAX_IN_FLIGHT,
+)
+wallet_admission = AdmissionControl(
+    "wallet",
+    per_ip=RateLimit(settings.WALLET_RATE_LIMIT_PER_IP, settings.WALLET_RATE_LIMIT_WINDOW_SECONDS),
+    per_user=RateLimit(settings.WALLET_RATE_LIMIT_PER_USER, settings.WALLET_RATE_LIMIT_WINDOW_SECONDS),
+    max_in_flight=settings.WALLET_MAX_IN_FLIGHT,
+)
+admin_admission = AdmissionControl(
+    "admin",
+    per_user=RateLimit(settings.ADMIN_RATE_LIMIT_PER_USER, settings.ADMIN_RATE_LIMIT_WINDOW_SECONDS),
+    max_in_flight=settings.ADMIN_MAX_IN_FLIGHT,
+)
+
+app.include_router(auth_router, dependencies=[Depends(auth_admission)])
+app.include_router(wallet_router, dependencies=[Depends(wallet_admission)])
+app.include_router(holds_router, dependencies=[Depends(wallet_admission)])
+app.include_router(scheduled_transfers_router, dependencies=[Depends(wallet_admission)])
 app.include_router(users_router)
-app.include_router(admin_router)
+app.include_router(admin_auth_router, dependencies=[Depends(auth_admission)])
+app.include_router(admin_router, dependencies=[Depends(admin_admission)])
 
 
 @app.get("/")
 def root():
     return {"message": "Simple Digital Wallet API"}
+
+
+@app.get("/ready")
+def ready():
+    # "/" stays a liveness check; this one is for load balancers and rolling deploys.
+    current = state()
+    if current != "ready":
+        return JSONResponse(status_code=503, content={"status": current})
+    return {"status": current}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return render_metrics()
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String, Text
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -8,6 +8,10 @@ from app.database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -27,22 +31,208 @@ class Wallet(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     balance = Column(Numeric(12, 2), default=0, nullable=False)
+    # Sum of ACTIVE holds; spendable funds are balance - held.
+    held = Column(Numeric(12, 2), default=0, nullable=False)
 
     user = relationship("User", back_populates="wallet")
     transactions = relationship("Transaction", back_populates="wallet")
 
 
+INBOUND_TYPES = ("deposit", "transfer_in", "transfer_reversal")
+OUTBOUND_TYPES = ("withdraw", "transfer_out")
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    # In Postgres this is range-partitioned by month on timestamp with primary key (id, timestamp),
+    # see migration 0011 and app/partitions.py. ids stay unique through the shared sequence.
+    __table_args__ = (Index("ix_transactions_wallet_id_timestamp", "wallet_id", "timestamp"),)
 
     id = Column(Integer, primary_key=True, index=True)
     wallet_id = Column(Integer, ForeignKey("wallets.id"), nullable=False)
-    sender_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    receiver_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # No foreign keys to users: the other party of a cross-shard transfer is in another database.
+    sender_id = Column(Integer, nullable=True)
+    receiver_id = Column(Integer, nullable=True)
+    # Copied from the other party at write time so history reads never join users.
+    counterparty_name = Column(String, nullable=True)
+    counterparty_email = Column(String, nullable=True)
     type = Column(String, nullable=False)
     amount = Column(Numeric(12, 2), nullable=False)
     status = Column(String, nullable=False, default="SUCCESS")
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Wallet balance right after this row was applied, written under the wallet row lock.
+    # NULL for FAILED rows.
+    balance_after = Column(Numeric(12, 2), nullable=True)
 
     wallet = relationship("Wallet", back_populates="transactions")
 
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_pending", "available_at", "id", postgresql_where="status = 'PENDING'"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="PENDING")
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+
+class Hold(Base):
+    __tablename__ = "holds"
+    __table_args__ = (
+        Index("ix_holds_expiring", "expires_at", "id", postgresql_where="status = 'ACTIVE'"),
+        Index("ix_holds_wallet_id_created_at", "wallet_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    wallet_id = Column(Integer, ForeignKey("wallets.id"), nullable=False)
+    payer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    payee_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    amount = Column(Numeric(12, 2), nullable=False)
+    # ACTIVE -> CAPTURED | VOIDED | EXPIRED
+    status = Column(String, nullable=False, default="ACTIVE")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    settled_at = Column(DateTime, nullable=True)
+    # The transfer_out row a capture posted; no foreign key because transactions is partitioned.
+    transaction_id = Column(Integer, nullable=True)
+
+
+class ScheduledTransfer(Base):
+    __tablename__ = "scheduled_transfers"
+    __table_args__ = (
+        Index("ix_scheduled_transfers_due", "next_run_at", "id", postgresql_where="status = 'ACTIVE'"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    sender_id = Column(Integer, nullable=False, index=True)
+    # May be on another shard, so no foreign key.
+    receiver_id = Column(Integer, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    # once | daily | weekly | monthly
+    interval = Column(String, nullable=False)
+    # Day of month monthly runs are anchored to, so a 31st schedule returns to the 31st after February.
+    anchor_day = Column(Integer, nullable=False)
+    # ACTIVE -> COMPLETED | CANCELLED
+    status = Column(String, nullable=False, default="ACTIVE")
+    # scheduled_for is the nominal occurrence; next_run_at adds the per-schedule spread offset.
+    scheduled_for = Column(DateTime, nullable=False)
+    next_run_at = Column(DateTime, nullable=False)
+    claimed_until = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    run_count = Column(Integer, nullable=False, default=0)
+    last_run_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AdminAuditLog(Base):
+    __tablename__ = "admin_audit_log"
+
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(Integer, nullable=False, index=True)
+    action = Column(String, nullable=False)
+    # JSON: what was requested and the per-item outcome.
+    details = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UserDirectory(Base):
+    # Lives on the first shard only: allocates globally unique user ids and maps emails to them.
+    __tablename__ = "user_directory"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ShardBucket(Base):
+    # Lives on the first shard only: which shard holds each range of app.sharding.BUCKET_SIZE user ids.
+    __tablename__ = "shard_buckets"
+
+    bucket = Column(Integer, primary_key=True)
+    shard = Column(Integer, nullable=False)
+    # ACTIVE | MOVING
+    state = Column(String, nullable=False, default="ACTIVE")
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class TransferSaga(Base):
+    # Cross-shard transfer, stored on the sender's shard next to its transfer_out row.
+    __tablename__ = "transfer_sagas"
+    __table_args__ = (
+        Index("ix_transfer_sagas_pending", "created_at", postgresql_where="status = 'PENDING'"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    sender_id = Column(Integer, nullable=False, index=True)
+    receiver_id = Column(Integer, nullable=False)
+    # Copied at debit time so a compensation never has to reach the receiver's shard.
+    receiver_name = Column(String, nullable=True)
+    receiver_email = Column(String, nullable=True)
+    # The transfer_out row on the sender's shard; no foreign key because transactions is partitioned.
+    transaction_id = Column(Integer, nullable=True)
+    amount = Column(Numeric(12, 2), nullable=False)
+    # PENDING -> COMPLETED | COMPENSATED
+    status = Column(String, nullable=False, default="PENDING")
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SagaCredit(Base):
+    # Written on the receiver's shard in the same transaction as the credit, so retries apply it once.
+    __tablename__ = "saga_credits"
+
+    saga_id = Column(String(32), primary_key=True)
+    transaction_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class HourlyTransactionRollup(Base):
+    __tablename__ = "transaction_rollups_hourly"
+
+    # wallet_id 0 holds the global totals across all wallets.
+    wallet_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    tx_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(18, 2), nullable=False, default=0)
+
+
+class DailyTransactionRollup(Base):
+    __tablename__ = "transaction_rollups_daily"
+
+    wallet_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    tx_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(18, 2), nullable=False, default=0)
+
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    name = Column(String, primary_key=True)
+    last_transaction_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(Integer, primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,52 @@
+import json
+
+from sqlalchemy.orm import Session
+
+from app.models import OutboxEvent
+from app.utils.email import (
+    send_admin_deposit_email,
+    send_freeze_email,
+    send_status_emails,
+    send_transfer_email,
+    send_unfreeze_email,
+)
+from app.utils.logger import log_transaction_event
+from app.utils.redis_cache import redis_call
+
+
+def enqueue_event(db: Session, event_type: str, **payload):
+    if event_type not in EVENT_HANDLERS:
+        raise ValueError(f"Unknown outbox event type: {event_type}")
+    db.add(OutboxEvent(event_type=event_type, payload=json.dumps(payload, default=str)))
+
+
+def enqueue_cache_invalidation(db: Session, *keys: str):
+    enqueue_event(db, "cache.delete", keys=list(keys))
+
+
+_REDIS_UNAVAILABLE = object()
+
+
+def _delete_cache_keys(payload: dict):
+    # redis_call swallows failures; raising instead leaves the event PENDING so the dispatcher retries it.
+    if not payload["keys"]:
+        return
+    result = redis_call(lambda client: client.delete(*payload["keys"]), default=_REDIS_UNAVAILABLE)
+    if result is _REDIS_UNAVAILABLE:
+        raise ConnectionError("Redis unavailable, cache keys not deleted")
+
+
+EVENT_HANDLERS = {
+    "email.transfer": lambda payload: send_transfer_email(payload["to_email"], payload["amount"]),
+    "email.admin_deposit": lambda payload: send_admin_deposit_email(payload["to_email"], payload["amount"]),
+    "email.freeze": lambda payload: send_freeze_email(payload["to_email"]),
+    "email.unfreeze": lambda payload: send_unfreeze_email(payload["to_email"]),
+    "email.freeze_batch": lambda payload: send_status_emails(
+        payload["to_emails"], "Account Freeze Notification", "Your account has been frozen by admin."
+    ),
+    "email.unfreeze_batch": lambda payload: send_status_emails(
+        payload["to_emails"], "Account Reactivation Notification", "Your account has been reactivated by admin."
+    ),
+    "log.transaction": lambda payload: log_transaction_event(payload["message"]),
+    "cache.delete": _delete_cache_keys,
+}
@@ -0,0 +1,97 @@
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+PARENT_TABLE = "transactions"
+DEFAULT_PARTITION = "transactions_default"
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def list_partitions(conn: Connection) -> dict[str, tuple[date, date] | None]:
+    rows = conn.execute(
+        text(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+            """
+        ),
+        {"parent": PARENT_TABLE},
+    ).all()
+
+    partitions = {}
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            partitions[name] = None
+            continue
+        # FOR VALUES FROM ('2026-10-01 00:00:00') TO ('2026-11-01 00:00:00')
+        lower, upper = (part.split("'")[1] for part in bound.split(" TO "))
+        partitions[name] = (datetime.fromisoformat(lower).date(), datetime.fromisoformat(upper).date())
+    return partitions
+
+
+def create_month_partition(conn: Connection, month: date) -> bool:
+    name = partition_name(month)
+    if name in list_partitions(conn):
+        return False
+
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    has_default_rows = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :lower AND timestamp < :upper)"),
+        {"lower": lower, "upper": upper},
+    ).scalar()
+
+    if not has_default_rows:
+        conn.execute(
+            text(f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+        )
+        return True
+
+    # Rows that landed in the default partition block a plain CREATE ... PARTITION OF for their range,
+    # so move them into a standalone table first and attach it.
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :lower AND timestamp < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    return True
+
+
+def ensure_future_partitions(conn: Connection, months_ahead: int, today: date | None = None) -> list[str]:
+    current = month_start(today or date.today())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_month_partition(conn, month):
+            created.append(partition_name(month))
+    return created
+
+
+def detach_partitions_before(conn: Connection, cutoff: date) -> list[str]:
+    detached = []
+    for name, bounds in sorted(list_partitions(conn).items()):
+        if bounds is None or bounds[1] > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        detached.append(name)
+    return detached
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+
+from app.config import settings
+from app.utils.metrics import increment
+
+
+# Where threads with nothing to do sit. A stack ending here with no app frame in it is skipped,
+# so idle pool threads and the event loop waiting on sockets do not drown out real work.
+IDLE_LEAVES = {
+    "threading:Condition.wait",
+    "selectors:EpollSelector.select",
+    # With uvloop the event loop waits in C, so its idle leaf is the runner itself.
+    "asyncio.runners:Runner.run",
+    "concurrent.futures.thread:_worker",
+}
+
+# Nothing is installed and no thread runs unless a session is in progress.
+_slots = threading.BoundedSemaphore(settings.PROFILER_MAX_SESSIONS)
+
+
+def _sample(seconds: float, interval: float, include_idle: bool) -> tuple[Counter, int]:
+    own_thread = threading.get_ident()
+    labels = {}
+    stacks = Counter()
+    samples = 0
+    next_tick = time.monotonic()
+    deadline = next_tick + seconds
+    while next_tick < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+                stack.append(label)
+                frame = frame.f_back
+            if not include_idle and stack[0] in IDLE_LEAVES and not any(label.startswith("app.") for label in stack):
+                continue
+            stacks[";".join(reversed(stack))] += 1
+        samples += 1
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    return stacks, samples
+
+
+async def profile(seconds: float, interval: float, include_idle: bool = False) -> tuple[Counter, int] | None:
+    # Returns None when this worker already runs as many sessions as allowed.
+    if not _slots.acquire(blocking=False):
+        increment("profiler_sessions_total", result="busy")
+        return None
+    try:
+        increment("profiler_sessions_total", result="started")
+        return await asyncio.to_thread(_sample, seconds, interval, include_idle)
+    finally:
+        _slots.release()
+
+
+def render_collapsed(stacks: Counter) -> str:
+    # Brendan Gregg's folded format: "root;child;leaf count", one stack per line.
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,207 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from app.archive import merge_with_archive, read_archived_rows
+from app.models import INBOUND_TYPES, DailyTransactionRollup, HourlyTransactionRollup, Transaction, User, Wallet
+from app.rollups import GLOBAL_WALLET_ID
+from app.utils.sql import escape_like, estimate_row_count
+
+
+USER_LIST_COLUMNS = (User.id, User.name, User.email, User.is_active, User.is_admin, User.is_frozen)
+
+TRANSACTION_COLUMNS = (
+    Transaction.id,
+    Transaction.wallet_id,
+    Transaction.type,
+    Transaction.amount,
+    Transaction.timestamp,
+    Transaction.counterparty_name,
+    Transaction.balance_after,
+)
+TRANSACTION_COLUMN_NAMES = tuple(column.key for column in TRANSACTION_COLUMNS)
+
+
+def list_user_rows(db: Session) -> list[dict]:
+    statement = select(*USER_LIST_COLUMNS).order_by(User.id.asc())
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+def _user_filters(is_active: bool | None, is_frozen: bool | None, is_admin: bool | None, search: str | None) -> list:
+    filters = []
+    if is_active is not None:
+        filters.append(User.is_active == is_active)
+    if is_frozen is not None:
+        filters.append(User.is_frozen == is_frozen)
+    if is_admin is not None:
+        filters.append(User.is_admin == is_admin)
+    if search:
+        pattern = f"%{escape_like(search)}%"
+        filters.append(or_(User.name.ilike(pattern, escape="/"), User.email.ilike(pattern, escape="/")))
+    return filters
+
+
+def user_page(
+    db: Session,
+    limit: int,
+    after_id: int | None = None,
+    is_active: bool | None = None,
+    is_frozen: bool | None = None,
+    is_admin: bool | None = None,
+    search: str | None = None,
+) -> dict:
+    filters = _user_filters(is_active, is_frozen, is_admin, search)
+
+    statement = (
+        select(*USER_LIST_COLUMNS, Wallet.balance)
+        .outerjoin(Wallet, Wallet.user_id == User.id)
+        .where(*filters)
+        .order_by(User.id.asc())
+        .limit(limit + 1)
+    )
+    if after_id is not None:
+        statement = statement.where(User.id > after_id)
+
+    rows = [dict(row) for row in db.execute(statement).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"]
+
+    return {
+        "items": rows,
+        "next_cursor": next_cursor,
+        "estimated_total": estimate_row_count(db, select(User.id).where(*filters)),
+    }
+
+
+def merge_user_pages(pages: list[dict], limit: int) -> dict:
+    rows = sorted((row for page in pages for row in page["items"]), key=lambda row: row["id"])
+    next_cursor = None
+    if len(rows) > limit or any(page["next_cursor"] is not None for page in pages):
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"] if rows else None
+    return {
+        "items": rows,
+        "next_cursor": next_cursor,
+        "estimated_total": sum(page["estimated_total"] for page in pages),
+    }
+
+
+def wallet_transaction_rows(
+    db: Session,
+    wallet_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[dict]:
+    statement = (
+        select(*TRANSACTION_COLUMNS)
+        .where(Transaction.wallet_id == wallet_id)
+        .order_by(Transaction.timestamp.desc())
+    )
+    # Bounds on timestamp let Postgres prune monthly partitions outside the range.
+    if since is not None:
+        statement = statement.where(Transaction.timestamp >= since)
+    if until is not None:
+        statement = statement.where(Transaction.timestamp < until)
+    rows = [dict(row) for row in db.execute(statement).mappings()]
+    return merge_with_archive(rows, wallet_id, TRANSACTION_COLUMN_NAMES, since=since, until=until)
+
+
+def balance_at(db: Session, wallet_id: int, at: datetime) -> Decimal:
+    # Balance after the last successful row before `at`: one backward index scan on
+    # (wallet_id, timestamp) instead of summing the wallet's history.
+    statement = (
+        select(Transaction.balance_after)
+        .where(
+            Transaction.wallet_id == wallet_id,
+            Transaction.timestamp < at,
+            Transaction.balance_after.is_not(None),
+        )
+        .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+        .limit(1)
+    )
+    balance = db.execute(statement).scalar()
+    if balance is not None:
+        return balance
+
+    archived = [
+        row
+        for row in read_archived_rows(wallet_id, ("id", "timestamp", "balance_after"), until=at)
+        if row["balance_after"] is not None
+    ]
+    if archived:
+        return max(archived, key=lambda row: (row["timestamp"], row["id"]))["balance_after"]
+    return _replayed_balance(db, wallet_id, at)
+
+
+def _replayed_balance(db: Session, wallet_id: int, at: datetime) -> Decimal:
+    # Only reached when every row before `at` predates balance_after. Wallets open at zero, so the
+    # signed sum of the successful rows before `at` is the balance.
+    hot = db.execute(
+        select(Transaction.id, Transaction.type, Transaction.amount).where(
+            Transaction.wallet_id == wallet_id,
+            Transaction.timestamp < at,
+            Transaction.status == "SUCCESS",
+        )
+    ).all()
+    hot_ids = {row.id for row in hot}
+    archived = [
+        row
+        for row in read_archived_rows(wallet_id, ("id", "type", "amount", "status"), until=at)
+        if row["status"] == "SUCCESS" and row["id"] not in hot_ids
+    ]
+    balance = Decimal("0.00")
+    for row_type, amount in [(row.type, row.amount) for row in hot] + [(row["type"], row["amount"]) for row in archived]:
+        balance += amount if row_type in INBOUND_TYPES else -amount
+    return balance
+
+
+ROLLUP_MODELS = {"hour": HourlyTransactionRollup, "day": DailyTransactionRollup}
+
+
+def rollup_totals(db: Session, wallet_id: int, since: datetime, until: datetime) -> list[dict]:
+    rollup = DailyTransactionRollup
+    statement = (
+        select(
+            rollup.type,
+            rollup.status,
+            func.sum(rollup.tx_count).label("count"),
+            func.sum(rollup.total_amount).label("total"),
+        )
+        .where(rollup.wallet_id == wallet_id, rollup.bucket >= since, rollup.bucket < until)
+        .group_by(rollup.type, rollup.status)
+        .order_by(rollup.type, rollup.status)
+    )
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+def global_rollup_buckets(db: Session, granularity: str, since: datetime, until: datetime) -> list[dict]:
+    rollup = ROLLUP_MODELS[granularity]
+    statement = (
+        select(
+            rollup.bucket,
+            rollup.type,
+            rollup.status,
+            rollup.tx_count.label("count"),
+            rollup.total_amount.label("total"),
+        )
+        .where(rollup.wallet_id == GLOBAL_WALLET_ID, rollup.bucket >= since, rollup.bucket < until)
+        .order_by(rollup.bucket, rollup.type, rollup.status)
+    )
+    return [dict(row) for row in db.execute(statement).mappings()]
+
+
+def merge_rollup_buckets(shard_rows: list[list[dict]]) -> list[dict]:
+    merged = {}
+    for rows in shard_rows:
+        for row in rows:
+            key = (row["bucket"], row["type"], row["status"])
+            if key in merged:
+                merged[key]["count"] += row["count"]
+                merged[key]["total"] += row["total"]
+            else:
+                merged[key] = dict(row)
+    return [merged[key] for key in sorted(merged)]
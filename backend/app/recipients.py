@@ -0,0 +1,98 @@
+import json
+import math
+from datetime import datetime
+
+from app.config import settings
+from app.utils.redis_cache import get_redis_client, redis_call
+
+
+# Forward decay: a transfer at time t adds 2^((t - DECAY_EPOCH) / half-life) to the recipient's score.
+# Newer transfers weigh more without ever rewriting old scores, and a bulk rebuild from the ledger
+# produces exactly the scores the live increments would have. With a 14-day half-life scores fit
+# in a double for decades; moving DECAY_EPOCH forward and rebuilding rescales them.
+DECAY_EPOCH = datetime(2026, 1, 1)
+
+# Bump the score, remember how to display the recipient, and keep only the top entries.
+RECORD_SCRIPT = """
+redis.call('ZINCRBY', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+local evicted = redis.call('ZRANGE', KEYS[1], 0, -(tonumber(ARGV[4]) + 1))
+if #evicted > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[4]) + 1))
+    redis.call('HDEL', KEYS[2], unpack(evicted))
+end
+return #evicted
+"""
+
+_record_script = None
+
+
+def scores_key(user_id: int) -> str:
+    return f"recipients:{user_id}"
+
+
+def details_key(user_id: int) -> str:
+    return f"recipients_details:{user_id}"
+
+
+def decay_weight(at: datetime) -> float:
+    half_life_seconds = settings.RECIPIENTS_HALF_LIFE_DAYS * 86400
+    return math.pow(2, (at - DECAY_EPOCH).total_seconds() / half_life_seconds)
+
+
+def _details(receiver_id: int, name: str | None, email: str | None) -> str:
+    return json.dumps({"user_id": receiver_id, "name": name, "email": email})
+
+
+def _get_record_script():
+    global _record_script
+    if _record_script is None:
+        client = get_redis_client()
+        if client is None:
+            return None
+        _record_script = client.register_script(RECORD_SCRIPT)
+    return _record_script
+
+
+def record_recipient(sender_id: int, receiver_id: int, name: str | None, email: str | None, at: datetime):
+    # Called after the transfer commits; a lost update is repaired by app.commands.rebuild_recipients.
+    script = _get_record_script()
+    if script is None:
+        return
+    redis_call(
+        lambda client: script(
+            keys=[scores_key(sender_id), details_key(sender_id)],
+            args=[decay_weight(at), receiver_id, _details(receiver_id, name, email), settings.RECIPIENTS_MAX_TRACKED],
+            client=client,
+        )
+    )
+
+
+def frequent_recipients(user_id: int, limit: int) -> list[dict]:
+    def read(client):
+        members = client.zrevrange(scores_key(user_id), 0, limit - 1)
+        if not members:
+            return []
+        return client.hmget(details_key(user_id), members)
+
+    details = redis_call(read, default=[])
+    return [json.loads(item) for item in details if item is not None]
+
+
+def replace_recipients(user_id: int, rows: list[dict]):
+    # rows: {"receiver_id", "name", "email", "score"}; the whole set is swapped in one MULTI.
+    top = sorted(rows, key=lambda row: row["score"], reverse=True)[: settings.RECIPIENTS_MAX_TRACKED]
+
+    def write(client):
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(scores_key(user_id), details_key(user_id))
+        if top:
+            pipe.zadd(scores_key(user_id), {row["receiver_id"]: row["score"] for row in top})
+            pipe.hset(
+                details_key(user_id),
+                mapping={row["receiver_id"]: _details(row["receiver_id"], row["name"], row["email"]) for row in top},
+            )
+        pipe.execute()
+        return True
+
+    return redis_call(write, default=False)
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+
+
+GLOBAL_WALLET_ID = 0
+STATE_NAME = "transactions"
+ROLLUP_TABLES = {
+    "hour": "transaction_rollups_hourly",
+    "day": "transaction_rollups_daily",
+}
+
+
+def _aggregate_sql(granularity: str, where: str) -> str:
+    # One pass produces both the per-wallet rows and the global (wallet_id 0) rows.
+    return f"""
+        SELECT
+            COALESCE(wallet_id, {GLOBAL_WALLET_ID}) AS wallet_id,
+            date_trunc('{granularity}', timestamp) AS bucket,
+            type,
+            status,
+            count(*) AS tx_count,
+            sum(amount) AS total_amount
+        FROM transactions
+        WHERE {where}
+        GROUP BY GROUPING SETS (
+            (date_trunc('{granularity}', timestamp), wallet_id, type, status),
+            (date_trunc('{granularity}', timestamp), type, status)
+        )
+    """
+
+
+def _merge_into(conn: Connection, granularity: str, where: str, params: dict):
+    table = ROLLUP_TABLES[granularity]
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {table} AS rollup (wallet_id, bucket, type, status, tx_count, total_amount)
+            {_aggregate_sql(granularity, where)}
+            ON CONFLICT (wallet_id, bucket, type, status) DO UPDATE
+            SET tx_count = rollup.tx_count + EXCLUDED.tx_count,
+                total_amount = rollup.total_amount + EXCLUDED.total_amount
+            """
+        ),
+        params,
+    )
+
+
+def _lock_state(conn: Connection) -> int:
+    return conn.execute(
+        text("SELECT last_transaction_id FROM rollup_state WHERE name = :name FOR UPDATE"),
+        {"name": STATE_NAME},
+    ).scalar_one()
+
+
+def _safe_upper_id(conn: Connection, after_id: int, batch_size: int) -> int | None:
+    # Ids are assigned before commit, so a lower id can still be in flight when a higher one is
+    # visible. Only rows older than the lag are folded in, which leaves most in-flight ids behind the
+    # mark; a transaction open for longer than the lag is caught by refold_recent instead.
+    safe_before = datetime.utcnow() - timedelta(seconds=settings.ROLLUP_SAFETY_LAG_SECONDS)
+    return conn.execute(
+        text(
+            """
+            SELECT max(id) FROM (
+                SELECT id FROM transactions
+                WHERE id > :after_id AND timestamp <= :safe_before
+                ORDER BY id
+                LIMIT :batch_size
+            ) AS pending
+            """
+        ),
+        {"after_id": after_id, "safe_before": safe_before, "batch_size": batch_size},
+    ).scalar()
+
+
+def _set_state(conn: Connection, last_id: int):
+    conn.execute(
+        text("UPDATE rollup_state SET last_transaction_id = :last_id, updated_at = now() WHERE name = :name"),
+        {"last_id": last_id, "name": STATE_NAME},
+    )
+
+
+def apply_increment(conn: Connection, batch_size: int) -> int:
+    last_id = _lock_state(conn)
+    upper_id = _safe_upper_id(conn, last_id, batch_size)
+    if upper_id is None:
+        return 0
+
+    params = {"lower_id": last_id, "upper_id": upper_id}
+    for granularity in ROLLUP_TABLES:
+        _merge_into(conn, granularity, "id > :lower_id AND id <= :upper_id", params)
+    _set_state(conn, upper_id)
+    return upper_id - last_id
+
+
+def refold_recent(conn: Connection, window: timedelta):
+    # Recomputes the recent buckets up to the mark from the table itself, so a row whose id the mark
+    # passed before its transaction committed is counted once it becomes visible within the window.
+    last_id = _lock_state(conn)
+    since = datetime.utcnow() - window
+    lower_bounds = {
+        "hour": since.replace(minute=0, second=0, microsecond=0),
+        "day": since.replace(hour=0, minute=0, second=0, microsecond=0),
+    }
+    for granularity, table in ROLLUP_TABLES.items():
+        params = {"upper_id": last_id, "lower_bound": lower_bounds[granularity]}
+        conn.execute(text(f"DELETE FROM {table} WHERE bucket >= :lower_bound"), params)
+        _merge_into(conn, granularity, "id <= :upper_id AND timestamp >= :lower_bound", params)
+
+
+def rebuild(conn: Connection, rebuild_from: datetime | None):
+    # Buckets before rebuild_from are only in the rollups once their rows are archived, so they are kept.
+    last_id = _lock_state(conn)
+    upper_id = _safe_upper_id(conn, 0, 2**31 - 1) or 0
+    lower_bound = rebuild_from or datetime.min
+
+    for granularity, table in ROLLUP_TABLES.items():
+        conn.execute(text(f"DELETE FROM {table} WHERE bucket >= :lower_bound"), {"lower_bound": lower_bound})
+        _merge_into(
+            conn,
+            granularity,
+            "id <= :upper_id AND timestamp >= :lower_bound",
+            {"upper_id": max(upper_id, last_id), "lower_bound": lower_bound},
+        )
+    _set_state(conn, max(upper_id, last_id))
+
+
+def verify(conn: Connection, verify_from: datetime | None) -> list[dict]:
+    last_id = conn.execute(
+        text("SELECT last_transaction_id FROM rollup_state WHERE name = :name"), {"name": STATE_NAME}
+    ).scalar_one()
+    lower_bound = verify_from or datetime.min
+
+    mismatches = []
+    for granularity, table in ROLLUP_TABLES.items():
+        rows = conn.execute(
+            text(
+                f"""
+                WITH expected AS ({_aggregate_sql(granularity, "id <= :last_id AND timestamp >= :lower_bound")})
+                SELECT
+                    COALESCE(e.wallet_id, r.wallet_id) AS wallet_id,
+                    COALESCE(e.bucket, r.bucket) AS bucket,
+                    COALESCE(e.type, r.type) AS type,
+                    COALESCE(e.status, r.status) AS status,
+                    e.tx_count AS expected_count,
+                    r.tx_count AS rollup_count,
+                    e.total_amount AS expected_total,
+                    r.total_amount AS rollup_total
+                FROM expected e
+                FULL OUTER JOIN (SELECT * FROM {table} WHERE bucket >= :lower_bound) r
+                  ON r.wallet_id = e.wallet_id AND r.bucket = e.bucket AND r.type = e.type AND r.status = e.status
+                WHERE e.tx_count IS DISTINCT FROM r.tx_count OR e.total_amount IS DISTINCT FROM r.total_amount
+                """
+            ),
+            {"last_id": last_id, "lower_bound": lower_bound},
+        ).mappings()
+        mismatches.extend({"granularity": granularity, **row} for row in rows)
+    return mismatches
@@ -1,28 +1,54 @@
+import os
+from collections import defaultdict
+from datetime import datetime
 from decimal import Decimal
+from typing import Literal
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 
-from app.auth import create_access_token, hash_password, require_admin, verify_password
-from app.database import get_db
+from app.accounts import account_row, create_accounts
+from app.auth import create_access_token, get_user_db, hash_password, require_admin, verify_password
+from app.config import settings
+from app.idempotency import IdempotencyKeyMismatch, IdempotencyScope
 from app.models import Transaction, User, Wallet
+from app.outbox import enqueue_cache_invalidation, enqueue_event
+from app.partitions import add_months, month_start
+from app.profiler import profile, render_collapsed
+from app.read_models import (
+    global_rollup_buckets,
+    merge_rollup_buckets,
+    merge_user_pages,
+    user_page,
+    wallet_transaction_rows,
+)
 from app.schemas import (
     AdminDepositRequest,
+    BulkUserStatusRequest,
+    BulkUserStatusResponse,
     FreezeUserRequest,
     LoginRequest,
     MessageResponse,
     RegisterRequest,
+    StatsResponse,
     TokenResponse,
     TransactionResponse,
-    UserListResponse,
+    UserPageResponse,
     UserStatusRequest,
+    UtcDateTime,
 )
-from app.utils.email import send_admin_deposit_email, send_freeze_email, send_unfreeze_email
-from app.utils.logger import log_transaction_event
+from app.sharding import email_session, for_each_shard, locate_user
+from app.user_status import apply_bulk_status
+from app.utils.rate_limit import RateLimit, enforce_key_rate_limit
 from app.utils.redis_cache import cache_delete, cache_set_json
+from app.utils.responses import FastJSONResponse
+from app.utils.wallet_events import publish_wallet_update, transaction_event
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
+# Register and login take no token, so they are admitted like /auth (per IP) rather than per admin user.
+auth_router = APIRouter(prefix="/admin", tags=["admin"])
 
 
 def validate_amount_gt_zero(amount: Decimal):
@@ -30,32 +56,26 @@ def validate_amount_gt_zero(amount: Decimal):
         raise HTTPException(status_code=400, detail="Amount must be greater than zero")
 
 
-@router.post("/register", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-def admin_register(payload: RegisterRequest, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == payload.email).first()
-    if existing:
+@auth_router.post("/register", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
+def admin_register(payload: RegisterRequest):
+    if locate_user(payload.email) is not None:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    row = account_row(payload.name, payload.email, hash_password(payload.password), is_admin=True)
+    if not create_accounts([row]):
         raise HTTPException(status_code=400, detail="Email already registered")
-
-    user = User(
-        name=payload.name,
-        email=payload.email,
-        password_hash=hash_password(payload.password),
-        is_active=True,
-        is_admin=True,
-    )
-    db.add(user)
-    db.flush()
-
-    wallet = Wallet(user_id=user.id, balance=Decimal("0.00"))
-    db.add(wallet)
-    db.commit()
 
     return {"message": "Admin registered successfully"}
 
 
-@router.post("/login", response_model=TokenResponse)
-def admin_login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
+@auth_router.post("/login", response_model=TokenResponse)
+def admin_login(payload: LoginRequest):
+    enforce_key_rate_limit(
+        "auth",
+        f"email:{payload.email.lower()}",
+        RateLimit(settings.AUTH_LOGIN_RATE_LIMIT_PER_EMAIL, settings.AUTH_RATE_LIMIT_WINDOW_SECONDS),
+    )
+    with email_session(payload.email) as db:
+        user = db.query(User).filter(User.email == payload.email).first()
     if user is None or not user.is_active or not user.is_admin:
         raise HTTPException(status_code=401, detail="Invalid admin credentials")
 
@@ -69,148 +89,264 @@ def admin_login(payload: LoginRequest, db: Session = Depends(get_db)):
 @router.post("/deposit", response_model=MessageResponse)
 def admin_deposit(
     payload: AdminDepositRequest,
-    background_tasks: BackgroundTasks,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
     admin_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
 ):
-    target_user = None
-    target_wallet = None
-
-    try:
-        validate_amount_gt_zero(payload.amount)
-        if admin_user.is_frozen:
-            raise HTTPException(status_code=403, detail="Account is frozen")
-
-        target_user = db.query(User).filter(User.email == payload.email).first()
-        if target_user is None or not target_user.is_active:
-            raise HTTPException(status_code=404, detail="User not found")
-        if target_user.is_frozen:
-            raise HTTPException(status_code=403, detail="Account is frozen")
-
-        target_wallet = db.query(Wallet).filter(Wallet.user_id == target_user.id).first()
-        if target_wallet is None:
-            raise HTTPException(status_code=404, detail="Wallet not found")
-
-        db.rollback()
-        with db.begin():
-            target_wallet.balance = Decimal(target_wallet.balance) + payload.amount
-            tx = Transaction(wallet_id=target_wallet.id, type="deposit", amount=payload.amount, status="SUCCESS")
-            db.add(tx)
-
-        cache_set_json(f"wallet_balance:{target_user.id}", str(target_wallet.balance), 60)
-        cache_delete(f"wallet_transactions:{target_user.id}")
-
-        background_tasks.add_task(
-            send_admin_deposit_email,
-            target_user.email,
-            str(payload.amount),
-        )
-        background_tasks.add_task(
-            log_transaction_event,
-            f"Admin deposit SUCCESS admin_id={admin_user.id} user_id={target_user.id} amount={payload.amount}",
-        )
-
-        return {"message": "Deposit successful"}
-    except Exception:
-        db.rollback()
-        if target_wallet is not None:
+    with email_session(payload.email) as db:
+        idempotency = IdempotencyScope(admin_user.id, "admin_deposit", idempotency_key, payload)
+        replay = idempotency.cached_response()
+        if replay is not None:
+            return replay
+
+        target_user = None
+        target_wallet = None
+
+        try:
+            validate_amount_gt_zero(payload.amount)
+            if admin_user.is_frozen:
+                raise HTTPException(status_code=403, detail="Account is frozen")
+
+            target_user = db.query(User).filter(User.email == payload.email).first()
+            if target_user is None or not target_user.is_active:
+                raise HTTPException(status_code=404, detail="User not found")
+            if target_user.is_frozen:
+                raise HTTPException(status_code=403, detail="Account is frozen")
+
+            target_wallet = db.query(Wallet).filter(Wallet.user_id == target_user.id).first()
+            if target_wallet is None:
+                raise HTTPException(status_code=404, detail="Wallet not found")
+
+            db.rollback()
+            with db.begin():
+                replay = idempotency.claim(db)
+                if replay is not None:
+                    return replay
+
+                # Lock the wallet so balance_after matches the order deposits are applied in.
+                db.refresh(target_wallet, with_for_update=True)
+                target_wallet.balance = Decimal(target_wallet.balance) + payload.amount
+                tx = Transaction(
+                    wallet_id=target_wallet.id,
+                    type="deposit",
+                    amount=payload.amount,
+                    status="SUCCESS",
+                    balance_after=target_wallet.balance,
+                )
+                db.add(tx)
+                enqueue_cache_invalidation(db, f"wallet_transactions:{target_user.id}")
+                enqueue_event(db, "email.admin_deposit", to_email=target_user.email, amount=str(payload.amount))
+                enqueue_event(
+                    db,
+                    "log.transaction",
+                    message=f"Admin deposit SUCCESS admin_id={admin_user.id} user_id={target_user.id} amount={payload.amount}",
+                )
+                db.flush()
+                tx_data = transaction_event(tx)
+                response_data = {"message": "Deposit successful"}
+                idempotency.record(db, response_data)
+
+            idempotency.remember(response_data)
+            cache_set_json(f"wallet_balance:{target_user.id}", str(target_wallet.balance), 60)
+            cache_delete(f"wallet_transactions:{target_user.id}")
+            publish_wallet_update(target_user.id, target_wallet.balance, tx_data)
+
+            return response_data
+        except IdempotencyKeyMismatch:
+            db.rollback()
+            raise
+        except Exception:
+            db.rollback()
             try:
-                db.add(Transaction(wallet_id=target_wallet.id, type="deposit", amount=payload.amount, status="FAILED"))
+                if target_wallet is not None:
+                    db.add(Transaction(wallet_id=target_wallet.id, type="deposit", amount=payload.amount, status="FAILED"))
+                enqueue_event(
+                    db,
+                    "log.transaction",
+                    message=f"Admin deposit FAILED admin_id={admin_user.id} email={payload.email} amount={payload.amount}",
+                )
                 db.commit()
-                cache_delete(f"wallet_transactions:{target_user.id}")
+                if target_wallet is not None:
+                    cache_delete(f"wallet_transactions:{target_user.id}")
             except Exception:
                 db.rollback()
-
-        background_tasks.add_task(
-            log_transaction_event,
-            f"Admin deposit FAILED admin_id={admin_user.id} email={payload.email} amount={payload.amount}",
-        )
-        raise
+            raise
 
 
 @router.post("/deactivate-user", response_model=MessageResponse)
 def deactivate_user(
     payload: UserStatusRequest,
     admin_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
 ):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    if user.id == admin_user.id:
-        raise HTTPException(status_code=400, detail="Admin cannot deactivate themselves")
+    with email_session(payload.email) as db:
+        user = db.query(User).filter(User.email == payload.email).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if user.id == admin_user.id:
+            raise HTTPException(status_code=400, detail="Admin cannot deactivate themselves")
 
-    user.is_active = False
-    db.commit()
-    return {"message": "User deactivated"}
+        user.is_active = False
+        db.commit()
+        return {"message": "User deactivated"}
 
 
 @router.post("/activate-user", response_model=MessageResponse)
 def activate_user(
     payload: UserStatusRequest,
     admin_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
 ):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+    with email_session(payload.email) as db:
+        user = db.query(User).filter(User.email == payload.email).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    user.is_active = True
-    db.commit()
-    return {"message": "User activated"}
+        user.is_active = True
+        db.commit()
+        return {"message": "User activated"}
 
 
-@router.get("/users", response_model=list[UserListResponse])
-def list_users(admin_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    users = db.query(User).order_by(User.id.asc()).all()
-    return users
+@router.post("/users/bulk/{action}", response_model=BulkUserStatusResponse)
+def bulk_user_status(
+    action: Literal["freeze", "unfreeze", "deactivate", "activate"],
+    payload: BulkUserStatusRequest,
+    admin_user: User = Depends(require_admin),
+    db: Session = Depends(get_user_db),
+):
+    requested = len(payload.emails) + len(payload.user_ids)
+    if requested == 0:
+        raise HTTPException(status_code=400, detail="No users given")
+    if requested > settings.BULK_STATUS_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_STATUS_MAX_ITEMS} users per request")
+
+    return apply_bulk_status(db, admin_user.id, action, payload.emails, payload.user_ids)
+
+
+@router.get("/users", response_model=UserPageResponse)
+def list_users(
+    limit: int = Query(50, ge=1, le=500),
+    after_id: int | None = None,
+    is_active: bool | None = None,
+    is_frozen: bool | None = None,
+    is_admin: bool | None = None,
+    q: str | None = Query(None, min_length=1, max_length=100),
+    admin_user: User = Depends(require_admin),
+):
+    # Every shard returns its own first `limit` users past the cursor; the smallest ids across
+    # them are the global page because ids are unique across shards.
+    pages = for_each_shard(
+        lambda db: user_page(
+            db,
+            limit,
+            after_id=after_id,
+            is_active=is_active,
+            is_frozen=is_frozen,
+            is_admin=is_admin,
+            search=q,
+        )
+    )
+    page = merge_user_pages(pages, limit)
+    return FastJSONResponse(page)
 
 
 @router.post("/freeze-user", response_model=MessageResponse)
 def freeze_user(
     payload: FreezeUserRequest,
-    background_tasks: BackgroundTasks,
     admin_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
 ):
-    user = db.query(User).filter(User.email == payload.user_email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    if user.id == admin_user.id:
-        raise HTTPException(status_code=400, detail="Admin cannot freeze themselves")
+    with email_session(payload.user_email) as db:
+        user = db.query(User).filter(User.email == payload.user_email).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if user.id == admin_user.id:
+            raise HTTPException(status_code=400, detail="Admin cannot freeze themselves")
 
-    user.is_frozen = True
-    db.commit()
-    background_tasks.add_task(send_freeze_email, user.email)
-    return {"message": "User frozen"}
+        user.is_frozen = True
+        enqueue_event(db, "email.freeze", to_email=user.email)
+        db.commit()
+        return {"message": "User frozen"}
 
 
 @router.post("/unfreeze-user", response_model=MessageResponse)
 def unfreeze_user(
     payload: FreezeUserRequest,
-    background_tasks: BackgroundTasks,
     admin_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
 ):
-    user = db.query(User).filter(User.email == payload.user_email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+    with email_session(payload.user_email) as db:
+        user = db.query(User).filter(User.email == payload.user_email).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    user.is_frozen = False
-    db.commit()
-    background_tasks.add_task(send_unfreeze_email, user.email)
-    return {"message": "User unfrozen"}
+        user.is_frozen = False
+        enqueue_event(db, "email.unfreeze", to_email=user.email)
+        db.commit()
+        return {"message": "User unfrozen"}
 
 
 @router.get("/user-transactions", response_model=list[TransactionResponse])
-def user_transactions(email: str, admin_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+def user_transactions(
+    email: str,
+    since: UtcDateTime | None = None,
+    until: UtcDateTime | None = None,
+    admin_user: User = Depends(require_admin),
+):
+    with email_session(email) as db:
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        wallet = db.query(Wallet).filter(Wallet.user_id == user.id).first()
+        if wallet is None:
+            raise HTTPException(status_code=404, detail="Wallet not found")
+
+        return FastJSONResponse(wallet_transaction_rows(db, wallet.id, since=since, until=until))
 
-    wallet = db.query(Wallet).filter(Wallet.user_id == user.id).first()
-    if wallet is None:
-        raise HTTPException(status_code=404, detail="Wallet not found")
 
-    rows = db.query(Transaction).filter(Transaction.wallet_id == wallet.id).order_by(Transaction.timestamp.desc()).all()
-    return rows
+@router.get("/stats", response_model=StatsResponse)
+def stats(
+    since: UtcDateTime | None = None,
+    until: UtcDateTime | None = None,
+    granularity: Literal["hour", "day"] = "day",
+    admin_user: User = Depends(require_admin),
+):
+    if since is None:
+        since = datetime.combine(month_start(datetime.utcnow()), datetime.min.time())
+    if until is None:
+        until = datetime.combine(add_months(month_start(since), 1), datetime.min.time())
+
+    buckets = defaultdict(list)
+    totals = defaultdict(lambda: {"count": 0, "total": Decimal("0.00")})
+    for row in merge_rollup_buckets(for_each_shard(lambda db: global_rollup_buckets(db, granularity, since, until))):
+        line = {"type": row["type"], "status": row["status"], "count": row["count"], "total": row["total"]}
+        buckets[row["bucket"]].append(line)
+        total = totals[(row["type"], row["status"])]
+        total["count"] += row["count"]
+        total["total"] += row["total"]
+
+    return {
+        "since": since,
+        "until": until,
+        "granularity": granularity,
+        "totals": [{"type": tx_type, "status": tx_status, **total} for (tx_type, tx_status), total in sorted(totals.items())],
+        "buckets": [{"bucket": bucket, "lines": lines} for bucket, lines in buckets.items()],
+    }
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    include_idle: bool = False,
+    admin_user: User = Depends(require_admin),
+    db: Session = Depends(get_user_db),
+):
+    # Samples only the worker process that received this request. The session require_admin used is
+    # closed first so a long profile does not hold a pooled connection.
+    db.close()
+    result = await profile(seconds, interval_ms / 1000, include_idle)
+    if result is None:
+        raise HTTPException(status_code=429, detail="A profiling session is already running in this worker")
+
+    stacks, samples = result
+    return PlainTextResponse(
+        render_collapsed(stacks),
+        headers={"X-Profile-Pid": str(os.getpid()), "X-Profile-Samples": str(samples)},
+    )
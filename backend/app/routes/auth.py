@@ -1,43 +1,39 @@
-from decimal import Decimal
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, status
 
+from app.accounts import account_row, create_accounts
 from app.auth import create_access_token, hash_password, verify_password
-from app.database import get_db
-from app.models import User, Wallet
+from app.config import settings
+from app.models import User
 from app.schemas import LoginRequest, MessageResponse, RegisterRequest, TokenResponse
+from app.sharding import email_session, locate_user
+from app.utils.rate_limit import RateLimit, enforce_key_rate_limit
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/register", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-def register(payload: RegisterRequest, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == payload.email).first()
-    if existing:
+def register(payload: RegisterRequest):
+    # Cheap directory check first so duplicate signups do not pay for a bcrypt hash; the
+    # conflict-safe insert in create_accounts stays the authoritative check.
+    if locate_user(payload.email) is not None:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    row = account_row(payload.name, payload.email, hash_password(payload.password), is_admin=False)
+    if not create_accounts([row]):
         raise HTTPException(status_code=400, detail="Email already registered")
-
-    user = User(
-        name=payload.name,
-        email=payload.email,
-        password_hash=hash_password(payload.password),
-        is_active=True,
-        is_admin=False,
-    )
-    db.add(user)
-    db.flush()
-
-    wallet = Wallet(user_id=user.id, balance=Decimal("0.00"))
-    db.add(wallet)
-    db.commit()
 
     return {"message": "User registered successfully"}
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
+def login(payload: LoginRequest):
+    enforce_key_rate_limit(
+        "auth",
+        f"email:{payload.email.lower()}",
+        RateLimit(settings.AUTH_LOGIN_RATE_LIMIT_PER_EMAIL, settings.AUTH_RATE_LIMIT_WINDOW_SECONDS),
+    )
+    with email_session(payload.email) as db:
+        user = db.query(User).filter(User.email == payload.email).first()
     if user is None or not user.is_active:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.auth import get_current_user, get_user_db
+from app.config import settings
+from app.idempotency import IdempotencyKeyMismatch, IdempotencyScope
+from app.ledger import DAILY_TRANSFER_LIMIT, available_balance, get_daily_total, lock_wallets, post_transfer
+from app.models import Hold, User, Wallet
+from app.outbox import enqueue_event
+from app.recipients import record_recipient
+from app.routes.wallet import get_user_wallet, validate_amount_gt_zero
+from app.schemas import AvailableBalanceResponse, CaptureRequest, HoldRequest, HoldResponse
+from app.sharding import shard_for_email, shard_for_user
+from app.utils.redis_cache import cache_delete, cache_set_json
+from app.utils.wallet_events import publish_wallet_update, transaction_event
+
+
+router = APIRouter(prefix="/wallet", tags=["holds"])
+
+
+def hold_response(hold: Hold) -> dict:
+    return HoldResponse.model_validate(hold).model_dump(mode="json")
+
+
+def lock_hold(db: Session, hold_id: int, user_id: int) -> Hold:
+    hold = db.query(Hold).filter(Hold.id == hold_id).with_for_update().first()
+    if hold is None or user_id not in (hold.payer_id, hold.payee_id):
+        raise HTTPException(status_code=404, detail="Hold not found")
+    if hold.status != "ACTIVE":
+        raise HTTPException(status_code=409, detail=f"Hold is {hold.status.lower()}")
+    if hold.expires_at <= datetime.utcnow():
+        raise HTTPException(status_code=409, detail="Hold has expired")
+    return hold
+
+
+def log_failure(db: Session, message: str):
+    db.rollback()
+    try:
+        with db.begin():
+            enqueue_event(db, "log.transaction", message=message)
+    except Exception:
+        db.rollback()
+
+
+@router.get("/available", response_model=AvailableBalanceResponse)
+def available(current_user: User = Depends(get_current_user), db: Session = Depends(get_user_db)):
+    wallet = get_user_wallet(db, current_user.id)
+    return {"balance": wallet.balance, "held": wallet.held, "available": available_balance(wallet)}
+
+
+@router.get("/holds", response_model=list[HoldResponse])
+def list_holds(current_user: User = Depends(get_current_user), db: Session = Depends(get_user_db)):
+    return (
+        db.query(Hold)
+        .filter(Hold.status == "ACTIVE", or_(Hold.payer_id == current_user.id, Hold.payee_id == current_user.id))
+        .order_by(Hold.id.desc())
+        .all()
+    )
+
+
+@router.post("/holds", response_model=HoldResponse, status_code=201)
+def authorize_hold(
+    payload: HoldRequest,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
+    idempotency = IdempotencyScope(current_user.id, "hold_authorize", idempotency_key, payload)
+    replay = idempotency.cached_response()
+    if replay is not None:
+        return replay
+
+    validate_amount_gt_zero(payload.amount)
+    if current_user.is_frozen:
+        raise HTTPException(status_code=403, detail="Account is frozen")
+    expires_in = payload.expires_in_seconds or settings.HOLD_DEFAULT_TTL_SECONDS
+    if expires_in > settings.HOLD_MAX_TTL_SECONDS:
+        raise HTTPException(status_code=400, detail="Hold expiry is too far in the future")
+
+    # A capture posts both legs in one transaction, so the payee has to live on the payer's shard.
+    if shard_for_email(payload.email) not in (None, shard_for_user(current_user.id)):
+        raise HTTPException(status_code=400, detail="Holds are not available for this recipient")
+
+    # Lookups happen before the wallet lock so the locked section is only the balance check and insert.
+    payee = db.query(User).filter(User.email == payload.email, User.is_active == True).first()
+    if payee is None:
+        raise HTTPException(status_code=404, detail="Recipient not found")
+    if payee.is_frozen:
+        raise HTTPException(status_code=403, detail="Account is frozen")
+    if payee.id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot transfer to self")
+
+    try:
+        db.rollback()
+        with db.begin():
+            replay = idempotency.claim(db)
+            if replay is not None:
+                return replay
+
+            wallet = db.query(Wallet).filter(Wallet.user_id == current_user.id).with_for_update().first()
+            if wallet is None:
+                raise HTTPException(status_code=404, detail="Wallet not found")
+            if get_daily_total(db, wallet.id, "transfer_out") + payload.amount > DAILY_TRANSFER_LIMIT:
+                raise HTTPException(status_code=400, detail="Daily transfer limit exceeded")
+            if available_balance(wallet) < payload.amount:
+                raise HTTPException(status_code=400, detail="Insufficient funds")
+
+            now = datetime.utcnow()
+            wallet.held = Decimal(wallet.held) + payload.amount
+            hold = Hold(
+                wallet_id=wallet.id,
+                payer_id=current_user.id,
+                payee_id=payee.id,
+                amount=payload.amount,
+                status="ACTIVE",
+                created_at=now,
+                expires_at=now + timedelta(seconds=expires_in),
+            )
+            db.add(hold)
+            enqueue_event(
+                db,
+                "log.transaction",
+                message=f"Hold AUTHORIZED for user_id={current_user.id} payee_id={payee.id} amount={payload.amount}",
+            )
+            db.flush()
+            response_data = hold_response(hold)
+            idempotency.record(db, response_data)
+
+        idempotency.remember(response_data)
+        return response_data
+    except IdempotencyKeyMismatch:
+        db.rollback()
+        raise
+    except Exception:
+        log_failure(db, f"Hold FAILED for user_id={current_user.id} amount={payload.amount}")
+        raise
+
+
+@router.post("/holds/{hold_id}/capture", response_model=HoldResponse)
+def capture_hold(
+    hold_id: int,
+    payload: CaptureRequest | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
+    if current_user.is_frozen:
+        raise HTTPException(status_code=403, detail="Account is frozen")
+
+    try:
+        db.rollback()
+        with db.begin():
+            hold = lock_hold(db, hold_id, current_user.id)
+            if hold.payee_id != current_user.id:
+                raise HTTPException(status_code=403, detail="Only the payee can capture a hold")
+
+            amount = payload.amount if payload is not None and payload.amount is not None else hold.amount
+            validate_amount_gt_zero(amount)
+            if amount > hold.amount:
+                raise HTTPException(status_code=400, detail="Capture amount exceeds the held amount")
+
+            # Both parties were on this shard when the hold was authorized; a rebalance may have moved one since.
+            payer = db.get(User, hold.payer_id)
+            if payer is None:
+                raise HTTPException(status_code=409, detail="Hold parties are no longer on the same shard")
+            if payer.is_frozen:
+                raise HTTPException(status_code=403, detail="Account is frozen")
+
+            wallet_map = lock_wallets(db, [payer.id, current_user.id])
+            payer_wallet = wallet_map.get(payer.id)
+            payee_wallet = wallet_map.get(current_user.id)
+            if payer_wallet is None or payee_wallet is None:
+                raise HTTPException(status_code=409, detail="Hold parties are no longer on the same shard")
+
+            # The whole hold is released; a partial capture returns the remainder to the payer.
+            payer_wallet.held = Decimal(payer_wallet.held) - hold.amount
+            out_tx, in_tx = post_transfer(db, payer, payer_wallet, current_user, payee_wallet, amount)
+            db.flush()
+            hold.status = "CAPTURED"
+            hold.settled_at = datetime.utcnow()
+            hold.transaction_id = out_tx.id
+            enqueue_event(
+                db,
+                "log.transaction",
+                message=f"Hold CAPTURED hold_id={hold.id} payer_id={payer.id} payee_id={current_user.id} amount={amount}",
+            )
+            db.flush()
+            out_tx_data = transaction_event(out_tx)
+            in_tx_data = transaction_event(in_tx)
+            recipient = (payer.id, current_user.id, current_user.name, current_user.email, out_tx.timestamp)
+            response_data = hold_response(hold)
+
+        cache_set_json(f"wallet_balance:{payer.id}", str(payer_wallet.balance), 60)
+        cache_set_json(f"wallet_balance:{current_user.id}", str(payee_wallet.balance), 60)
+        cache_delete(f"wallet_transactions:{payer.id}")
+        cache_delete(f"wallet_transactions:{current_user.id}")
+        publish_wallet_update(payer.id, payer_wallet.balance, out_tx_data)
+        publish_wallet_update(current_user.id, payee_wallet.balance, in_tx_data)
+        record_recipient(*recipient)
+        return response_data
+    except Exception:
+        log_failure(db, f"Hold capture FAILED hold_id={hold_id} user_id={current_user.id}")
+        raise
+
+
+@router.post("/holds/{hold_id}/void", response_model=HoldResponse)
+def void_hold(hold_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_user_db)):
+    db.rollback()
+    with db.begin():
+        hold = lock_hold(db, hold_id, current_user.id)
+        wallet = db.query(Wallet).filter(Wallet.id == hold.wallet_id).with_for_update().one()
+        wallet.held = Decimal(wallet.held) - hold.amount
+        hold.status = "VOIDED"
+        hold.settled_at = datetime.utcnow()
+        enqueue_event(
+            db,
+            "log.transaction",
+            message=f"Hold VOIDED hold_id={hold.id} by user_id={current_user.id} amount={hold.amount}",
+        )
+        db.flush()
+        return hold_response(hold)
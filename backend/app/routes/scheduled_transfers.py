@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.auth import get_current_user, get_user_db
+from app.ledger import DAILY_TRANSFER_LIMIT
+from app.models import ScheduledTransfer, User
+from app.routes.wallet import validate_amount_gt_zero
+from app.scheduled_transfers import set_occurrence
+from app.schemas import MessageResponse, ScheduledTransferRequest, ScheduledTransferResponse
+from app.sharding import SHARD_COUNT, fetch_user, locate_user
+
+
+router = APIRouter(prefix="/wallet/scheduled-transfers", tags=["scheduled transfers"])
+
+
+@router.post("", response_model=ScheduledTransferResponse, status_code=201)
+def create_scheduled_transfer(
+    payload: ScheduledTransferRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
+    validate_amount_gt_zero(payload.amount)
+    if payload.amount > DAILY_TRANSFER_LIMIT:
+        raise HTTPException(status_code=400, detail="Daily transfer limit exceeded")
+    if current_user.is_frozen:
+        raise HTTPException(status_code=403, detail="Account is frozen")
+
+    start_at = payload.start_at
+    if start_at < datetime.utcnow():
+        raise HTTPException(status_code=400, detail="start_at must be in the future")
+
+    receiver = db.query(User).filter(User.email == payload.email, User.is_active == True).first()
+    if receiver is None and SHARD_COUNT > 1:
+        # Receivers on other shards are paid through a transfer saga when the order runs.
+        receiver = fetch_user(locate_user(payload.email))
+        if receiver is not None and not receiver.is_active:
+            receiver = None
+    if receiver is None:
+        raise HTTPException(status_code=404, detail="Recipient not found")
+    if receiver.id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot transfer to self")
+
+    schedule = ScheduledTransfer(
+        sender_id=current_user.id,
+        receiver_id=receiver.id,
+        amount=payload.amount,
+        interval=payload.interval,
+        anchor_day=start_at.day,
+        status="ACTIVE",
+        scheduled_for=start_at,
+        next_run_at=start_at,
+    )
+    db.add(schedule)
+    db.flush()
+    set_occurrence(schedule, start_at)
+    db.commit()
+    db.refresh(schedule)
+    return schedule
+
+
+@router.get("", response_model=list[ScheduledTransferResponse])
+def list_scheduled_transfers(current_user: User = Depends(get_current_user), db: Session = Depends(get_user_db)):
+    return (
+        db.query(ScheduledTransfer)
+        .filter(ScheduledTransfer.sender_id == current_user.id, ScheduledTransfer.status == "ACTIVE")
+        .order_by(ScheduledTransfer.next_run_at.asc())
+        .all()
+    )
+
+
+@router.delete("/{schedule_id}", response_model=MessageResponse)
+def cancel_scheduled_transfer(
+    schedule_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
+    # Waits for a worker that is executing this schedule right now, so cancel never races a run.
+    schedule = (
+        db.query(ScheduledTransfer)
+        .filter(ScheduledTransfer.id == schedule_id, ScheduledTransfer.sender_id == current_user.id)
+        .with_for_update()
+        .first()
+    )
+    if schedule is None or schedule.status != "ACTIVE":
+        raise HTTPException(status_code=404, detail="Scheduled transfer not found")
+    schedule.status = "CANCELLED"
+    db.commit()
+    return {"message": "Scheduled transfer cancelled"}
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.auth import get_current_user
-from app.database import get_db
+from app.auth import get_current_user, get_user_db
 from app.models import User
 from app.schemas import MessageResponse
 
@@ -11,7 +10,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/deactivate", response_model=MessageResponse)
-def deactivate_account(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def deactivate_account(current_user: User = Depends(get_current_user), db: Session = Depends(get_user_db)):
     current_user.is_active = False
     db.commit()
     return {"message": "Account deactivated"}
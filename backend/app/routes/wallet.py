@@ -1,23 +1,42 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import Session, aliased
-
-from app.auth import get_current_user
-from app.database import get_db
-from app.models import Transaction, User, Wallet
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.auth import get_current_user, get_current_user_id, get_stream_user, get_user_db
+from app.idempotency import IdempotencyKeyMismatch, IdempotencyScope
+from app.ledger import (
+    DAILY_TRANSFER_LIMIT,
+    DAILY_WITHDRAW_LIMIT,
+    available_balance,
+    get_daily_total,
+    lock_wallets,
+    post_transfer,
+)
+from app.models import INBOUND_TYPES, OUTBOUND_TYPES, Transaction, User, Wallet
+from app.outbox import enqueue_cache_invalidation, enqueue_event
+from app.partitions import add_months
+from app.read_models import balance_at, rollup_totals, wallet_transaction_rows
+from app.recipients import frequent_recipients, record_recipient
+from app.sagas import begin_saga, run_saga
 from app.schemas import (
     AmountRequest,
     BalanceResponse,
+    FrequentRecipientResponse,
+    PointInTimeBalanceResponse,
+    StatementResponse,
     TransactionResponse,
     TransferRequest,
+    UtcDateTime,
     WalletResponse,
 )
-from app.utils.email import send_transfer_email
-from app.utils.logger import log_transaction_event
+from app.sharding import fetch_user, locate_user, shard_for_email, shard_for_user
+from app.utils.metrics import increment
 from app.utils.redis_cache import cache_delete, cache_get_json, cache_set_json
+from app.utils.responses import FastJSONResponse
+from app.utils.wallet_events import publish_wallet_update, transaction_event, wallet_event_stream
 
 
 router = APIRouter(prefix="/wallet", tags=["wallet"])
@@ -34,30 +53,8 @@ def get_user_wallet(db: Session, user_id: int) -> Wallet:
     return wallet
 
 
-def get_day_window():
-    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    end = start + timedelta(days=1)
-    return start, end
-
-
-def get_daily_total(db: Session, wallet_id: int, tx_type: str) -> Decimal:
-    start, end = get_day_window()
-    total = (
-        db.query(func.coalesce(func.sum(Transaction.amount), 0))
-        .filter(
-            Transaction.wallet_id == wallet_id,
-            Transaction.type == tx_type,
-            Transaction.timestamp >= start,
-            Transaction.timestamp < end,
-            Transaction.status == "SUCCESS",
-        )
-        .scalar()
-    )
-    return Decimal(total)
-
-
 @router.post("/create", response_model=WalletResponse)
-def create_wallet(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_wallet(current_user: User = Depends(get_current_user), db: Session = Depends(get_user_db)):
     wallet = db.query(Wallet).filter(Wallet.user_id == current_user.id).first()
     balance_key = f"wallet_balance:{current_user.id}"
 
@@ -84,14 +81,23 @@ def create_wallet(current_user: User = Depends(get_current_user), db: Session =
 @router.post("/withdraw", response_model=BalanceResponse)
 def withdraw(
     payload: AmountRequest,
-    background_tasks: BackgroundTasks,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_user_db),
 ):
+    idempotency = IdempotencyScope(current_user.id, "withdraw", idempotency_key, payload)
+    replay = idempotency.cached_response()
+    if replay is not None:
+        return replay
+
     wallet = None
     try:
         db.rollback()
         with db.begin():
+            replay = idempotency.claim(db)
+            if replay is not None:
+                return replay
+
             wallet = db.query(Wallet).filter(Wallet.user_id == current_user.id).with_for_update().first()
             if wallet is None:
                 raise HTTPException(status_code=404, detail="Wallet not found")
@@ -101,62 +107,97 @@ def withdraw(
                 raise HTTPException(status_code=403, detail="Account is frozen")
 
             today_withdraw_total = get_daily_total(db, wallet.id, "withdraw")
-            if today_withdraw_total + payload.amount > Decimal("100"):
+            if today_withdraw_total + payload.amount > DAILY_WITHDRAW_LIMIT:
                 raise HTTPException(status_code=400, detail="Daily withdraw limit exceeded")
 
-            if Decimal(wallet.balance) < payload.amount:
+            if available_balance(wallet) < payload.amount:
                 raise HTTPException(status_code=400, detail="Insufficient funds")
 
             wallet.balance = Decimal(wallet.balance) - payload.amount
-            db.add(Transaction(wallet_id=wallet.id, type="withdraw", amount=payload.amount, status="SUCCESS"))
-
-        response_data = {"balance": str(wallet.balance)}
+            tx = Transaction(
+                wallet_id=wallet.id,
+                type="withdraw",
+                amount=payload.amount,
+                status="SUCCESS",
+                balance_after=wallet.balance,
+            )
+            db.add(tx)
+            enqueue_cache_invalidation(db, f"wallet_transactions:{current_user.id}")
+            enqueue_event(
+                db,
+                "log.transaction",
+                message=f"Withdraw SUCCESS for user_id={current_user.id} amount={payload.amount}",
+            )
+            db.flush()
+            tx_data = transaction_event(tx)
+            response_data = {"balance": str(wallet.balance)}
+            idempotency.record(db, response_data)
 
+        idempotency.remember(response_data)
         cache_set_json(f"wallet_balance:{current_user.id}", str(wallet.balance), 60)
         cache_delete(f"wallet_transactions:{current_user.id}")
+        publish_wallet_update(current_user.id, wallet.balance, tx_data)
 
-        background_tasks.add_task(
-            log_transaction_event,
-            f"Withdraw SUCCESS for user_id={current_user.id} amount={payload.amount}",
-        )
         return response_data
+    except IdempotencyKeyMismatch:
+        db.rollback()
+        raise
     except Exception:
         db.rollback()
 
-        if wallet is not None:
-            try:
-                with db.begin():
+        try:
+            with db.begin():
+                if wallet is not None:
                     db.add(Transaction(wallet_id=wallet.id, type="withdraw", amount=payload.amount, status="FAILED"))
+                enqueue_event(
+                    db,
+                    "log.transaction",
+                    message=f"Withdraw FAILED for user_id={current_user.id} amount={payload.amount}",
+                )
+            if wallet is not None:
                 cache_delete(f"wallet_transactions:{current_user.id}")
-            except Exception:
-                db.rollback()
-
-        background_tasks.add_task(
-            log_transaction_event,
-            f"Withdraw FAILED for user_id={current_user.id} amount={payload.amount}",
-        )
+        except Exception:
+            db.rollback()
         raise
 
 
 @router.post("/transfer", response_model=BalanceResponse)
 def transfer(
     payload: TransferRequest,
-    background_tasks: BackgroundTasks,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_user_db),
 ):
+    idempotency = IdempotencyScope(current_user.id, "transfer", idempotency_key, payload)
+    replay = idempotency.cached_response()
+    if replay is not None:
+        return replay
+
     sender_wallet = None
     receiver_user = None
     receiver_wallet = None
+    remote = False
+    saga_id = None
 
     try:
         db.rollback()
         with db.begin():
+            replay = idempotency.claim(db)
+            if replay is not None:
+                return replay
+
             validate_amount_gt_zero(payload.amount)
             if current_user.is_frozen:
                 raise HTTPException(status_code=403, detail="Account is frozen")
 
-            receiver_user = db.query(User).filter(User.email == payload.email, User.is_active == True).first()
+            receiver_shard = shard_for_email(payload.email)
+            remote = receiver_shard is not None and receiver_shard != shard_for_user(current_user.id)
+            if remote:
+                receiver_user = fetch_user(locate_user(payload.email))
+                if receiver_user is None or not receiver_user.is_active:
+                    receiver_user = None
+            else:
+                receiver_user = db.query(User).filter(User.email == payload.email, User.is_active == True).first()
             if receiver_user is None:
                 raise HTTPException(status_code=404, detail="Recipient not found")
             if receiver_user.is_frozen:
@@ -164,137 +205,169 @@ def transfer(
             if receiver_user.id == current_user.id:
                 raise HTTPException(status_code=400, detail="Cannot transfer to self")
 
-            locked_wallets = (
-                db.query(Wallet)
-                .filter(Wallet.user_id.in_([current_user.id, receiver_user.id]))
-                .order_by(Wallet.user_id.asc())
-                .with_for_update()
-                .all()
-            )
-            wallet_map = {w.user_id: w for w in locked_wallets}
-            sender_wallet = wallet_map.get(current_user.id)
-            receiver_wallet = wallet_map.get(receiver_user.id)
+            if remote:
+                # The receiver's wallet is locked later, on its own shard, by the saga.
+                sender_wallet = lock_wallets(db, [current_user.id]).get(current_user.id)
+            else:
+                wallet_map = lock_wallets(db, [current_user.id, receiver_user.id])
+                sender_wallet = wallet_map.get(current_user.id)
+                receiver_wallet = wallet_map.get(receiver_user.id)
 
             if sender_wallet is None:
                 raise HTTPException(status_code=404, detail="Wallet not found")
-            if receiver_wallet is None:
+            if receiver_wallet is None and not remote:
                 raise HTTPException(status_code=404, detail="Recipient wallet not found")
 
             today_transfer_total = get_daily_total(db, sender_wallet.id, "transfer_out")
-            if today_transfer_total + payload.amount > Decimal("100"):
+            if today_transfer_total + payload.amount > DAILY_TRANSFER_LIMIT:
                 raise HTTPException(status_code=400, detail="Daily transfer limit exceeded")
 
-            if Decimal(sender_wallet.balance) < payload.amount:
+            if available_balance(sender_wallet) < payload.amount:
                 raise HTTPException(status_code=400, detail="Insufficient funds")
 
-            sender_wallet.balance = Decimal(sender_wallet.balance) - payload.amount
-            receiver_wallet.balance = Decimal(receiver_wallet.balance) + payload.amount
-
-            db.add(
-                Transaction(
-                    wallet_id=sender_wallet.id,
-                    sender_id=current_user.id,
-                    receiver_id=receiver_user.id,
-                    type="transfer_out",
-                    amount=payload.amount,
-                    status="SUCCESS",
-                )
-            )
-            db.add(
-                Transaction(
-                    wallet_id=receiver_wallet.id,
-                    sender_id=current_user.id,
-                    receiver_id=receiver_user.id,
-                    type="transfer_in",
-                    amount=payload.amount,
-                    status="SUCCESS",
-                )
+            if remote:
+                saga, out_tx = begin_saga(db, current_user, sender_wallet, receiver_user, payload.amount)
+                saga_id = saga.id
+            else:
+                out_tx, in_tx = post_transfer(db, current_user, sender_wallet, receiver_user, receiver_wallet, payload.amount)
+            enqueue_event(
+                db,
+                "log.transaction",
+                message=f"Transfer SUCCESS for user_id={current_user.id} receiver_id={receiver_user.id} amount={payload.amount}",
             )
+            db.flush()
+            out_tx_data = transaction_event(out_tx)
+            in_tx_data = None if remote else transaction_event(in_tx)
+            sent_at = out_tx.timestamp
+            response_data = {"balance": str(sender_wallet.balance)}
+            idempotency.record(db, response_data)
+
+        if saga_id is not None:
+            try:
+                outcome = run_saga(db, saga_id)
+            except Exception:
+                db.rollback()
+                # The debit stands; app.commands.resume_sagas delivers the credit once the receiver shard is back.
+                increment("transfer_sagas_total", result="deferred")
+                outcome = "PENDING"
+            if outcome == "COMPENSATED":
+                # Nothing moved in the end, so a retry with the same key should be evaluated afresh.
+                with db.begin():
+                    idempotency.forget(db)
+                raise HTTPException(status_code=409, detail="Recipient cannot receive transfers, the amount was returned")
 
-        response_data = {"balance": str(sender_wallet.balance)}
-
+        idempotency.remember(response_data)
         cache_set_json(f"wallet_balance:{current_user.id}", str(sender_wallet.balance), 60)
-        cache_set_json(f"wallet_balance:{receiver_user.id}", str(receiver_wallet.balance), 60)
         cache_delete(f"wallet_transactions:{current_user.id}")
-        cache_delete(f"wallet_transactions:{receiver_user.id}")
-
-        background_tasks.add_task(
-            send_transfer_email,
-            receiver_user.email,
-            str(payload.amount),
-        )
-        background_tasks.add_task(
-            log_transaction_event,
-            f"Transfer SUCCESS for user_id={current_user.id} receiver_id={receiver_user.id} amount={payload.amount}",
-        )
+        publish_wallet_update(current_user.id, sender_wallet.balance, out_tx_data)
+        record_recipient(current_user.id, receiver_user.id, out_tx_data["counterparty_name"], payload.email, sent_at)
+        if not remote:
+            cache_set_json(f"wallet_balance:{receiver_user.id}", str(receiver_wallet.balance), 60)
+            cache_delete(f"wallet_transactions:{receiver_user.id}")
+            publish_wallet_update(receiver_user.id, receiver_wallet.balance, in_tx_data)
 
         return response_data
+    except IdempotencyKeyMismatch:
+        db.rollback()
+        raise
     except Exception:
         db.rollback()
 
-        if sender_wallet is not None:
-            try:
-                with db.begin():
+        try:
+            with db.begin():
+                if sender_wallet is not None:
                     db.add(
                         Transaction(
                             wallet_id=sender_wallet.id,
                             sender_id=current_user.id,
                             receiver_id=receiver_user.id if receiver_user else None,
+                            counterparty_name=receiver_user.name if receiver_user else None,
+                            counterparty_email=receiver_user.email if receiver_user else None,
                             type="transfer_out",
                             amount=payload.amount,
                             status="FAILED",
                         )
                     )
+                enqueue_event(
+                    db,
+                    "log.transaction",
+                    message=f"Transfer FAILED for user_id={current_user.id} amount={payload.amount}",
+                )
+            if sender_wallet is not None:
                 cache_delete(f"wallet_transactions:{current_user.id}")
-            except Exception:
-                db.rollback()
-
-        background_tasks.add_task(
-            log_transaction_event,
-            f"Transfer FAILED for user_id={current_user.id} amount={payload.amount}",
-        )
+        except Exception:
+            db.rollback()
         raise
 
 
 @router.get("/transactions", response_model=list[TransactionResponse])
-def transactions(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def transactions(
+    since: UtcDateTime | None = None,
+    until: UtcDateTime | None = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
     tx_key = f"wallet_transactions:{current_user.id}"
-    cached_transactions = cache_get_json(tx_key)
-    if cached_transactions is not None:
-        return cached_transactions
+    cacheable = since is None and until is None
+    if cacheable:
+        cached_transactions = cache_get_json(tx_key)
+        if cached_transactions is not None:
+            return FastJSONResponse(cached_transactions)
 
     wallet = get_user_wallet(db, current_user.id)
+    rows = wallet_transaction_rows(db, wallet.id, since=since, until=until)
 
-    sender_user = aliased(User)
-    receiver_user = aliased(User)
+    if cacheable:
+        cache_set_json(tx_key, rows, 60)
+    return FastJSONResponse(rows)
 
-    rows = (
-        db.query(Transaction, sender_user.name, receiver_user.name)
-        .outerjoin(sender_user, Transaction.sender_id == sender_user.id)
-        .outerjoin(receiver_user, Transaction.receiver_id == receiver_user.id)
-        .filter(Transaction.wallet_id == wallet.id)
-        .order_by(Transaction.timestamp.desc())
-        .all()
-    )
 
-    response = []
-    for tx, sender_name, receiver_name in rows:
-        counterparty_name = None
-        if tx.type == "transfer_out":
-            counterparty_name = receiver_name
-        elif tx.type == "transfer_in":
-            counterparty_name = sender_name
-
-        response.append(
-            {
-                "id": tx.id,
-                "wallet_id": tx.wallet_id,
-                "type": tx.type,
-                "amount": str(tx.amount),
-                "timestamp": tx.timestamp.isoformat(),
-                "counterparty_name": counterparty_name,
-            }
-        )
+@router.get("/recipients/frequent", response_model=list[FrequentRecipientResponse])
+def frequent(limit: int = Query(10, ge=1, le=50), user_id: int = Depends(get_current_user_id)):
+    # Served from the per-user ranked set only; empty while Redis is unavailable.
+    return FastJSONResponse(frequent_recipients(user_id, limit))
+
+
+@router.get("/balance", response_model=PointInTimeBalanceResponse)
+def balance(
+    at: UtcDateTime,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
+    wallet = get_user_wallet(db, current_user.id)
+    return {"at": at, "balance": balance_at(db, wallet.id, at)}
 
-    cache_set_json(tx_key, response, 60)
-    return response
+
+@router.get("/statement", response_model=StatementResponse)
+def statement(
+    month: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_user_db),
+):
+    wallet = get_user_wallet(db, current_user.id)
+    start = datetime.strptime(month, "%Y-%m")
+    end = datetime.combine(add_months(start.date(), 1), datetime.min.time())
+
+    lines = rollup_totals(db, wallet.id, start, end)
+    successful = [line for line in lines if line["status"] == "SUCCESS"]
+    return {
+        "month": month,
+        "opening_balance": balance_at(db, wallet.id, start),
+        "closing_balance": balance_at(db, wallet.id, end),
+        "total_in": sum((line["total"] for line in successful if line["type"] in INBOUND_TYPES), Decimal("0.00")),
+        "total_out": sum((line["total"] for line in successful if line["type"] in OUTBOUND_TYPES), Decimal("0.00")),
+        "lines": lines,
+    }
+
+
+@router.get("/stream")
+async def stream(
+    current_user: User = Depends(get_stream_user),
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+    last_event_id: str | None = None,
+):
+    return StreamingResponse(
+        wallet_event_stream(current_user.id, last_event_id_header or last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,145 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.ledger import credit_for_transfer, debit_for_transfer, lock_wallets
+from app.models import SagaCredit, Transaction, TransferSaga, User, Wallet
+from app.outbox import enqueue_cache_invalidation, enqueue_event
+from app.sharding import fetch_user, user_session
+from app.utils.metrics import increment
+from app.utils.redis_cache import cache_delete, cache_set_json
+from app.utils.wallet_events import publish_wallet_update, transaction_event
+
+
+# A transfer between users on different shards cannot share one database transaction:
+#   1. debit: sender shard, with the caller's wallet lock, transfer_out row + PENDING saga
+#   2. credit: receiver shard, transfer_in row + saga_credits marker (applied at most once)
+#   3. finish: sender shard, saga COMPLETED
+# If the receiver side rejects the credit, the debit is undone with a transfer_reversal row and the
+# saga is COMPENSATED. Any other failure leaves it PENDING for app.commands.resume_sagas.
+
+
+class SagaRejected(Exception):
+    pass
+
+
+def begin_saga(db: Session, sender: User, sender_wallet: Wallet, receiver: User, amount: Decimal) -> tuple[TransferSaga, Transaction]:
+    # Runs inside the caller's transaction on the sender shard, with sender_wallet locked.
+    out_tx = debit_for_transfer(sender, sender_wallet, receiver, amount)
+    db.add(out_tx)
+    db.flush()
+    saga = TransferSaga(
+        id=uuid.uuid4().hex,
+        sender_id=sender.id,
+        receiver_id=receiver.id,
+        receiver_name=receiver.name,
+        receiver_email=receiver.email,
+        transaction_id=out_tx.id,
+        amount=amount,
+        status="PENDING",
+    )
+    db.add(saga)
+    enqueue_cache_invalidation(db, f"wallet_transactions:{sender.id}")
+    return saga, out_tx
+
+
+def _credit(saga: TransferSaga, sender: User):
+    with user_session(saga.receiver_id) as db:
+        with db.begin():
+            if db.get(SagaCredit, saga.id) is not None:
+                return
+
+            receiver = db.get(User, saga.receiver_id)
+            if receiver is None or not receiver.is_active:
+                raise SagaRejected("Recipient not found")
+            if receiver.is_frozen:
+                raise SagaRejected("Account is frozen")
+            receiver_wallet = lock_wallets(db, [receiver.id]).get(receiver.id)
+            if receiver_wallet is None:
+                raise SagaRejected("Recipient wallet not found")
+
+            in_tx = credit_for_transfer(sender, receiver, receiver_wallet, Decimal(saga.amount))
+            db.add(in_tx)
+            db.flush()
+            db.add(SagaCredit(saga_id=saga.id, transaction_id=in_tx.id))
+            enqueue_cache_invalidation(db, f"wallet_transactions:{receiver.id}")
+            enqueue_event(db, "email.transfer", to_email=receiver.email, amount=str(saga.amount))
+            in_tx_data = transaction_event(in_tx)
+
+        cache_set_json(f"wallet_balance:{receiver.id}", str(receiver_wallet.balance), 60)
+        cache_delete(f"wallet_transactions:{receiver.id}")
+        publish_wallet_update(receiver.id, receiver_wallet.balance, in_tx_data)
+
+
+def _compensate(db: Session, saga_id: str, reason: str):
+    with db.begin():
+        saga = db.query(TransferSaga).filter(TransferSaga.id == saga_id).with_for_update().first()
+        if saga.status != "PENDING":
+            return
+        sender = db.get(User, saga.sender_id)
+        sender_wallet = lock_wallets(db, [sender.id])[sender.id]
+        receiver_name, receiver_email = saga.receiver_name, saga.receiver_email
+        if receiver_email is None:
+            # Sagas started before the receiver was copied onto the row.
+            receiver = fetch_user(saga.receiver_id)
+            if receiver is not None:
+                receiver_name, receiver_email = receiver.name, receiver.email
+        # Its own type, so rollups and history do not show it as money received; the ledger still
+        # sums to the wallet balance and get_daily_total stops counting the debit.
+        sender_wallet.balance = Decimal(sender_wallet.balance) + Decimal(saga.amount)
+        refund = Transaction(
+            wallet_id=sender_wallet.id,
+            sender_id=saga.receiver_id,
+            receiver_id=sender.id,
+            counterparty_name=receiver_name,
+            counterparty_email=receiver_email,
+            type="transfer_reversal",
+            amount=saga.amount,
+            status="SUCCESS",
+            balance_after=sender_wallet.balance,
+        )
+        db.add(refund)
+        enqueue_cache_invalidation(db, f"wallet_transactions:{sender.id}")
+        enqueue_event(
+            db,
+            "log.transaction",
+            message=f"Transfer COMPENSATED saga_id={saga.id} user_id={sender.id} amount={saga.amount} reason={reason}",
+        )
+        saga.status = "COMPENSATED"
+        saga.last_error = reason
+        saga.updated_at = datetime.utcnow()
+        db.flush()
+        refund_data = transaction_event(refund)
+
+    cache_set_json(f"wallet_balance:{sender.id}", str(sender_wallet.balance), 60)
+    cache_delete(f"wallet_transactions:{sender.id}")
+    publish_wallet_update(sender.id, sender_wallet.balance, refund_data)
+
+
+def run_saga(db: Session, saga_id: str) -> str:
+    # db is a session on the saga's (sender's) shard. Safe to call repeatedly for the same saga.
+    with db.begin():
+        saga = db.get(TransferSaga, saga_id)
+        sender = db.get(User, saga.sender_id)
+        # Detached before commit so the snapshots are not expired while the receiver shard is called.
+        db.expunge(saga)
+        db.expunge(sender)
+    if saga.status != "PENDING":
+        return saga.status
+
+    try:
+        _credit(saga, sender)
+    except SagaRejected as exc:
+        _compensate(db, saga_id, str(exc))
+        increment("transfer_sagas_total", result="compensated")
+        return "COMPENSATED"
+
+    with db.begin():
+        db.query(TransferSaga).filter(TransferSaga.id == saga_id, TransferSaga.status == "PENDING").update(
+            {TransferSaga.status: "COMPLETED", TransferSaga.updated_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+    increment("transfer_sagas_total", result="completed")
+    return "COMPLETED"
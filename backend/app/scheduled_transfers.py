@@ -0,0 +1,50 @@
+import calendar
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models import ScheduledTransfer
+
+
+INTERVALS = ("once", "daily", "weekly", "monthly")
+
+
+def spread_offset(schedule_id: int) -> timedelta:
+    # Recurring orders cluster on month starts and midnights. A stable per-schedule offset spreads
+    # them across SCHEDULED_TRANSFER_SPREAD_SECONDS instead of making every row due at once.
+    window = settings.SCHEDULED_TRANSFER_SPREAD_SECONDS
+    if window <= 0:
+        return timedelta(0)
+    return timedelta(seconds=(schedule_id * 2654435761) % window)
+
+
+def next_occurrence(scheduled_for: datetime, interval: str, anchor_day: int) -> datetime | None:
+    if interval == "daily":
+        return scheduled_for + timedelta(days=1)
+    if interval == "weekly":
+        return scheduled_for + timedelta(weeks=1)
+    if interval == "monthly":
+        year, month = (scheduled_for.year + 1, 1) if scheduled_for.month == 12 else (scheduled_for.year, scheduled_for.month + 1)
+        day = min(anchor_day, calendar.monthrange(year, month)[1])
+        return scheduled_for.replace(year=year, month=month, day=day)
+    return None
+
+
+def set_occurrence(schedule: ScheduledTransfer, scheduled_for: datetime):
+    schedule.scheduled_for = scheduled_for
+    schedule.next_run_at = scheduled_for
+    if schedule.interval != "once":
+        schedule.next_run_at = scheduled_for + spread_offset(schedule.id)
+    schedule.attempts = 0
+    schedule.claimed_until = None
+
+
+def advance(schedule: ScheduledTransfer, now: datetime):
+    # Occurrences missed while workers were down are skipped rather than executed in a burst.
+    following = next_occurrence(schedule.scheduled_for, schedule.interval, schedule.anchor_day)
+    while following is not None and following + spread_offset(schedule.id) <= now:
+        following = next_occurrence(following, schedule.interval, schedule.anchor_day)
+    if following is None:
+        schedule.status = "COMPLETED"
+        schedule.claimed_until = None
+        return
+    set_occurrence(schedule, following)
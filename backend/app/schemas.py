@@ -1,8 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Literal
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, EmailStr, Field, field_validator
+from pydantic import AfterValidator, BaseModel, EmailStr, Field, field_validator
+
+
+def naive_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC; an offset on the input is converted, not dropped.
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+UtcDateTime = Annotated[datetime, AfterValidator(naive_utc)]
 
 
 def validate_bcrypt_password_length(value: str) -> str:
@@ -53,13 +63,68 @@ class BalanceResponse(BaseModel):
     balance: Decimal
 
 
+class AvailableBalanceResponse(BaseModel):
+    balance: Decimal
+    held: Decimal
+    available: Decimal
+
+
+class HoldRequest(BaseModel):
+    email: EmailStr
+    amount: Decimal
+    expires_in_seconds: int | None = Field(default=None, gt=0)
+
+
+class CaptureRequest(BaseModel):
+    amount: Decimal | None = None
+
+
+class HoldResponse(BaseModel):
+    id: int
+    wallet_id: int
+    payer_id: int
+    payee_id: int
+    amount: Decimal
+    status: Literal["ACTIVE", "CAPTURED", "VOIDED", "EXPIRED"]
+    created_at: datetime
+    expires_at: datetime
+    settled_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class ScheduledTransferRequest(BaseModel):
+    email: EmailStr
+    amount: Decimal
+    interval: Literal["once", "daily", "weekly", "monthly"]
+    start_at: UtcDateTime
+
+
+class ScheduledTransferResponse(BaseModel):
+    id: int
+    receiver_id: int
+    amount: Decimal
+    interval: str
+    status: str
+    scheduled_for: datetime
+    next_run_at: datetime
+    run_count: int
+    last_run_at: datetime | None = None
+    last_error: str | None = None
+
+    class Config:
+        from_attributes = True
+
+
 class TransactionResponse(BaseModel):
     id: int
     wallet_id: int
-    type: Literal["deposit", "withdraw", "transfer_in", "transfer_out"]
+    type: Literal["deposit", "withdraw", "transfer_in", "transfer_out", "transfer_reversal"]
     amount: Decimal
     timestamp: datetime
     counterparty_name: str | None = None
+    balance_after: Decimal | None = None
 
     class Config:
         from_attributes = True
@@ -82,6 +147,24 @@ class FreezeUserRequest(BaseModel):
     user_email: EmailStr
 
 
+class BulkUserStatusRequest(BaseModel):
+    emails: list[EmailStr] = Field(default_factory=list)
+    user_ids: list[int] = Field(default_factory=list)
+
+
+class BulkUserStatusItem(BaseModel):
+    email: str | None = None
+    user_id: int | None = None
+    status: Literal["updated", "unchanged", "not_found", "skipped", "unavailable"]
+
+
+class BulkUserStatusResponse(BaseModel):
+    action: str
+    requested: int
+    updated: int
+    results: list[BulkUserStatusItem]
+
+
 class UserListResponse(BaseModel):
     id: int
     name: str
@@ -92,3 +175,53 @@ class UserListResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class AdminUserResponse(UserListResponse):
+    balance: Decimal | None = None
+
+
+class UserPageResponse(BaseModel):
+    items: list[AdminUserResponse]
+    next_cursor: int | None = None
+    estimated_total: int
+
+
+class RollupLine(BaseModel):
+    type: str
+    status: str
+    count: int
+    total: Decimal
+
+
+class PointInTimeBalanceResponse(BaseModel):
+    at: datetime
+    balance: Decimal
+
+
+class StatementResponse(BaseModel):
+    month: str
+    opening_balance: Decimal
+    closing_balance: Decimal
+    total_in: Decimal
+    total_out: Decimal
+    lines: list[RollupLine]
+
+
+class StatsBucket(BaseModel):
+    bucket: datetime
+    lines: list[RollupLine]
+
+
+class StatsResponse(BaseModel):
+    since: datetime
+    until: datetime
+    granularity: Literal["hour", "day"]
+    totals: list[RollupLine]
+    buckets: list[StatsBucket]
+
+
+class FrequentRecipientResponse(BaseModel):
+    user_id: int
+    name: str | None
+    email: str | None
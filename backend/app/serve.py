@@ -0,0 +1,172 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+
+import uvicorn
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.sharding import SHARD_URLS
+
+
+# Any fixed key works as long as every container uses the same one.
+MIGRATION_LOCK_KEY = 72410048
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUPERVISE_INTERVAL_SECONDS = 0.5
+# A worker that lived this long is considered healthy again and restarts without backoff.
+STABLE_AFTER_SECONDS = 60.0
+# Connections one request can hold on the same database at once: its get_user_db session plus
+# email_session, locate_user or a for_each_shard session opened while that one is still checked out.
+REQUEST_PEAK_CONNECTIONS = 2
+
+_stop_requested = False
+
+
+def migrate(url: str):
+    # Containers starting together queue on the lock; the first upgrades, the rest find head already applied.
+    alembic_config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    alembic_config.set_main_option("script_location", os.path.join(BASE_DIR, "alembic"))
+    alembic_config.attributes["database_url"] = url
+
+    engine = create_engine(url, poolclass=NullPool)
+    if engine.dialect.name != "postgresql":
+        command.upgrade(alembic_config, "head")
+        return
+
+    # Autocommit, so the lock holder is not an open transaction that concurrent index builds would wait on.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            command.upgrade(alembic_config, "head")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def worker_count() -> int:
+    if settings.SERVE_WORKERS:
+        return settings.SERVE_WORKERS
+    # One per CPU, but never more than the connection budget can give their peak to.
+    return max(1, min(len(os.sched_getaffinity(0)), settings.SERVE_DB_CONNECTIONS // REQUEST_PEAK_CONNECTIONS))
+
+
+def worker_limits(workers: int) -> dict[str, int]:
+    connections = settings.SERVE_DB_CONNECTIONS // workers
+    if connections < REQUEST_PEAK_CONNECTIONS:
+        raise SystemExit(
+            f"{workers} workers leave less than {REQUEST_PEAK_CONNECTIONS} of SERVE_DB_CONNECTIONS="
+            f"{settings.SERVE_DB_CONNECTIONS} per worker, lower --workers/SERVE_WORKERS or raise the budget"
+        )
+    # No overflow: the pool size is the hard per-worker cap that keeps the container within its budget.
+    # Threads are capped so all of them can hold their peak at once; more would queue on the pool
+    # while holding their first connection, and enough of them would starve each other.
+    threads = connections // REQUEST_PEAK_CONNECTIONS
+    if settings.SERVE_THREADPOOL_TOTAL:
+        threads = min(threads, max(1, settings.SERVE_THREADPOOL_TOTAL // workers))
+    return {"DB_POOL_SIZE": connections, "DB_MAX_OVERFLOW": 0, "THREADPOOL_SIZE": threads}
+
+
+def run_worker(config: uvicorn.Config, sockets: list):
+    from app.lifecycle import begin_drain
+
+    signal.signal(signal.SIGUSR1, lambda signum, frame: begin_drain())
+    # Logging was set up when the config was built in the parent; a spawned process starts without it.
+    config.configure_logging()
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def request_stop(signum, frame):
+    global _stop_requested
+    _stop_requested = True
+
+
+def start_worker(context, config: uvicorn.Config, sockets: list):
+    process = context.Process(target=run_worker, args=(config, sockets))
+    process.start()
+    return process, time.monotonic()
+
+
+def stop_workers(processes: list):
+    alive = [process for process in processes if process is not None and process.is_alive()]
+    for process in alive:
+        os.kill(process.pid, signal.SIGUSR1)
+    time.sleep(settings.SERVE_READINESS_GRACE_SECONDS)
+
+    # SIGTERM makes uvicorn stop accepting and finish in-flight requests within the drain timeout.
+    for process in alive:
+        process.terminate()
+    deadline = time.monotonic() + settings.SHUTDOWN_DRAIN_SECONDS + 5
+    for process in alive:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            print(f"worker {process.pid} did not stop in time, killing it")
+            process.kill()
+            process.join()
+
+
+def supervise(config: uvicorn.Config, workers: int):
+    sockets = [config.bind_socket()]
+    context = multiprocessing.get_context("spawn")
+    processes = [None] * workers
+    started_at = [0.0] * workers
+    next_start_at = [0.0] * workers
+    failures = [0] * workers
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    print(f"serving on {config.host}:{config.port} with {workers} workers")
+
+    while not _stop_requested:
+        now = time.monotonic()
+        for index in range(workers):
+            process = processes[index]
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                # Crash loops back off exponentially instead of spinning on a broken database or config.
+                failures[index] = 0 if now - started_at[index] >= STABLE_AFTER_SECONDS else failures[index] + 1
+                delay = min(2 ** failures[index] - 1, settings.SERVE_RESTART_BACKOFF_MAX_SECONDS)
+                print(f"worker {process.pid} exited with {process.exitcode}, restarting in {delay:.0f}s")
+                processes[index] = None
+                next_start_at[index] = now + delay
+            if now >= next_start_at[index]:
+                processes[index], started_at[index] = start_worker(context, config, sockets)
+        time.sleep(SUPERVISE_INTERVAL_SECONDS)
+
+    print("stopping: draining workers")
+    stop_workers(processes)
+    for sock in sockets:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run migrations once, then serve the API from several worker processes")
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to SERVE_WORKERS, or one per CPU")
+    parser.add_argument("--skip-migrations", action="store_true")
+    args = parser.parse_args()
+
+    workers = args.workers or worker_count()
+    limits = worker_limits(workers)
+    if not args.skip_migrations:
+        for url in SHARD_URLS:
+            migrate(url)
+
+    # Spawned workers read their settings from the environment they inherit.
+    os.environ.update({name: str(value) for name, value in limits.items()})
+    print(", ".join(f"{name}={value}" for name, value in limits.items()) + " per worker")
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=settings.SERVE_HOST,
+        port=settings.SERVE_PORT,
+        timeout_graceful_shutdown=int(settings.SHUTDOWN_DRAIN_SECONDS),
+    )
+    supervise(config, workers)
+
+
+if __name__ == "__main__":
+    main()
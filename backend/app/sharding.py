@@ -0,0 +1,163 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import settings
+from app.database import SessionLocal, engine_options
+from app.models import ShardBucket, User, UserDirectory
+from app.utils.sql import insert_ignoring_conflicts
+
+
+# Users are routed in fixed ranges of ids so a range can be moved between shards as a unit.
+# Migration 0017 seeds the map with this size; changing it would reroute existing users.
+BUCKET_SIZE = 1024
+DIRECTORY_SHARD = 0
+MISS_RELOAD_SECONDS = 1.0
+
+SHARD_URLS = [url.strip() for url in settings.SHARD_DATABASE_URLS.split(",") if url.strip()] or [settings.DATABASE_URL]
+SHARD_COUNT = len(SHARD_URLS)
+
+_sessionmakers = [
+    SessionLocal if url == settings.DATABASE_URL else sessionmaker(autocommit=False, autoflush=False, bind=create_engine(url, **engine_options()))
+    for url in SHARD_URLS
+]
+
+_bucket_lock = threading.Lock()
+_bucket_map: dict[int, tuple[int, str]] = {}
+_bucket_map_loaded_at = float("-inf")
+
+
+def shard_session(shard: int) -> Session:
+    return _sessionmakers[shard]()
+
+
+def shard_engine(shard: int) -> Engine:
+    return _sessionmakers[shard].kw["bind"]
+
+
+def bucket_for_user(user_id: int) -> int:
+    return user_id // BUCKET_SIZE
+
+
+def _reload_bucket_map():
+    global _bucket_map, _bucket_map_loaded_at
+    with shard_session(DIRECTORY_SHARD) as db:
+        rows = db.execute(select(ShardBucket.bucket, ShardBucket.shard, ShardBucket.state)).all()
+    _bucket_map = {row.bucket: (row.shard, row.state) for row in rows}
+    _bucket_map_loaded_at = time.monotonic()
+
+
+def shard_for_user(user_id: int) -> int:
+    if SHARD_COUNT == 1:
+        return 0
+
+    bucket = bucket_for_user(user_id)
+    with _bucket_lock:
+        age = time.monotonic() - _bucket_map_loaded_at
+        entry = _bucket_map.get(bucket)
+        if age > settings.SHARD_MAP_REFRESH_SECONDS or (entry is None and age > MISS_RELOAD_SECONDS):
+            _reload_bucket_map()
+            entry = _bucket_map.get(bucket)
+
+    if entry is None:
+        # Buckets created before the map existed all live on the first shard.
+        return DIRECTORY_SHARD
+    shard, state = entry
+    if state == "MOVING":
+        raise HTTPException(
+            status_code=503,
+            detail="Account is being migrated, retry shortly",
+            headers={"Retry-After": str(int(settings.SHARD_MAP_REFRESH_SECONDS))},
+        )
+    return shard
+
+
+@contextmanager
+def user_session(user_id: int):
+    with shard_session(shard_for_user(user_id)) as db:
+        yield db
+
+
+def locate_user(email: str) -> int | None:
+    with shard_session(DIRECTORY_SHARD) as db:
+        return db.execute(select(UserDirectory.id).where(UserDirectory.email == email)).scalar()
+
+
+def locate_users(emails: list[str]) -> dict[str, int]:
+    with shard_session(DIRECTORY_SHARD) as db:
+        rows = db.execute(select(UserDirectory.email, UserDirectory.id).where(UserDirectory.email.in_(emails))).all()
+    return {row.email: row.id for row in rows}
+
+
+def shard_for_email(email: str) -> int | None:
+    if SHARD_COUNT == 1:
+        return 0
+    user_id = locate_user(email)
+    return None if user_id is None else shard_for_user(user_id)
+
+
+@contextmanager
+def email_session(email: str):
+    # Unknown emails get a session on the first shard, where the caller's lookup finds nothing.
+    with shard_session(shard_for_email(email) or DIRECTORY_SHARD) as db:
+        yield db
+
+
+def allocate_user_ids(emails: list[str]) -> dict[str, int]:
+    # Claims each email in the directory and returns {email: new user id} for those not taken yet.
+    with shard_session(DIRECTORY_SHARD) as db, db.begin():
+        dialect = db.get_bind().dialect.name
+        statement = (
+            insert_ignoring_conflicts(dialect, UserDirectory.__table__, ["email"])
+            .values([{"email": email} for email in emails])
+            .returning(UserDirectory.__table__.c.id, UserDirectory.__table__.c.email)
+        )
+        allocated = {row.email: row.id for row in db.execute(statement)}
+
+        buckets = {bucket_for_user(user_id) for user_id in allocated.values()}
+        if buckets:
+            # New ranges are spread round-robin; the map row exists before any user in it does.
+            db.execute(
+                insert_ignoring_conflicts(dialect, ShardBucket.__table__, ["bucket"]).values(
+                    [{"bucket": bucket, "shard": bucket % SHARD_COUNT, "state": "ACTIVE"} for bucket in buckets]
+                )
+            )
+            mapped = db.execute(
+                select(ShardBucket.bucket, ShardBucket.shard, ShardBucket.state).where(ShardBucket.bucket.in_(buckets))
+            ).all()
+            # The caller routes these ids right away; do not wait for the next map reload.
+            with _bucket_lock:
+                _bucket_map.update({row.bucket: (row.shard, row.state) for row in mapped})
+    return allocated
+
+
+def release_user_ids(user_ids: list[int]):
+    with shard_session(DIRECTORY_SHARD) as db, db.begin():
+        db.execute(delete(UserDirectory).where(UserDirectory.id.in_(user_ids)))
+
+
+def for_each_shard(fn) -> list:
+    # Runs fn(session) on every shard in parallel and returns the results in shard order.
+    def run(shard: int):
+        with shard_session(shard) as db:
+            return fn(db)
+
+    if SHARD_COUNT == 1:
+        return [run(0)]
+    with ThreadPoolExecutor(max_workers=SHARD_COUNT) as pool:
+        return list(pool.map(run, range(SHARD_COUNT)))
+
+
+def fetch_user(user_id: int) -> User | None:
+    # Loads a user from its own shard as a detached, read-only snapshot.
+    with user_session(user_id) as db:
+        user = db.get(User, user_id)
+        if user is not None:
+            db.expunge(user)
+        return user
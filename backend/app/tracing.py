@@ -0,0 +1,178 @@
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+
+# The sampling decision is made once, when the trace starts; unsampled work only pays a ContextVar lookup.
+_trace: ContextVar[dict | None] = ContextVar("trace", default=None)
+_parent: ContextVar[int] = ContextVar("trace_parent", default=0)
+_commit_started: ContextVar[float | None] = ContextVar("trace_commit_started", default=None)
+
+_export_lock = threading.Lock()
+TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+([\w.]+)", re.IGNORECASE)
+
+
+def _new_trace(name: str) -> dict:
+    return {
+        "trace_id": os.urandom(8).hex(),
+        "name": name,
+        "pid": os.getpid(),
+        "started_at": time.time(),
+        "origin": time.perf_counter(),
+        "ids": itertools.count(1),
+        "status": None,
+        "dropped": 0,
+        "spans": [],
+    }
+
+
+def _record(trace: dict, span_id: int, name: str, parent: int, started: float, ended: float, attributes: dict):
+    if len(trace["spans"]) >= settings.TRACE_MAX_SPANS:
+        trace["dropped"] += 1
+        return
+    trace["spans"].append(
+        {
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start_ms": round((started - trace["origin"]) * 1000, 3),
+            "duration_ms": round((ended - started) * 1000, 3),
+            **({"attributes": attributes} if attributes else {}),
+        }
+    )
+
+
+def _export(trace: dict, duration: float):
+    line = json.dumps(
+        {
+            "trace_id": trace["trace_id"],
+            "name": trace["name"],
+            "pid": trace["pid"],
+            "started_at": trace["started_at"],
+            "duration_ms": round(duration * 1000, 3),
+            "status": trace["status"],
+            "dropped_spans": trace["dropped"],
+            "spans": trace["spans"],
+        },
+        default=str,
+    )
+    # One write per trace keeps lines whole when several workers append to the same file.
+    with _export_lock, open(settings.TRACE_EXPORT_PATH, "a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+
+
+@contextmanager
+def start_trace(name: str):
+    if settings.TRACE_SAMPLE_RATE <= 0 or random.random() >= settings.TRACE_SAMPLE_RATE:
+        yield None
+        return
+
+    trace = _new_trace(name)
+    trace_token = _trace.set(trace)
+    parent_token = _parent.set(0)
+    try:
+        yield trace
+    except BaseException:
+        trace["status"] = "error"
+        raise
+    finally:
+        _trace.reset(trace_token)
+        _parent.reset(parent_token)
+        _export(trace, time.perf_counter() - trace["origin"])
+
+
+@contextmanager
+def _span(trace: dict, name: str, attributes: dict):
+    # Spans are recorded when they end, so a parent appears in the file after its children.
+    parent = _parent.get()
+    span_id = next(trace["ids"])
+    token = _parent.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        _parent.reset(token)
+        _record(trace, span_id, name, parent, started, time.perf_counter(), attributes)
+
+
+def span(name: str, **attributes):
+    trace = _trace.get()
+    if trace is None:
+        return nullcontext(attributes)
+    return _span(trace, name, attributes)
+
+
+def _statement_label(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    table = TABLE_PATTERN.search(statement)
+    label = f"db {verb} {table.group(1)}" if table else f"db {verb}"
+    if "FOR UPDATE" in statement.upper():
+        label += " FOR UPDATE"
+    return label
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is None:
+        return
+    _commit_started.set(None)
+    conn.info["trace_started"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    started = conn.info.pop("trace_started", None)
+    if trace is None or started is None:
+        return
+    # Lock waits show up as the duration of the statement that took the lock (the FOR UPDATE select).
+    _record(
+        trace,
+        next(trace["ids"]),
+        _statement_label(statement),
+        _parent.get(),
+        started,
+        time.perf_counter(),
+        {"sql": " ".join(statement.split())[:300], "database": conn.engine.url.database, "rows": cursor.rowcount},
+    )
+
+
+@event.listens_for(Engine, "commit")
+def _before_commit(conn):
+    if _trace.get() is not None:
+        _commit_started.set(time.perf_counter())
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    # Engine "commit" fires just before the COMMIT is sent and the session's after_commit just after it.
+    trace = _trace.get()
+    started = _commit_started.get()
+    if trace is None or started is None:
+        return
+    _commit_started.set(None)
+    _record(trace, next(trace["ids"]), "db COMMIT", _parent.get(), started, time.perf_counter(), {})
+
+
+async def trace_requests(request: Request, call_next):
+    with start_trace(request.method) as trace:
+        if trace is None:
+            return await call_next(request)
+        response = await call_next(request)
+        route = request.scope.get("route")
+        trace["name"] = f"{request.method} {route.path if route is not None else request.url.path}"
+        trace["status"] = response.status_code
+        return response
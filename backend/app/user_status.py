@@ -0,0 +1,116 @@
+import json
+from collections import defaultdict
+
+from fastapi import HTTPException
+from sqlalchemy import ARRAY, Integer, String, any_, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import AdminAuditLog, User
+from app.outbox import enqueue_cache_invalidation, enqueue_event
+from app.sharding import SHARD_COUNT, locate_users, shard_for_user, shard_session
+from app.utils.redis_cache import cache_delete_many
+
+
+# action -> (column, new value, batched notification event or None)
+STATUS_ACTIONS = {
+    "freeze": (User.is_frozen, True, "email.freeze_batch"),
+    "unfreeze": (User.is_frozen, False, "email.unfreeze_batch"),
+    "deactivate": (User.is_active, False, None),
+    "activate": (User.is_active, True, None),
+}
+# An admin cannot lock themselves out, same as the single-user endpoints.
+SELF_PROTECTED_ACTIONS = {"freeze", "deactivate"}
+
+
+def user_cache_keys(user_id: int) -> list[str]:
+    return [f"wallet_balance:{user_id}", f"wallet_transactions:{user_id}"]
+
+
+def _apply_on_shard(db: Session, action: str, emails: list[str], user_ids: list[int], admin_id: int):
+    column, value, notification = STATUS_ACTIONS[action]
+    target = or_(
+        User.email == any_(literal(emails, ARRAY(String))),
+        User.id == any_(literal(user_ids, ARRAY(Integer))),
+    )
+    excluded = admin_id if action in SELF_PROTECTED_ACTIONS else -1
+
+    with db.begin():
+        updated = db.execute(
+            update(User)
+            .where(target, column != value, User.id != excluded)
+            .values({column: value})
+            .returning(User.id, User.email)
+        ).all()
+        matched = db.execute(select(User.id, User.email).where(target)).all()
+
+        if updated:
+            keys = [key for row in updated for key in user_cache_keys(row.id)]
+            enqueue_cache_invalidation(db, *keys)
+            if notification is not None:
+                batch_size = settings.BULK_NOTIFICATION_BATCH_SIZE
+                for start in range(0, len(updated), batch_size):
+                    enqueue_event(db, notification, to_emails=[row.email for row in updated[start : start + batch_size]])
+
+    cache_delete_many([key for row in updated for key in user_cache_keys(row.id)])
+    return {row.id for row in updated}, matched
+
+
+def _group_by_shard(emails: list[str], user_ids: list[int]) -> tuple[dict, set]:
+    if SHARD_COUNT == 1:
+        return {0: (emails, user_ids)}, set()
+
+    groups = defaultdict(lambda: ([], []))
+    unavailable = set()
+    located = locate_users(emails) if emails else {}
+    items = [("email", email, located.get(email)) for email in emails] + [("user_id", user_id, user_id) for user_id in user_ids]
+    for kind, value, user_id in items:
+        if user_id is None:
+            continue
+        try:
+            shard = shard_for_user(user_id)
+        except HTTPException:
+            # The user's bucket is being moved between shards.
+            unavailable.add((kind, value))
+            continue
+        groups[shard][0 if kind == "email" else 1].append(value)
+    return groups, unavailable
+
+
+def apply_bulk_status(admin_db: Session, admin_id: int, action: str, emails: list[str], user_ids: list[int]) -> dict:
+    emails = list(dict.fromkeys(emails))
+    user_ids = list(dict.fromkeys(user_ids))
+    groups, unavailable = _group_by_shard(emails, user_ids)
+
+    updated_ids = set()
+    found_by_email, found_by_id = {}, {}
+    for shard, (shard_emails, shard_ids) in groups.items():
+        with shard_session(shard) as db:
+            shard_updated, matched = _apply_on_shard(db, action, shard_emails, shard_ids, admin_id)
+        updated_ids |= shard_updated
+        found_by_email.update({row.email: row.id for row in matched})
+        found_by_id.update({row.id: row.email for row in matched})
+
+    def outcome(kind: str, value, user_id: int | None) -> str:
+        if (kind, value) in unavailable:
+            return "unavailable"
+        if user_id is None:
+            return "not_found"
+        if user_id in updated_ids:
+            return "updated"
+        if user_id == admin_id and action in SELF_PROTECTED_ACTIONS:
+            return "skipped"
+        return "unchanged"
+
+    results = []
+    for email in emails:
+        user_id = found_by_email.get(email)
+        results.append({"email": email, "user_id": user_id, "status": outcome("email", email, user_id)})
+    for user_id in user_ids:
+        found = user_id if user_id in found_by_id else None
+        results.append({"email": found_by_id.get(user_id), "user_id": user_id, "status": outcome("user_id", user_id, found)})
+
+    report = {"action": action, "requested": len(results), "updated": len(updated_ids), "results": results}
+    admin_db.add(AdminAuditLog(admin_id=admin_id, action=f"bulk_{action}", details=json.dumps(report)))
+    admin_db.commit()
+    return report
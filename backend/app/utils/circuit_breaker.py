@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+
+from app.utils.metrics import increment, set_gauge
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float,
+        minimum_calls: int,
+        window_size: int,
+        open_seconds: float,
+        half_open_max_calls: int,
+        probe=None,
+        probe_interval_seconds: float = 5.0,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.probe = probe
+        self.probe_interval_seconds = probe_interval_seconds
+
+        self._lock = threading.Lock()
+        self._results = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._probe_thread = None
+
+        set_gauge("circuit_breaker_state", STATE_VALUES[CLOSED], breaker=name)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._half_open_in_flight >= self.half_open_max_calls:
+                return False
+            self._half_open_in_flight += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CLOSED)
+                return
+            self._results.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            if self._state == OPEN:
+                return
+
+            self._results.append(False)
+            if len(self._results) < self.minimum_calls:
+                return
+            failures = sum(1 for ok in self._results if not ok)
+            if failures / len(self._results) >= self.failure_rate_threshold:
+                self._transition(OPEN)
+
+    def _transition(self, new_state: str):
+        old_state = self._state
+        if old_state == new_state:
+            return
+
+        self._state = new_state
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+            self._start_probe()
+        if new_state == CLOSED:
+            self._results.clear()
+
+        set_gauge("circuit_breaker_state", STATE_VALUES[new_state], breaker=self.name)
+        increment("circuit_breaker_transitions_total", breaker=self.name, from_state=old_state, to_state=new_state)
+
+    def _start_probe(self):
+        if self.probe is None:
+            return
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+
+        self._probe_thread = threading.Thread(target=self._run_probe, name=f"{self.name}-probe", daemon=True)
+        self._probe_thread.start()
+
+    def _run_probe(self):
+        while True:
+            time.sleep(self.probe_interval_seconds)
+            with self._lock:
+                if self._state != OPEN:
+                    return
+
+            try:
+                healthy = bool(self.probe())
+            except Exception:
+                healthy = False
+            increment("circuit_breaker_probes_total", breaker=self.name, result="ok" if healthy else "failed")
+
+            if healthy:
+                with self._lock:
+                    if self._state == OPEN:
+                        self._transition(HALF_OPEN)
+                return
@@ -58,3 +58,17 @@ def send_admin_deposit_email(to_email: str, amount: str):
         server.starttls()
         server.login(EMAIL_USER, EMAIL_PASSWORD)
         server.send_message(msg)
+
+
+def send_status_emails(to_emails: list[str], subject: str, body: str):
+    # One SMTP session for the whole batch instead of a login per recipient.
+    with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
+        server.starttls()
+        server.login(EMAIL_USER, EMAIL_PASSWORD)
+        for to_email in to_emails:
+            msg = EmailMessage()
+            msg["Subject"] = subject
+            msg["From"] = EMAIL_USER
+            msg["To"] = to_email
+            msg.set_content(body)
+            server.send_message(msg)
@@ -0,0 +1,44 @@
+import threading
+from collections import defaultdict
+
+
+_lock = threading.Lock()
+_counters: dict[tuple, float] = defaultdict(float)
+_gauges: dict[tuple, float] = {}
+
+
+def _metric_key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name: str, value: float = 1, **labels):
+    with _lock:
+        _counters[_metric_key(name, labels)] += value
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges[_metric_key(name, labels)] = value
+
+
+def _format_sample(name: str, labels: tuple, value: float) -> str:
+    if not labels:
+        return f"{name} {value}"
+    rendered = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+    return f"{name}{{{rendered}}} {value}"
+
+
+def render_metrics() -> str:
+    with _lock:
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+
+    lines = []
+    for metric_type, samples in (("counter", counters), ("gauge", gauges)):
+        seen = set()
+        for (name, labels), value in samples:
+            if name not in seen:
+                lines.append(f"# TYPE {name} {metric_type}")
+                seen.add(name)
+            lines.append(_format_sample(name, labels, value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,151 @@
+import logging
+import time
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.config import settings
+
+
+CHECKPOINT_TABLE = "migration_checkpoints"
+
+logger = logging.getLogger("alembic.backfill")
+
+
+def add_column_if_missing(table: str, column: sa.Column):
+    # A migration interrupted during its backfill is rerun from the top, after its DDL has already
+    # been committed by the autocommit block.
+    columns = {existing["name"] for existing in sa.inspect(op.get_bind()).get_columns(table)}
+    if column.name not in columns:
+        op.add_column(table, column)
+
+
+def create_index_concurrently(name: str, table: str, columns: list[str], unique: bool = False, **kw):
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        # An interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind; IF NOT EXISTS
+        # would keep it, so drop it and build again.
+        invalid = bind.execute(
+            sa.text(
+                """
+                SELECT 1 FROM pg_index AS i JOIN pg_class AS c ON c.oid = i.indexrelid
+                WHERE c.relname = :name AND NOT i.indisvalid
+                """
+            ),
+            {"name": name},
+        ).first()
+        if invalid is not None:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, if_not_exists=True, **kw)
+
+
+def drop_index_concurrently(name: str, table: str):
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def _ensure_checkpoint_table(bind):
+    bind.execute(
+        sa.text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+                name VARCHAR PRIMARY KEY,
+                last_id BIGINT NOT NULL,
+                rows_done BIGINT NOT NULL DEFAULT 0,
+                completed BOOLEAN NOT NULL DEFAULT false,
+                updated_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+            """
+        )
+    )
+
+
+def _save_checkpoint(bind, name: str, last_id: int, rows_done: int, completed: bool = False):
+    bind.execute(
+        sa.text(
+            f"""
+            INSERT INTO {CHECKPOINT_TABLE} (name, last_id, rows_done, completed, updated_at)
+            VALUES (:name, :last_id, :rows_done, :completed, now())
+            ON CONFLICT (name) DO UPDATE
+            SET last_id = EXCLUDED.last_id,
+                rows_done = EXCLUDED.rows_done,
+                completed = EXCLUDED.completed,
+                updated_at = now()
+            """
+        ),
+        {"name": name, "last_id": last_id, "rows_done": rows_done, "completed": completed},
+    )
+
+
+def backfill(
+    name: str,
+    table: str,
+    update_sql: str,
+    batch_size: int | None = None,
+    pause_seconds: float | None = None,
+    key: str = "id",
+    params: dict | None = None,
+):
+    # update_sql is run once per key range with :batch_start (inclusive) and :batch_end (exclusive)
+    # bound. Each batch commits on its own and the checkpoint is written after it, so the statement
+    # must be idempotent (e.g. only touch rows still NULL): a crash between the two replays one batch.
+    batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+    pause_seconds = settings.MIGRATION_BATCH_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        _ensure_checkpoint_table(bind)
+        checkpoint = bind.execute(
+            sa.text(f"SELECT last_id, rows_done, completed FROM {CHECKPOINT_TABLE} WHERE name = :name"),
+            {"name": name},
+        ).first()
+        if checkpoint is not None and checkpoint.completed:
+            logger.info("backfill %s already completed", name)
+            return
+
+        min_id, max_id = bind.execute(sa.text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+        if min_id is None:
+            _save_checkpoint(bind, name, 0, 0, completed=True)
+            return
+
+        start = min_id
+        rows_done = 0
+        if checkpoint is not None:
+            start = max(min_id, checkpoint.last_id + 1)
+            rows_done = checkpoint.rows_done
+            logger.info("resuming backfill %s from %s=%s", name, key, start)
+
+        statement = sa.text(update_sql)
+        started_at = time.monotonic()
+        for batch_start in range(start, max_id + 1, batch_size):
+            batch_end = min(batch_start + batch_size, max_id + 1)
+            result = bind.execute(statement, {**(params or {}), "batch_start": batch_start, "batch_end": batch_end})
+            rows_done += max(result.rowcount, 0)
+            _save_checkpoint(bind, name, batch_end - 1, rows_done)
+
+            done = batch_end - start
+            elapsed = time.monotonic() - started_at
+            remaining = max_id + 1 - batch_end
+            logger.info(
+                "backfill %s: %s=%s/%s (%.1f%%), %s rows updated, eta %.0fs",
+                name,
+                key,
+                batch_end - 1,
+                max_id,
+                100 * (batch_end - min_id) / (max_id + 1 - min_id),
+                rows_done,
+                elapsed / done * remaining if done else 0,
+            )
+            if pause_seconds:
+                # Throttle so replicas, autovacuum and live traffic keep up with the write volume.
+                time.sleep(pause_seconds)
+
+        _save_checkpoint(bind, name, max_id, rows_done, completed=True)
+        logger.info("backfill %s completed, %s rows updated in %.0fs", name, rows_done, time.monotonic() - started_at)
+
+
+def reset_backfill(name: str):
+    # Call from downgrade() so a later upgrade backfills again instead of skipping as completed.
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table(CHECKPOINT_TABLE):
+        bind.execute(sa.text(f"DELETE FROM {CHECKPOINT_TABLE} WHERE name = :name"), {"name": name})
@@ -4,46 +4,116 @@ from redis import Redis
 from redis.exceptions import RedisError
 
 from app.config import settings
+from app.tracing import span
+from app.utils.circuit_breaker import CircuitBreaker
+from app.utils.metrics import increment
+from app.utils.responses import json_default
+
+
+_redis_client: Redis | None = None
 
 
 def get_redis_client() -> Redis | None:
+    global _redis_client
+    if _redis_client is not None:
+        return _redis_client
+
     try:
-        return Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        _redis_client = Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            retry_on_timeout=False,
+        )
     except RedisError:
         return None
+    return _redis_client
 
 
-def cache_get_json(key: str):
+def _probe_redis() -> bool:
     client = get_redis_client()
-    if client is None:
+    return client is not None and client.ping()
+
+
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_rate_threshold=settings.REDIS_BREAKER_FAILURE_RATE,
+    minimum_calls=settings.REDIS_BREAKER_MINIMUM_CALLS,
+    window_size=settings.REDIS_BREAKER_WINDOW_SIZE,
+    open_seconds=settings.REDIS_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.REDIS_BREAKER_HALF_OPEN_CALLS,
+    probe=_probe_redis,
+    probe_interval_seconds=settings.REDIS_BREAKER_PROBE_INTERVAL_SECONDS,
+)
+
+
+def redis_call(operation, default=None):
+    client = get_redis_client()
+    if client is None or not redis_breaker.allow_request():
+        increment("redis_calls_short_circuited_total")
+        return default
+
+    try:
+        # Named after the helper that made the call, e.g. "redis cache_get_json".
+        with span("redis " + operation.__qualname__.split(".")[0]):
+            result = operation(client)
+    except RedisError:
+        redis_breaker.record_failure()
+        increment("redis_calls_failed_total")
+        return default
+    except Exception as exc:
+        # Every call has to be recorded, or a half-open breaker keeps the trial slot forever.
+        # Socket errors count against Redis; anything else is the caller's bug and not Redis's.
+        if isinstance(exc, OSError):
+            redis_breaker.record_failure()
+            increment("redis_calls_failed_total")
+        else:
+            redis_breaker.record_success()
+        raise
+
+    redis_breaker.record_success()
+    return result
+
+
+def cache_get_json(key: str):
+    value = redis_call(lambda client: client.get(key))
+    if value is None:
         return None
 
     try:
-        value = client.get(key)
-        if value is None:
-            return None
         return json.loads(value)
-    except (RedisError, ValueError, TypeError):
+    except (ValueError, TypeError):
         return None
 
 
 def cache_set_json(key: str, value, ttl_seconds: int = 60):
-    client = get_redis_client()
-    if client is None:
+    try:
+        serialized = json.dumps(value, default=json_default)
+    except (TypeError, ValueError):
         return
 
-    try:
-        client.setex(key, ttl_seconds, json.dumps(value, default=str))
-    except (RedisError, TypeError, ValueError):
+    redis_call(lambda client: client.setex(key, ttl_seconds, serialized))
+
+
+def cache_set_many_json(values: dict, ttl_seconds: int = 60):
+    if not values:
         return
 
+    def write(client):
+        pipe = client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.setex(key, ttl_seconds, json.dumps(value, default=json_default))
+        return pipe.execute()
+
+    redis_call(write)
+
 
 def cache_delete(key: str):
-    client = get_redis_client()
-    if client is None:
-        return
+    redis_call(lambda client: client.delete(key))
 
-    try:
-        client.delete(key)
-    except RedisError:
-        return
+
+def cache_delete_many(keys: list[str]):
+    # A single DEL round trip however many keys there are.
+    if keys:
+        redis_call(lambda client: client.delete(*keys))
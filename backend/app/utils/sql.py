@@ -0,0 +1,40 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+def escape_like(value: str, escape_char: str = "/") -> str:
+    return (
+        value.replace(escape_char, escape_char * 2)
+        .replace("%", f"{escape_char}%")
+        .replace("_", f"{escape_char}_")
+    )
+
+
+def explain_plan(db, statement) -> dict:
+    return db.execute(explain(statement)).scalar()[0]["Plan"]
+
+
+def estimate_row_count(db, statement) -> int:
+    # Planner estimate instead of count(*): constant time regardless of table size.
+    return int(explain_plan(db, statement)["Plan Rows"])
+
+
+def insert_ignoring_conflicts(dialect_name: str, table, index_elements: list):
+    # INSERT ... ON CONFLICT (...) DO NOTHING on Postgres and on SQLite (local bench databases).
+    insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+    return insert(table).on_conflict_do_nothing(index_elements=index_elements)
@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+from redis.asyncio import Redis as AsyncRedis
+
+from app.config import settings
+from app.models import Transaction
+from app.utils.metrics import increment
+from app.utils.redis_cache import get_redis_client, redis_call
+
+
+# Append to the per-user stream (for resume) and notify live subscribers in one round trip.
+PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'event', ARGV[2], 'data', ARGV[3])
+redis.call('PUBLISH', KEYS[2], cjson.encode({id = id, event = ARGV[2], data = ARGV[3]}))
+return id
+"""
+
+_publish_script = None
+_async_client: AsyncRedis | None = None
+
+
+def stream_key(user_id: int) -> str:
+    return f"wallet_events:{user_id}"
+
+
+def channel_name(user_id: int) -> str:
+    return f"wallet_events_channel:{user_id}"
+
+
+def transaction_event(tx: Transaction) -> dict:
+    return {
+        "id": tx.id,
+        "wallet_id": tx.wallet_id,
+        "type": tx.type,
+        "amount": str(tx.amount),
+        "timestamp": tx.timestamp.isoformat(),
+        "counterparty_name": tx.counterparty_name,
+        "balance_after": str(tx.balance_after) if tx.balance_after is not None else None,
+    }
+
+
+def _get_publish_script():
+    global _publish_script
+    if _publish_script is None:
+        client = get_redis_client()
+        if client is None:
+            return None
+        _publish_script = client.register_script(PUBLISH_SCRIPT)
+    return _publish_script
+
+
+def publish_wallet_event(user_id: int, event: str, data: dict):
+    script = _get_publish_script()
+    if script is None:
+        return
+
+    body = json.dumps(data, default=str)
+    redis_call(
+        lambda client: script(
+            keys=[stream_key(user_id), channel_name(user_id)],
+            args=[settings.WALLET_STREAM_RETENTION, event, body],
+            client=client,
+        )
+    )
+    increment("wallet_events_published_total", event=event)
+
+
+def publish_wallet_update(user_id: int, balance, tx_data: dict):
+    publish_wallet_event(user_id, "transaction", tx_data)
+    publish_wallet_event(user_id, "balance", {"balance": str(balance)})
+
+
+def get_async_redis_client() -> AsyncRedis:
+    global _async_client
+    if _async_client is None:
+        # No socket_timeout: pub/sub reads block until a message or keepalive tick arrives.
+        _async_client = AsyncRedis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+    return _async_client
+
+
+def _parse_event_id(event_id: str) -> tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def format_sse(event_id: str, event: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+async def wallet_event_stream(user_id: int, last_event_id: str | None):
+    client = get_async_redis_client()
+    pubsub = client.pubsub()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WALLET_STREAM_QUEUE_SIZE)
+    overflowed = asyncio.Event()
+
+    async def pump():
+        async for message in pubsub.listen():
+            if message["type"] != "message":
+                continue
+            try:
+                queue.put_nowait(message["data"])
+            except asyncio.QueueFull:
+                overflowed.set()
+                return
+
+    # Subscribe before replaying so nothing published in between is missed; duplicates are skipped by id.
+    await pubsub.subscribe(channel_name(user_id))
+    pump_task = asyncio.create_task(pump())
+    increment("wallet_stream_connections_total")
+
+    try:
+        last_sent = None
+        if last_event_id:
+            try:
+                last_sent = _parse_event_id(last_event_id)
+            except ValueError:
+                last_sent = None
+
+        # Replays in pages until the stream is exhausted; live messages queued meanwhile are deduplicated by id.
+        replay_from = last_event_id if last_sent is not None else None
+        while replay_from is not None:
+            replay = await client.xrange(
+                stream_key(user_id),
+                min=f"({replay_from}",
+                max="+",
+                count=settings.WALLET_STREAM_REPLAY_LIMIT,
+            )
+            for event_id, fields in replay:
+                yield format_sse(event_id, fields["event"], fields["data"])
+                last_sent = _parse_event_id(event_id)
+                replay_from = event_id
+            if len(replay) < settings.WALLET_STREAM_REPLAY_LIMIT:
+                replay_from = None
+
+        while True:
+            if overflowed.is_set():
+                # The client fell behind; it reconnects with Last-Event-ID and resumes from the stream.
+                increment("wallet_stream_overflows_total")
+                yield "event: overflow\ndata: {}\n\n"
+                return
+
+            try:
+                raw = await asyncio.wait_for(queue.get(), timeout=settings.WALLET_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            message = json.loads(raw)
+            event_id = _parse_event_id(message["id"])
+            if last_sent is not None and event_id <= last_sent:
+                continue
+            yield format_sse(message["id"], message["event"], message["data"])
+            last_sent = event_id
+    finally:
+        pump_task.cancel()
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -0,0 +1,87 @@
+import argparse
+import signal
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Hold, Wallet
+from app.utils.metrics import increment
+
+
+_stop_requested = False
+
+
+def release_expired(db: Session, batch_size: int) -> int:
+    now = datetime.utcnow()
+    with db.begin():
+        # SKIP LOCKED: holds being captured or voided right now are left to that request, and
+        # several sweepers can run side by side without blocking each other.
+        holds = (
+            db.query(Hold)
+            .filter(Hold.status == "ACTIVE", Hold.expires_at <= now)
+            .order_by(Hold.expires_at.asc(), Hold.id.asc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not holds:
+            return 0
+
+        released = defaultdict(Decimal)
+        for hold in holds:
+            released[hold.wallet_id] += Decimal(hold.amount)
+            hold.status = "EXPIRED"
+            hold.settled_at = now
+
+        # Same lock order as app.ledger.lock_wallets.
+        wallets = (
+            db.query(Wallet)
+            .filter(Wallet.id.in_(list(released)))
+            .order_by(Wallet.user_id.asc())
+            .with_for_update()
+            .all()
+        )
+        for wallet in wallets:
+            wallet.held = Decimal(wallet.held) - released[wallet.id]
+
+    increment("holds_expired_total", len(holds))
+    return len(holds)
+
+
+def _request_stop(signum, frame):
+    global _stop_requested
+    _stop_requested = True
+
+
+def run(batch_size: int, interval: float, once: bool = False):
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    db = SessionLocal()
+    try:
+        while not _stop_requested:
+            released = release_expired(db, batch_size)
+            if once:
+                return
+            if released < batch_size:
+                time.sleep(interval)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Release expired wallet holds")
+    parser.add_argument("--batch-size", type=int, default=settings.HOLD_SWEEP_BATCH_SIZE)
+    parser.add_argument("--interval", type=float, default=settings.HOLD_SWEEP_INTERVAL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="Release a single batch and exit")
+    args = parser.parse_args()
+    run(args.batch_size, args.interval, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import json
+import signal
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import OutboxEvent
+from app.outbox import EVENT_HANDLERS
+from app.tracing import start_trace
+from app.utils.metrics import increment
+
+
+_stop_requested = False
+PRUNE_INTERVAL_SECONDS = 300
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = settings.OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.OUTBOX_BACKOFF_MAX_SECONDS)
+
+
+def claim_batch(db: Session, batch_size: int) -> list[tuple[int, str, str, int, datetime]]:
+    # The claim pushes available_at out by a lease and commits, so handlers (SMTP especially) run
+    # with no transaction open and no row locks held; an event whose worker died is retried after the lease.
+    now = datetime.utcnow()
+    leased_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    with db.begin():
+        events = (
+            db.query(OutboxEvent)
+            .filter(OutboxEvent.status == "PENDING", OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.available_at.asc(), OutboxEvent.id.asc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for event in events:
+            event.available_at = leased_until
+        return [(event.id, event.event_type, event.payload, event.attempts, leased_until) for event in events]
+
+
+def process_event(event_type: str, payload: str, attempts: int) -> dict:
+    handler = EVENT_HANDLERS.get(event_type)
+    now = datetime.utcnow()
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for {event_type}")
+        # Emails and log writes run here rather than in the request, so each is its own trace.
+        with start_trace(f"outbox {event_type}"):
+            handler(json.loads(payload))
+    except Exception as exc:
+        attempts += 1
+        outcome = {"attempts": attempts, "last_error": repr(exc)[:2000]}
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            increment("outbox_events_total", event_type=event_type, result="dead")
+            return {**outcome, "status": "DEAD", "processed_at": now}
+        increment("outbox_events_total", event_type=event_type, result="retry")
+        return {**outcome, "available_at": now + timedelta(seconds=backoff_seconds(attempts))}
+
+    increment("outbox_events_total", event_type=event_type, result="sent")
+    return {"status": "SENT", "processed_at": now}
+
+
+def dispatch_batch(db: Session, batch_size: int) -> int:
+    claimed = claim_batch(db, batch_size)
+    outcomes = [
+        (event_id, leased_until, process_event(event_type, payload, attempts))
+        for event_id, event_type, payload, attempts, leased_until in claimed
+    ]
+    if outcomes:
+        with db.begin():
+            for event_id, leased_until, values in outcomes:
+                # Matching the lease skips events another dispatcher re-claimed after ours expired.
+                db.query(OutboxEvent).filter(
+                    OutboxEvent.id == event_id,
+                    OutboxEvent.status == "PENDING",
+                    OutboxEvent.available_at == leased_until,
+                ).update(values, synchronize_session=False)
+    return len(claimed)
+
+
+def prune_sent_events(db: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    with db.begin():
+        return (
+            db.query(OutboxEvent)
+            .filter(OutboxEvent.status == "SENT", OutboxEvent.processed_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+
+
+def _request_stop(signum, frame):
+    global _stop_requested
+    _stop_requested = True
+
+
+def run(batch_size: int, poll_interval: float, once: bool = False):
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    db = SessionLocal()
+    last_pruned_at = 0.0
+    try:
+        while not _stop_requested:
+            processed = dispatch_batch(db, batch_size)
+            if once:
+                return
+            if time.monotonic() - last_pruned_at >= PRUNE_INTERVAL_SECONDS:
+                prune_sent_events(db)
+                last_pruned_at = time.monotonic()
+            if processed == 0:
+                time.sleep(poll_interval)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver pending outbox events")
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="Process a single batch and exit")
+    args = parser.parse_args()
+    run(args.batch_size, args.poll_interval, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import signal
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.ledger import DAILY_TRANSFER_LIMIT, available_balance, get_daily_total, lock_wallets, post_transfer
+from app.models import ScheduledTransfer, User
+from app.outbox import enqueue_event
+from app.recipients import record_recipient
+from app.sagas import begin_saga, run_saga
+from app.scheduled_transfers import advance
+from app.sharding import fetch_user, shard_for_user
+from app.utils.metrics import increment
+from app.utils.redis_cache import cache_delete, cache_set_json
+from app.utils.wallet_events import publish_wallet_update, transaction_event
+
+
+_stop_requested = False
+
+
+class TransferRejected(Exception):
+    pass
+
+
+def claim_batch(db: Session, batch_size: int) -> list[tuple[int, datetime]]:
+    # The claim only sets a short lease and commits; each transfer then runs in its own transaction
+    # so wallet locks are never held across the batch.
+    now = datetime.utcnow()
+    with db.begin():
+        schedules = (
+            db.query(ScheduledTransfer)
+            .filter(
+                ScheduledTransfer.status == "ACTIVE",
+                ScheduledTransfer.next_run_at <= now,
+                or_(ScheduledTransfer.claimed_until.is_(None), ScheduledTransfer.claimed_until < now),
+            )
+            .order_by(ScheduledTransfer.next_run_at.asc(), ScheduledTransfer.id.asc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for schedule in schedules:
+            schedule.claimed_until = now + timedelta(seconds=settings.SCHEDULED_TRANSFER_LEASE_SECONDS)
+        return [(schedule.id, schedule.next_run_at) for schedule in schedules]
+
+
+def lock_due_schedule(db: Session, schedule_id: int, due_at: datetime) -> ScheduledTransfer | None:
+    # next_run_at moves in the same commit as the transfer, so a worker whose lease expired mid-run
+    # finds a different next_run_at here and skips instead of executing the occurrence twice.
+    return (
+        db.query(ScheduledTransfer)
+        .filter(
+            ScheduledTransfer.id == schedule_id,
+            ScheduledTransfer.status == "ACTIVE",
+            ScheduledTransfer.next_run_at == due_at,
+        )
+        .with_for_update()
+        .first()
+    )
+
+
+def execute(db: Session, schedule_id: int, due_at: datetime) -> bool:
+    with db.begin():
+        schedule = lock_due_schedule(db, schedule_id, due_at)
+        if schedule is None:
+            return False
+
+        sender = db.get(User, schedule.sender_id)
+        remote = shard_for_user(schedule.receiver_id) != shard_for_user(sender.id)
+        receiver = fetch_user(schedule.receiver_id) if remote else db.get(User, schedule.receiver_id)
+        if not sender.is_active:
+            raise TransferRejected("Sender is inactive")
+        if receiver is None or not receiver.is_active:
+            raise TransferRejected("Recipient not found")
+        if sender.is_frozen or receiver.is_frozen:
+            raise TransferRejected("Account is frozen")
+
+        # Same lock order and limit rules as /wallet/transfer.
+        wallet_map = lock_wallets(db, [sender.id] if remote else [sender.id, receiver.id])
+        sender_wallet = wallet_map.get(sender.id)
+        receiver_wallet = wallet_map.get(receiver.id)
+        if sender_wallet is None or (receiver_wallet is None and not remote):
+            raise TransferRejected("Wallet not found")
+        if get_daily_total(db, sender_wallet.id, "transfer_out") + schedule.amount > DAILY_TRANSFER_LIMIT:
+            raise TransferRejected("Daily transfer limit exceeded")
+        if available_balance(sender_wallet) < schedule.amount:
+            raise TransferRejected("Insufficient funds")
+
+        saga_id = None
+        if remote:
+            saga, out_tx = begin_saga(db, sender, sender_wallet, receiver, schedule.amount)
+            saga_id = saga.id
+        else:
+            out_tx, in_tx = post_transfer(db, sender, sender_wallet, receiver, receiver_wallet, schedule.amount)
+        enqueue_event(
+            db,
+            "log.transaction",
+            message=f"Scheduled transfer SUCCESS schedule_id={schedule.id} user_id={sender.id} receiver_id={receiver.id} amount={schedule.amount}",
+        )
+        now = datetime.utcnow()
+        schedule.run_count += 1
+        schedule.last_run_at = now
+        schedule.last_error = None
+        advance(schedule, now)
+        db.flush()
+        out_tx_data = transaction_event(out_tx)
+        in_tx_data = None if remote else transaction_event(in_tx)
+        recipient = (sender.id, receiver.id, receiver.name, receiver.email, out_tx.timestamp)
+
+    cache_set_json(f"wallet_balance:{sender.id}", str(sender_wallet.balance), 60)
+    cache_delete(f"wallet_transactions:{sender.id}")
+    publish_wallet_update(sender.id, sender_wallet.balance, out_tx_data)
+    outcome = None
+    if remote:
+        # The occurrence is done once the debit commits; the saga credits or refunds on its own.
+        try:
+            outcome = run_saga(db, saga_id)
+        except Exception:
+            db.rollback()
+            increment("transfer_sagas_total", result="deferred")
+    else:
+        cache_set_json(f"wallet_balance:{receiver.id}", str(receiver_wallet.balance), 60)
+        cache_delete(f"wallet_transactions:{receiver.id}")
+        publish_wallet_update(receiver.id, receiver_wallet.balance, in_tx_data)
+    if outcome != "COMPENSATED":
+        record_recipient(*recipient)
+    return True
+
+
+def record_failure(db: Session, schedule_id: int, due_at: datetime, error: str):
+    with db.begin():
+        schedule = lock_due_schedule(db, schedule_id, due_at)
+        if schedule is None:
+            return
+        now = datetime.utcnow()
+        schedule.attempts += 1
+        schedule.last_error = error[:2000]
+        if schedule.attempts >= settings.SCHEDULED_TRANSFER_MAX_ATTEMPTS:
+            # Give up on this occurrence; recurring orders continue with the next one.
+            advance(schedule, now)
+        else:
+            schedule.next_run_at = now + timedelta(seconds=settings.SCHEDULED_TRANSFER_RETRY_SECONDS)
+            schedule.claimed_until = None
+        enqueue_event(
+            db,
+            "log.transaction",
+            message=f"Scheduled transfer FAILED schedule_id={schedule.id} user_id={schedule.sender_id} amount={schedule.amount} error={error}",
+        )
+
+
+def run_batch(db: Session, batch_size: int) -> int:
+    claimed = claim_batch(db, batch_size)
+    for schedule_id, due_at in claimed:
+        try:
+            executed = execute(db, schedule_id, due_at)
+            increment("scheduled_transfers_total", result="success" if executed else "skipped")
+        except Exception as exc:
+            db.rollback()
+            error = str(exc) if isinstance(exc, TransferRejected) else repr(exc)
+            record_failure(db, schedule_id, due_at, error)
+            increment("scheduled_transfers_total", result="failed")
+    return len(claimed)
+
+
+def _request_stop(signum, frame):
+    global _stop_requested
+    _stop_requested = True
+
+
+def run(batch_size: int, poll_interval: float, once: bool = False):
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    db = SessionLocal()
+    try:
+        while not _stop_requested:
+            claimed = run_batch(db, batch_size)
+            if once:
+                return
+            if claimed < batch_size:
+                time.sleep(poll_interval)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Execute due scheduled transfers; safe to run several in parallel")
+    parser.add_argument("--batch-size", type=int, default=settings.SCHEDULED_TRANSFER_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=settings.SCHEDULED_TRANSFER_POLL_INTERVAL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="Process a single batch and exit")
+    args = parser.parse_args()
+    run(args.batch_size, args.poll_interval, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,4 +12,6 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+export const idempotent = () => ({ headers: { "Idempotency-Key": crypto.randomUUID() } });
+
 export default api;
@@ -1,7 +1,7 @@
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 
-import api from "../api";
+import api, { idempotent } from "../api";
 
 export default function AdminDashboardPage() {
   const [depositForm, setDepositForm] = useState({ email: "", amount: "" });
@@ -10,16 +10,27 @@ export default function AdminDashboardPage() {
   const [txEmail, setTxEmail] = useState("");
   const [userTransactions, setUserTransactions] = useState([]);
   const [users, setUsers] = useState([]);
+  const [search, setSearch] = useState("");
+  const [userQuery, setUserQuery] = useState({ q: "", afterId: null });
+  const [previousCursors, setPreviousCursors] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [estimatedTotal, setEstimatedTotal] = useState(0);
   const [loading, setLoading] = useState(true);
   const [working, setWorking] = useState(false);
   const [error, setError] = useState("");
   const [message, setMessage] = useState("");
   const navigate = useNavigate();
 
-  const loadUsers = async () => {
+  const loadUsers = async (query = userQuery) => {
     try {
-      const response = await api.get("/admin/users");
-      setUsers(response.data);
+      const params = {};
+      if (query.q) params.q = query.q;
+      if (query.afterId !== null) params.after_id = query.afterId;
+      const response = await api.get("/admin/users", { params });
+      setUsers(response.data.items);
+      setNextCursor(response.data.next_cursor);
+      setEstimatedTotal(response.data.estimated_total);
+      setUserQuery(query);
     } catch (err) {
       setError(err.response?.data?.detail || "Failed to load users");
       if (err.response?.status === 401 || err.response?.status === 403) {
@@ -81,7 +92,7 @@ export default function AdminDashboardPage() {
 
   const onDeposit = (event) => {
     event.preventDefault();
-    handleAction(() => api.post("/admin/deposit", depositForm), "Deposit successful");
+    handleAction(() => api.post("/admin/deposit", depositForm, idempotent()), "Deposit successful");
   };
 
   const onDeactivate = (event) => {
@@ -122,6 +133,23 @@ export default function AdminDashboardPage() {
     }
   };
 
+  const onSearchUsers = (event) => {
+    event.preventDefault();
+    setPreviousCursors([]);
+    loadUsers({ q: search.trim(), afterId: null });
+  };
+
+  const onNextUsers = () => {
+    setPreviousCursors((prev) => [...prev, userQuery.afterId]);
+    loadUsers({ ...userQuery, afterId: nextCursor });
+  };
+
+  const onPreviousUsers = () => {
+    const afterId = previousCursors[previousCursors.length - 1] ?? null;
+    setPreviousCursors((prev) => prev.slice(0, -1));
+    loadUsers({ ...userQuery, afterId });
+  };
+
   const onLogout = () => {
     localStorage.removeItem("token");
     localStorage.removeItem("is_admin");
@@ -212,6 +240,11 @@ export default function AdminDashboardPage() {
 
         <section className="card panel-table">
           <h2>Users</h2>
+          <form className="top-row" onSubmit={onSearchUsers}>
+            <input value={search} onChange={(e) => setSearch(e.target.value)} placeholder="Search name or email" maxLength={100} />
+            <button disabled={working}>Search</button>
+          </form>
+          <p className="subtle">About {estimatedTotal} users</p>
           <div className="table-wrap">
             <table>
               <thead>
@@ -222,12 +255,13 @@ export default function AdminDashboardPage() {
                   <th>Active</th>
                   <th>Admin</th>
                   <th>Frozen</th>
+                  <th>Balance</th>
                 </tr>
               </thead>
               <tbody>
                 {users.length === 0 ? (
                   <tr>
-                    <td colSpan="6">No users found</td>
+                    <td colSpan="7">No users found</td>
                   </tr>
                 ) : (
                   users.map((user) => (
@@ -238,12 +272,21 @@ export default function AdminDashboardPage() {
                       <td>{user.is_active ? "Yes" : "No"}</td>
                       <td>{user.is_admin ? "Yes" : "No"}</td>
                       <td>{user.is_frozen ? "Yes" : "No"}</td>
+                      <td>{user.balance ?? "-"}</td>
                     </tr>
                   ))
                 )}
               </tbody>
             </table>
           </div>
+          <div className="top-row">
+            <button className="ghost" onClick={onPreviousUsers} disabled={previousCursors.length === 0}>
+              Previous
+            </button>
+            <button className="ghost" onClick={onNextUsers} disabled={nextCursor === null}>
+              Next
+            </button>
+          </div>
         </section>
 
         <section className="card panel-table">
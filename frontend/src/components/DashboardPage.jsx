@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from "react";
 import { useNavigate } from "react-router-dom";
 
-import api from "../api";
+import api, { idempotent } from "../api";
 
 function toCurrency(value) {
   const numeric = Number(value || 0);
@@ -27,7 +27,7 @@ export default function DashboardPage() {
 
     return transactions.reduce((sum, tx) => {
       const txAmount = Number(tx.amount);
-      if (tx.type === "deposit" || tx.type === "transfer_in") {
+      if (tx.type === "deposit" || tx.type === "transfer_in" || tx.type === "transfer_reversal") {
         return sum + txAmount;
       }
       return sum - txAmount;
@@ -59,6 +59,25 @@ export default function DashboardPage() {
     loadWallet();
   }, []);
 
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!token) {
+      return undefined;
+    }
+
+    const source = new EventSource(`${api.defaults.baseURL}/wallet/stream?access_token=${encodeURIComponent(token)}`);
+
+    source.addEventListener("balance", (event) => {
+      setBalance(JSON.parse(event.data).balance);
+    });
+    source.addEventListener("transaction", (event) => {
+      const tx = JSON.parse(event.data);
+      setTransactions((current) => (current.some((item) => item.id === tx.id) ? current : [tx, ...current]));
+    });
+
+    return () => source.close();
+  }, []);
+
   useEffect(() => {
     let timeoutId;
 
@@ -114,7 +133,7 @@ export default function DashboardPage() {
     if (working) {
       return;
     }
-    executeAction(() => api.post("/wallet/withdraw", { amount: withdrawAmount }), "Withdraw successful");
+    executeAction(() => api.post("/wallet/withdraw", { amount: withdrawAmount }, idempotent()), "Withdraw successful");
   };
 
   const onTransfer = (event) => {
@@ -122,7 +141,10 @@ export default function DashboardPage() {
     if (working) {
       return;
     }
-    executeAction(() => api.post("/wallet/transfer", { email: transferEmail, amount: transferAmount }), "Transfer successful");
+    executeAction(
+      () => api.post("/wallet/transfer", { email: transferEmail, amount: transferAmount }, idempotent()),
+      "Transfer successful"
+    );
   };
 
   const onDeactivate = async () => {
@@ -238,7 +260,9 @@ export default function DashboardPage() {
                           ? `Transferred to ${tx.counterparty_name || ""}`
                           : tx.type === "transfer_in"
                             ? `Received from ${tx.counterparty_name || ""}`
-                            : tx.type}
+                            : tx.type === "transfer_reversal"
+                              ? `Returned transfer to ${tx.counterparty_name || ""}`
+                              : tx.type}
                       </td>
                       <td>{tx.counterparty_name || "-"}</td>
                       <td>${toCurrency(tx.amount)}</td>